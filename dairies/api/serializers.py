@@ -0,0 +1,128 @@
+# compact representations of objects with sparse fieldsets
+
+from collections import namedtuple
+
+# public field of a resource: columns it is read from (passed
+# to only()), relations to select and function of object giving value
+Field = namedtuple('Field', 'columns related value')
+
+
+def optional(get):
+    # related objects that may be missing are null
+    def value(obj):
+        try:
+            return get(obj)
+        except AttributeError:
+            return None
+    return value
+
+
+POST_FIELDS = {
+    'id': Field([], [], lambda post: post.pk),
+    'pub_date': Field(['pub_date'], [], lambda post: post.pub_date),
+    'text': Field(['text'], [], lambda post: post.text),
+    'author': Field(
+        ['author__username'], ['author'],
+        lambda post: post.author.username,
+    ),
+    'group': Field(
+        ['group__slug'], ['group'], optional(lambda post: post.group.slug)
+    ),
+    'image': Field(
+        ['image'], [], lambda post: post.image.url if post.image else None
+    ),
+    'comments_count': Field(
+        ['comments_count'], [], lambda post: post.comments_count
+    ),
+}
+
+COMMENT_FIELDS = {
+    'id': Field([], [], lambda comment: comment.pk),
+    'pub_date': Field(
+        ['pub_date'], [], lambda comment: comment.pub_date
+    ),
+    'post': Field(['post'], [], lambda comment: comment.post_id),
+    'author': Field(
+        ['author__username'], ['author'],
+        lambda comment: comment.author.username,
+    ),
+    'text': Field(['text'], [], lambda comment: comment.text),
+    'is_edited': Field(['is_edited'], [], lambda comment: comment.is_edited),
+}
+
+GROUP_FIELDS = {
+    'id': Field([], [], lambda group: group.pk),
+    'slug': Field(['slug'], [], lambda group: group.slug),
+    'title': Field(['title'], [], lambda group: group.title),
+    'description': Field(
+        ['description'], [], lambda group: group.description
+    ),
+}
+
+PROFILE_FIELDS = {
+    'username': Field(['username'], [], lambda user: user.username),
+    'first_name': Field(['first_name'], [], lambda user: user.first_name),
+    'last_name': Field(['last_name'], [], lambda user: user.last_name),
+    'posts_count': Field(
+        ['stats__posts_count'], ['stats'],
+        optional(lambda user: user.stats.posts_count),
+    ),
+    'followers_count': Field(
+        ['stats__followers_count'], ['stats'],
+        optional(lambda user: user.stats.followers_count),
+    ),
+    'following_count': Field(
+        ['stats__following_count'], ['stats'],
+        optional(lambda user: user.stats.following_count),
+    ),
+}
+
+
+class InvalidFields(ValueError):
+    """Raised on fields= naming fields a resource doesn't have.
+    """
+
+
+def requested_fields(request, fields):
+    """Returns names of fields listed in ?fields=, all by default.
+    """
+    names = [
+        name.strip() for name in request.GET.get('fields', '').split(',')
+        if name.strip()
+    ]
+    if not names:
+        return list(fields)
+    unknown = [name for name in names if name not in fields]
+    if unknown:
+        raise InvalidFields(
+            'Unknown fields: {}, available: {}'.format(
+                ', '.join(unknown), ', '.join(fields)
+            )
+        )
+    return list(dict.fromkeys(names))
+
+
+def selection(fields, names):
+    """Returns (related, columns) to load for fields of names.
+    """
+    related = sorted({
+        relation for name in names for relation in fields[name].related
+    })
+    columns = sorted({
+        column for name in names for column in fields[name].columns
+    } | set(related))
+    return related, columns
+
+
+def select(queryset, fields, names, required=('pk',)):
+    """Restricts queryset to relations and columns of fields of names
+    plus required columns.
+    """
+    related, columns = selection(fields, names)
+    if related:
+        queryset = queryset.select_related(*related)
+    return queryset.only(*required, *columns)
+
+
+def serialize(obj, fields, names):
+    return {name: fields[name].value(obj) for name in names}
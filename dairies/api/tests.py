@@ -0,0 +1,164 @@
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, override_settings, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+@override_settings(API_PAGE_SIZE=3)
+class ApiTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.test_author = User.objects.create_user(
+            username='rock4ts', first_name='Рок'
+        )
+        cls.test_reader = User.objects.create_user(username='someone')
+        cls.test_group = Group.objects.create(
+            title='Тестовое сообщество',
+            description='Тестовое описание сообщества',
+        )
+        for i in range(7):
+            Post.objects.create(
+                text=f'Тестовый текст {i}',
+                author=cls.test_author,
+                group=cls.test_group if i % 2 else None,
+            )
+        cls.test_post = Post.objects.latest('pub_date')
+        for i in range(5):
+            Comment.objects.create(
+                post=cls.test_post,
+                author=cls.test_reader,
+                text=f'Комментарий {i}',
+            )
+        Follow.objects.create(user=cls.test_reader, author=cls.test_author)
+        cls.reader_client = Client()
+        cls.reader_client.force_login(cls.test_reader)
+
+    def setUp(self):
+        cache.clear()
+
+    def get(self, name, client=None, **params):
+        kwargs = params.pop('kwargs', {})
+        response = (client or self.client).get(
+            reverse(f'api:{name}', kwargs=kwargs), params
+        )
+        return response, response.json()
+
+    def walk(self, name, client=None, **params):
+        """Returns every object of a list following next cursors.
+        """
+        results, cursor = [], None
+        while True:
+            if cursor:
+                params['before'] = cursor
+            response, data = self.get(name, client, **params)
+            self.assertEqual(response.status_code, HTTPStatus.OK)
+            results += data['results']
+            cursor = data['next']
+            if cursor is None:
+                return results
+
+    def test_post_lists_walk_whole_feed(self):
+        author = ApiTests.test_author
+        lists = {
+            'posts': ({}, Post.objects.all()),
+            'group_posts': (
+                {'slug': ApiTests.test_group.slug},
+                Post.objects.filter(group=ApiTests.test_group),
+            ),
+            'profile_posts': (
+                {'username': author.username},
+                Post.objects.filter(author=author),
+            ),
+        }
+        for name, (kwargs, posts) in lists.items():
+            with self.subTest(name=name):
+                results = self.walk(name, kwargs=kwargs, fields='id')
+                self.assertEqual(
+                    [result['id'] for result in results],
+                    list(posts.values_list('pk', flat=True)),
+                )
+        results = self.walk('follow_feed', ApiTests.reader_client)
+        self.assertEqual(len(results), 7)
+
+    def test_previous_cursor_returns_to_first_page(self):
+        _, first = self.get('posts')
+        _, second = self.get('posts', before=first['next'])
+        _, back = self.get('posts', after=second['previous'])
+        self.assertEqual(back['results'], first['results'])
+
+    def test_fields_limit_output_and_columns(self):
+        _, data = self.get('posts', fields='text,author')
+        self.assertEqual(
+            data['results'][0],
+            {'text': ApiTests.test_post.text, 'author': 'rock4ts'},
+        )
+        with CaptureQueriesContext(connection) as queries:
+            _, data = self.get('posts', fields='id')
+        self.assertEqual(list(data['results'][0]), ['id'])
+        self.assertEqual(len(queries), 1)
+        sql = queries[0]['sql']
+        self.assertNotIn('"text"', sql)
+        self.assertNotIn('auth_user', sql)
+        with self.assertNumQueries(1):
+            self.get('posts')
+
+    def test_post_detail_and_comments(self):
+        post = ApiTests.test_post
+        _, data = self.get('post_detail', kwargs={'post_id': post.pk})
+        self.assertEqual(data['id'], post.pk)
+        self.assertEqual(data['author'], 'rock4ts')
+        self.assertEqual(data['comments_count'], 5)
+        comments = self.walk(
+            'post_comments', kwargs={'post_id': post.pk}, fields='text'
+        )
+        self.assertEqual(
+            comments, [{'text': f'Комментарий {i}'} for i in range(4, -1, -1)]
+        )
+
+    def test_groups_and_profiles(self):
+        _, data = self.get('groups')
+        self.assertEqual(data['results'][0]['slug'], ApiTests.test_group.slug)
+        self.assertIsNone(data['next'])
+        _, data = self.get(
+            'group_detail', kwargs={'slug': ApiTests.test_group.slug},
+            fields='title',
+        )
+        self.assertEqual(data, {'title': ApiTests.test_group.title})
+        _, data = self.get('profile', kwargs={'username': 'rock4ts'})
+        self.assertEqual(data['first_name'], 'Рок')
+        self.assertEqual(
+            (data['posts_count'], data['followers_count']), (7, 1)
+        )
+
+    def test_errors_are_json(self):
+        errors = {
+            ('posts', 'fields=id,secret'): HTTPStatus.BAD_REQUEST,
+            ('posts', 'limit=many'): HTTPStatus.BAD_REQUEST,
+            ('posts', 'before=garbage'): HTTPStatus.BAD_REQUEST,
+            ('posts', 'after=garbage'): HTTPStatus.BAD_REQUEST,
+            ('groups', 'after=garbage'): HTTPStatus.BAD_REQUEST,
+            ('follow_feed', ''): HTTPStatus.UNAUTHORIZED,
+        }
+        for (name, query), status in errors.items():
+            with self.subTest(name=name, query=query):
+                response = self.client.get(
+                    f'{reverse(f"api:{name}")}?{query}'
+                )
+                self.assertEqual(response.status_code, status)
+                self.assertIn('error', response.json())
+        response = self.client.get(
+            reverse('api:profile', kwargs={'username': 'nobody'})
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+        self.assertIn('error', response.json())
+        response = self.client.post(reverse('api:posts'))
+        self.assertEqual(response.status_code, HTTPStatus.METHOD_NOT_ALLOWED)
@@ -0,0 +1,181 @@
+from functools import wraps
+
+from django.conf import settings
+from django.http import Http404, JsonResponse
+from django.shortcuts import get_object_or_404
+
+from posts.models import Comment, Group, Post, User
+from posts.pagination import decode_cursor, KeysetPaginator
+from posts.timeline import FollowFeed
+
+from .serializers import (
+    COMMENT_FIELDS, GROUP_FIELDS, InvalidFields, POST_FIELDS, PROFILE_FIELDS,
+    requested_fields, select, selection, serialize,
+)
+
+# posts and comments are paginated with (pub_date, id) cursors
+FEED_COLUMNS = ('pk', 'pub_date')
+
+
+class InvalidParameter(ValueError):
+    """Raised on query parameters the API can't use.
+    """
+
+
+def json_response(data, status=200):
+    return JsonResponse(
+        data,
+        status=status,
+        json_dumps_params={'ensure_ascii': False, 'separators': (',', ':')},
+    )
+
+
+def api_view(view):
+    """Allows GET only and answers errors with JSON instead of pages.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            response = json_response(
+                {'error': 'The API is read-only'}, status=405
+            )
+            response['Allow'] = 'GET, HEAD'
+            return response
+        try:
+            return view(request, *args, **kwargs)
+        except Http404:
+            return json_response({'error': 'Not found'}, status=404)
+        except (InvalidFields, InvalidParameter) as error:
+            return json_response({'error': str(error)}, status=400)
+    return wrapper
+
+
+def page_size(request):
+    try:
+        size = int(request.GET.get('limit', settings.API_PAGE_SIZE))
+    except ValueError:
+        raise InvalidParameter('limit must be a number')
+    return max(1, min(size, settings.API_MAX_PAGE_SIZE))
+
+
+def keyset_page(request, object_list, fields, names):
+    """Returns page of object_list selected by ?before= / ?after=
+    cursors, the cursors of neighbouring pages are 'next' and
+    'previous'.
+    """
+    cursors = {name: request.GET.get(name) for name in ('before', 'after')}
+    for name, token in cursors.items():
+        # the paginator would quietly show the first page instead
+        if token and decode_cursor(token) is None:
+            raise InvalidParameter(f'{name} must be a cursor of a page')
+    page = KeysetPaginator(object_list, page_size(request)).get_page(
+        **cursors
+    )
+    return json_response({
+        'results': [serialize(obj, fields, names) for obj in page],
+        'next': page.next_cursor,
+        'previous': page.previous_cursor,
+    })
+
+
+def post_page(request, posts):
+    names = requested_fields(request, POST_FIELDS)
+    return keyset_page(
+        request,
+        select(posts, POST_FIELDS, names, FEED_COLUMNS),
+        POST_FIELDS,
+        names,
+    )
+
+
+@api_view
+def posts(request):
+    return post_page(request, Post.objects.all())
+
+
+@api_view
+def post_detail(request, post_id):
+    names = requested_fields(request, POST_FIELDS)
+    post = get_object_or_404(
+        select(Post.objects.all(), POST_FIELDS, names), pk=post_id
+    )
+    return json_response(serialize(post, POST_FIELDS, names))
+
+
+@api_view
+def post_comments(request, post_id):
+    get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    names = requested_fields(request, COMMENT_FIELDS)
+    return keyset_page(
+        request,
+        select(
+            Comment.objects.filter(post_id=post_id), COMMENT_FIELDS, names,
+            FEED_COLUMNS,
+        ),
+        COMMENT_FIELDS,
+        names,
+    )
+
+
+@api_view
+def groups(request):
+    """Groups in id order, ?after= is the id of the last group seen.
+    """
+    names = requested_fields(request, GROUP_FIELDS)
+    limit = page_size(request)
+    try:
+        after = int(request.GET.get('after', 0))
+    except ValueError:
+        raise InvalidParameter('after must be a group id')
+    rows = list(
+        select(Group.objects.all(), GROUP_FIELDS, names)
+        .filter(pk__gt=after).order_by('pk')[:limit + 1]
+    )
+    return json_response({
+        'results': [
+            serialize(group, GROUP_FIELDS, names) for group in rows[:limit]
+        ],
+        'next': str(rows[limit - 1].pk) if len(rows) > limit else None,
+    })
+
+
+@api_view
+def group_detail(request, slug):
+    names = requested_fields(request, GROUP_FIELDS)
+    group = get_object_or_404(
+        select(Group.objects.all(), GROUP_FIELDS, names), slug=slug
+    )
+    return json_response(serialize(group, GROUP_FIELDS, names))
+
+
+@api_view
+def group_posts(request, slug):
+    group = get_object_or_404(Group.objects.only('pk'), slug=slug)
+    return post_page(request, Post.objects.filter(group=group))
+
+
+@api_view
+def profile(request, username):
+    names = requested_fields(request, PROFILE_FIELDS)
+    user = get_object_or_404(
+        select(User.objects.all(), PROFILE_FIELDS, names), username=username
+    )
+    return json_response(serialize(user, PROFILE_FIELDS, names))
+
+
+@api_view
+def profile_posts(request, username):
+    user = get_object_or_404(User.objects.only('pk'), username=username)
+    return post_page(request, Post.objects.filter(author=user))
+
+
+@api_view
+def follow_feed(request):
+    """Subscriptions feed of the logged-in user.
+    """
+    if not request.user.is_authenticated:
+        return json_response({'error': 'Log in to read the feed'}, 401)
+    names = requested_fields(request, POST_FIELDS)
+    related, columns = selection(POST_FIELDS, names)
+    feed = FollowFeed(request.user, related, columns)
+    return keyset_page(request, feed, POST_FIELDS, names)
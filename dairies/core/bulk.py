@@ -0,0 +1,34 @@
+# inserts of more rows than fit into memory
+
+from contextlib import contextmanager
+from itertools import islice
+
+
+def bulk_create_chunked(model, objs, chunk_size, **kwargs):
+    """Inserts objs, any iterable, with bulk_create taking chunk_size
+    objects at a time, as bulk_create itself builds a list of all of
+    them. Rows per statement are left to the database backend.
+    Returns number of inserted objects.
+    """
+    objs = iter(objs)
+    inserted = 0
+    while True:
+        chunk = list(islice(objs, chunk_size))
+        if not chunk:
+            return inserted
+        model.objects.bulk_create(chunk, **kwargs)
+        inserted += len(chunk)
+
+
+@contextmanager
+def explicit_pub_dates(*models):
+    """Lets bulk_create save pub_date of objects instead of now.
+    """
+    fields = [model._meta.get_field('pub_date') for model in models]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
@@ -0,0 +1,318 @@
+# cache backend shared by all processes of the host
+
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS cache (
+        key TEXT PRIMARY KEY,
+        value BLOB,
+        expires REAL,
+        accessed REAL NOT NULL,
+        size INTEGER NOT NULL
+    )
+    """,
+    'CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)',
+    'CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)',
+    # running totals kept by triggers so limits are checked without scans
+    """
+    CREATE TABLE IF NOT EXISTS cache_stats (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        entries INTEGER NOT NULL,
+        size INTEGER NOT NULL
+    )
+    """,
+    'INSERT OR IGNORE INTO cache_stats VALUES (1, 0, 0)',
+    """
+    CREATE TRIGGER IF NOT EXISTS cache_insert AFTER INSERT ON cache BEGIN
+        UPDATE cache_stats
+        SET entries = entries + 1, size = size + new.size;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS cache_delete AFTER DELETE ON cache BEGIN
+        UPDATE cache_stats
+        SET entries = entries - 1, size = size - old.size;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS cache_update AFTER UPDATE OF size ON cache
+    BEGIN
+        UPDATE cache_stats SET size = size - old.size + new.size;
+    END
+    """,
+)
+
+
+class SQLiteCache(BaseCache):
+    """Cache stored in SQLite database file in WAL mode, so every
+    worker process of the host reads and invalidates the same entries.
+    Least recently used entries are evicted once MAX_ENTRIES or
+    MAX_SIZE (bytes of stored values) is exceeded, integers are
+    stored natively and incremented atomically.
+
+    OPTIONS:
+        MAX_ENTRIES, CULL_FREQUENCY - as for other Django caches;
+        MAX_SIZE - memory cap in bytes, 64 MB by default;
+        MMAP_SIZE - bytes of the file mapped into memory;
+        BUSY_TIMEOUT - seconds to wait for a concurrent writer;
+        ACCESS_RESOLUTION - seconds between access time updates
+            of an entry, reads within it do not write to the file.
+    """
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._location = location
+        self._max_size = int(options.get('MAX_SIZE', 64 * 1024 * 1024))
+        self._mmap_size = int(options.get('MMAP_SIZE', self._max_size))
+        self._busy_timeout = float(options.get('BUSY_TIMEOUT', 5))
+        self._access_resolution = float(options.get('ACCESS_RESOLUTION', 1))
+        self._local = threading.local()
+
+    @property
+    def _connection(self):
+        # connections are not shared between threads and forked workers
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            directory = os.path.dirname(self._location)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(
+                self._location,
+                timeout=self._busy_timeout,
+                isolation_level=None,
+                check_same_thread=False,
+            )
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute(f'PRAGMA mmap_size={self._mmap_size}')
+            with self._transaction(connection):
+                for statement in SCHEMA:
+                    connection.execute(statement)
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    @contextmanager
+    def _transaction(self, connection=None):
+        connection = connection or self._connection
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            yield connection
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+
+    def _encode(self, value):
+        if type(value) is int:
+            return value
+        return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+    def _decode(self, value):
+        if isinstance(value, int):
+            return value
+        return pickle.loads(value)
+
+    def _size(self, key, value):
+        if isinstance(value, int):
+            return len(key) + 8
+        return len(key) + len(value)
+
+    def _expires(self, timeout):
+        return self.get_backend_timeout(timeout)
+
+    def _touch_accessed(self, keys, now):
+        with self._transaction() as connection:
+            connection.executemany(
+                'UPDATE cache SET accessed = ? WHERE key = ?',
+                [(now, key) for key in keys],
+            )
+
+    def _fetch(self, keys):
+        """Returns {key: value} of live entries among keys.
+        """
+        now = time.time()
+        placeholders = ','.join('?' * len(keys))
+        rows = self._connection.execute(
+            'SELECT key, value, accessed FROM cache '
+            f'WHERE key IN ({placeholders}) '
+            'AND (expires IS NULL OR expires > ?)',
+            [*keys, now],
+        ).fetchall()
+        stale = [
+            key for key, _, accessed in rows
+            if accessed < now - self._access_resolution
+        ]
+        if stale:
+            self._touch_accessed(stale, now)
+        return {key: self._decode(value) for key, value, _ in rows}
+
+    def _cull(self, connection, now):
+        entries, size = connection.execute(
+            'SELECT entries, size FROM cache_stats'
+        ).fetchone()
+        if entries <= self._max_entries and size <= self._max_size:
+            return
+        connection.execute(
+            'DELETE FROM cache WHERE expires IS NOT NULL AND expires <= ?',
+            [now],
+        )
+        entries, size = connection.execute(
+            'SELECT entries, size FROM cache_stats'
+        ).fetchone()
+        if entries <= self._max_entries and size <= self._max_size:
+            return
+        if self._cull_frequency == 0:
+            connection.execute('DELETE FROM cache')
+            return
+        # drop 1 / CULL_FREQUENCY of entries, at least enough to fit
+        # into the memory cap assuming entries of average size
+        victims = max(
+            entries // self._cull_frequency,
+            entries - self._max_entries,
+            -(-(size - self._max_size) * entries // max(size, 1)),
+        )
+        connection.execute(
+            'DELETE FROM cache WHERE key IN '
+            '(SELECT key FROM cache ORDER BY accessed LIMIT ?)',
+            [victims],
+        )
+
+    def _store(self, connection, key, value, timeout, now):
+        value = self._encode(value)
+        # upsert keeps cache_stats triggers firing, REPLACE would not
+        connection.execute(
+            'INSERT INTO cache VALUES (?, ?, ?, ?, ?) '
+            'ON CONFLICT (key) DO UPDATE SET value = excluded.value, '
+            'expires = excluded.expires, accessed = excluded.accessed, '
+            'size = excluded.size',
+            [key, value, self._expires(timeout), now,
+             self._size(key, value)],
+        )
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        now = time.time()
+        with self._transaction() as connection:
+            connection.execute(
+                'DELETE FROM cache WHERE key = ? AND expires <= ?', [key, now]
+            )
+            value = self._encode(value)
+            added = connection.execute(
+                'INSERT OR IGNORE INTO cache VALUES (?, ?, ?, ?, ?)',
+                [key, value, self._expires(timeout), now,
+                 self._size(key, value)],
+            ).rowcount == 1
+            if added:
+                self._cull(connection, now)
+        return added
+
+    def get(self, key, default=None, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return self._fetch([key]).get(key, default)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        now = time.time()
+        with self._transaction() as connection:
+            self._store(connection, key, value, timeout, now)
+            self._cull(connection, now)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        now = time.time()
+        with self._transaction() as connection:
+            return connection.execute(
+                'UPDATE cache SET expires = ?, accessed = ? WHERE key = ? '
+                'AND (expires IS NULL OR expires > ?)',
+                [self._expires(timeout), now, key, now],
+            ).rowcount == 1
+
+    def delete(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        with self._transaction() as connection:
+            connection.execute('DELETE FROM cache WHERE key = ?', [key])
+
+    def has_key(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return self._connection.execute(
+            'SELECT 1 FROM cache WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            [key, time.time()],
+        ).fetchone() is not None
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        now = time.time()
+        with self._transaction() as connection:
+            row = connection.execute(
+                'SELECT value FROM cache WHERE key = ? '
+                'AND (expires IS NULL OR expires > ?)',
+                [key, now],
+            ).fetchone()
+            if row is None:
+                raise ValueError(f"Key '{key}' not found")
+            if isinstance(row[0], int):
+                connection.execute(
+                    'UPDATE cache SET value = value + ?, accessed = ? '
+                    'WHERE key = ?',
+                    [delta, now, key],
+                )
+                return row[0] + delta
+            # numbers pickled by older entries, e.g. floats
+            value = self._decode(row[0]) + delta
+            encoded = self._encode(value)
+            connection.execute(
+                'UPDATE cache SET value = ?, size = ?, accessed = ? '
+                'WHERE key = ?',
+                [encoded, self._size(key, encoded), now, key],
+            )
+            return value
+
+    def get_many(self, keys, version=None):
+        keys = {self.make_key(key, version=version): key for key in keys}
+        for key in keys:
+            self.validate_key(key)
+        if not keys:
+            return {}
+        return {
+            keys[key]: value for key, value in self._fetch(list(keys)).items()
+        }
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        now = time.time()
+        with self._transaction() as connection:
+            for key, value in data.items():
+                key = self.make_key(key, version=version)
+                self.validate_key(key)
+                self._store(connection, key, value, timeout, now)
+            self._cull(connection, now)
+        return []
+
+    def delete_many(self, keys, version=None):
+        keys = [self.make_key(key, version=version) for key in keys]
+        for key in keys:
+            self.validate_key(key)
+        with self._transaction() as connection:
+            connection.executemany(
+                'DELETE FROM cache WHERE key = ?', [(key,) for key in keys]
+            )
+
+    def clear(self):
+        with self._transaction() as connection:
+            connection.execute('DELETE FROM cache')
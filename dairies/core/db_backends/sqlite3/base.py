@@ -0,0 +1,15 @@
+# SQLite backend for concurrent worker processes
+
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """SQLite backend whose transactions take the write lock when they
+    begin. A deferred transaction that reads first and writes later
+    (add_comment, profile_follow) can't wait for a concurrent writer
+    when it upgrades its lock and fails with "database is locked" at
+    once, an immediate one waits up to busy_timeout for its turn.
+    Connections are tuned by core.signals.configure_sqlite.
+    """
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute('BEGIN IMMEDIATE')
@@ -0,0 +1,314 @@
+# HTTP level load testing of the WSGI application
+
+import http.client
+import io
+import random
+import threading
+import time
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode, urlsplit
+
+from django.conf import settings
+from django.db import connection, connections
+from django.urls import reverse
+from django.utils.crypto import get_random_string
+
+# views replayed by default and their shares of requests
+DEFAULT_MIX = {
+    'index': 30,
+    'group_posts': 15,
+    'profile': 15,
+    'post_detail': 25,
+    'follow_index': 10,
+    'add_comment': 5,
+}
+
+# views anonymous visitors are redirected from
+LOGIN_REQUIRED = {'follow_index', 'add_comment'}
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+def percentile(sorted_values, percent):
+    """Nearest-rank percentile of non-empty sorted values.
+    """
+    rank = max(1, -(-len(sorted_values) * percent // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def summarize(latencies, queries, errors):
+    """Returns dict of latency percentiles in milliseconds
+    and queries per request of a series of requests.
+    """
+    latencies = sorted(latencies)
+    summary = {'requests': len(latencies), 'errors': errors}
+    if latencies:
+        summary['latency_ms'] = {
+            **{f'p{p}': percentile(latencies, p) for p in PERCENTILES},
+            'mean': sum(latencies) / len(latencies),
+            'max': latencies[-1],
+        }
+    queries = [count for count in queries if count is not None]
+    if queries:
+        summary['queries'] = {
+            'mean': sum(queries) / len(queries),
+            'max': max(queries),
+        }
+    return summary
+
+
+class QueryCounter:
+    """Execute wrapper counting queries of a connection.
+    """
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class WSGITransport:
+    """Calls the WSGI application in-process, counting queries.
+    """
+    def __init__(self, application, host='127.0.0.1'):
+        self.application = application
+        self.host = host
+
+    def request(self, method, path, cookies, body=b'', content_type=''):
+        path, _, query = path.partition('?')
+        environ = {
+            'REQUEST_METHOD': method,
+            'SCRIPT_NAME': '',
+            'PATH_INFO': path,
+            'QUERY_STRING': query,
+            'SERVER_NAME': self.host,
+            'SERVER_PORT': '80',
+            'SERVER_PROTOCOL': 'HTTP/1.1',
+            'HTTP_HOST': self.host,
+            'REMOTE_ADDR': '127.0.0.1',
+            'CONTENT_TYPE': content_type,
+            'CONTENT_LENGTH': str(len(body)),
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': 'http',
+            'wsgi.input': io.BytesIO(body),
+            'wsgi.errors': io.StringIO(),
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+        }
+        if cookies:
+            environ['HTTP_COOKIE'] = cookies
+        started = {}
+
+        def start_response(status, headers, exc_info=None):
+            started['status'] = int(status.split()[0])
+            started['headers'] = headers
+
+        counter = QueryCounter()
+        with connection.execute_wrapper(counter):
+            response = self.application(environ, start_response)
+            try:
+                for _ in response:
+                    pass
+            finally:
+                if hasattr(response, 'close'):
+                    response.close()
+        set_cookies = [
+            value for name, value in started['headers']
+            if name.lower() == 'set-cookie'
+        ]
+        return started['status'], set_cookies, counter.count
+
+
+class HTTPTransport:
+    """Sends requests to a running server, queries are not known.
+    """
+    def __init__(self, url):
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.prefix = parts.path.rstrip('/')
+        self.local = threading.local()
+
+    def connection(self):
+        if getattr(self.local, 'connection', None) is None:
+            self.local.connection = http.client.HTTPConnection(
+                self.host, self.port, timeout=60
+            )
+        return self.local.connection
+
+    def request(self, method, path, cookies, body=b'', content_type=''):
+        headers = {'Host': self.host}
+        if cookies:
+            headers['Cookie'] = cookies
+        if content_type:
+            headers['Content-Type'] = content_type
+        try:
+            self.connection().request(
+                method, self.prefix + path, body=body or None,
+                headers=headers,
+            )
+            response = self.connection().getresponse()
+            response.read()
+        except (OSError, http.client.HTTPException):
+            # reconnect on the next request
+            self.connection().close()
+            self.local.connection = None
+            raise
+        return response.status, response.msg.get_all('Set-Cookie') or [], None
+
+
+class Visitor:
+    """Cookie jar of a visitor, logged in ones carry a session.
+    """
+    def __init__(self, transport, session_key=None):
+        self.transport = transport
+        self.cookies = SimpleCookie()
+        if session_key:
+            self.cookies[settings.SESSION_COOKIE_NAME] = session_key
+
+    def cookie_header(self):
+        return '; '.join(
+            f'{name}={morsel.value}' for name, morsel in self.cookies.items()
+        )
+
+    def request(self, method, path, data=None):
+        body, content_type = b'', ''
+        if data is not None:
+            if settings.CSRF_COOKIE_NAME not in self.cookies:
+                self.cookies[settings.CSRF_COOKIE_NAME] = get_random_string(64)
+            data = {
+                **data,
+                'csrfmiddlewaretoken':
+                    self.cookies[settings.CSRF_COOKIE_NAME].value,
+            }
+            body = urlencode(data).encode()
+            content_type = 'application/x-www-form-urlencoded'
+        status, set_cookies, queries = self.transport.request(
+            method, path, self.cookie_header(), body, content_type
+        )
+        for header in set_cookies:
+            self.cookies.load(header)
+        return status, queries
+
+
+class LoadTest:
+    """Closed-loop load: every worker thread sends the next request
+    as soon as the previous one completes. Each request is a view
+    picked by weights of mix with random arguments out of targets,
+    logged_in share of requests is sent by logged-in visitors.
+
+    targets: {'groups': [slug], 'authors': [username],
+              'posts': [post_id], 'sessions': [session_key]}
+    """
+    def __init__(self, transport, targets, mix=None, logged_in=0.2,
+                 seed=0):
+        self.transport = transport
+        self.targets = targets
+        self.mix = mix or DEFAULT_MIX
+        self.logged_in = logged_in if targets['sessions'] else 0
+        self.seed = seed
+        self.lock = threading.Lock()
+        self.results = []
+
+    def views(self, logged_in):
+        return [
+            (view, weight) for view, weight in self.mix.items()
+            if weight > 0 and (logged_in or view not in LOGIN_REQUIRED)
+        ]
+
+    def plan(self, generator):
+        """Returns (view, method, path, data, logged_in) of a request.
+        """
+        logged_in = generator.random() < self.logged_in
+        views = self.views(logged_in)
+        if not views:
+            logged_in = True
+            views = self.views(True)
+        view = generator.choices(
+            [view for view, _ in views], [weight for _, weight in views]
+        )[0]
+        method, data, kwargs = 'GET', None, {}
+        if view == 'group_posts':
+            kwargs = {'slug': generator.choice(self.targets['groups'])}
+        elif view == 'profile':
+            kwargs = {'username': generator.choice(self.targets['authors'])}
+        elif view in ('post_detail', 'add_comment'):
+            kwargs = {'post_id': generator.choice(self.targets['posts'])}
+        if view == 'add_comment':
+            method, data = 'POST', {'text': 'Комментарий нагрузочного теста'}
+        path = reverse(f'posts:{view}', kwargs=kwargs)
+        return view, method, path, data, logged_in
+
+    def worker(self, number, remaining, deadline):
+        generator = random.Random(self.seed * 1000 + number)
+        visitors = {
+            session_key: Visitor(self.transport, session_key)
+            for session_key in self.targets['sessions']
+        }
+        try:
+            while time.perf_counter() < deadline:
+                with self.lock:
+                    if remaining[0] == 0:
+                        return
+                    remaining[0] -= 1
+                view, method, path, data, logged_in = self.plan(generator)
+                visitor = Visitor(self.transport)
+                if logged_in:
+                    visitor = visitors[
+                        generator.choice(self.targets['sessions'])
+                    ]
+                started = time.perf_counter()
+                try:
+                    status, queries = visitor.request(method, path, data)
+                except Exception:
+                    status, queries = None, None
+                elapsed = (time.perf_counter() - started) * 1000
+                with self.lock:
+                    self.results.append((view, elapsed, status, queries))
+        finally:
+            connections.close_all()
+
+    def run(self, requests, concurrency=1, duration=None):
+        """Sends requests (or as many as fit into duration seconds)
+        and returns summary of them, overall and by view.
+        """
+        self.results = []
+        remaining = [requests]
+        deadline = time.perf_counter() + (duration or float('inf'))
+        started = time.perf_counter()
+        workers = [
+            threading.Thread(
+                target=self.worker, args=(number, remaining, deadline)
+            )
+            for number in range(concurrency)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - started
+        return self.summary(elapsed)
+
+    def summary(self, elapsed):
+        def is_error(status):
+            return status is None or status >= 400
+
+        summary = summarize(
+            [latency for _, latency, _, _ in self.results],
+            [queries for _, _, _, queries in self.results],
+            sum(is_error(status) for _, _, status, _ in self.results),
+        )
+        summary['duration'] = elapsed
+        summary['throughput'] = len(self.results) / elapsed
+        summary['views'] = {}
+        for view in self.mix:
+            results = [result for result in self.results if result[0] == view]
+            if results:
+                summary['views'][view] = summarize(
+                    [latency for _, latency, _, _ in results],
+                    [queries for _, _, _, queries in results],
+                    sum(is_error(status) for _, _, status, _ in results),
+                )
+        return summary
@@ -0,0 +1,82 @@
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils.module_loading import import_string
+
+BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'sqlite': 'core.cache_backends.SQLiteCache',
+}
+
+
+def run_worker(backend, location, keys, operations, seed, results):
+    """Read-through load: get a key, set it on miss, bump a counter
+    every tenth operation. Puts (hits, misses, seconds) to results.
+    """
+    cache = import_string(BACKENDS[backend])(location, {})
+    generator = random.Random(seed)
+    hits = misses = 0
+    started = time.perf_counter()
+    for number in range(operations):
+        key = f'bench:{int(generator.paretovariate(1.2)) % keys}'
+        if cache.get(key) is None:
+            misses += 1
+            cache.set(key, 'x' * 512, 60)
+        else:
+            hits += 1
+        if number % 10 == 0:
+            try:
+                cache.incr('bench:counter')
+            except ValueError:
+                cache.add('bench:counter', 1)
+    results.put((hits, misses, time.perf_counter() - started))
+
+
+class Command(BaseCommand):
+    help = (
+        'Compares per-process LocMemCache with the shared SQLite cache '
+        'under concurrent worker processes'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--operations', type=int, default=5000)
+        parser.add_argument('--keys', type=int, default=1000)
+
+    def run_backend(self, backend, location, options):
+        context = multiprocessing.get_context('fork')
+        results = context.Queue()
+        workers = [
+            context.Process(
+                target=run_worker,
+                args=(backend, location, options['keys'],
+                      options['operations'], seed, results),
+            )
+            for seed in range(options['workers'])
+        ]
+        started = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        stats = [results.get() for _ in workers]
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - started
+        hits = sum(hit for hit, _, _ in stats)
+        total = hits + sum(miss for _, miss, _ in stats)
+        return total / elapsed, hits / total
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as directory:
+            for backend in BACKENDS:
+                location = os.path.join(directory, f'{backend}.sqlite3')
+                throughput, hit_rate = self.run_backend(
+                    backend, location, options
+                )
+                self.stdout.write(
+                    f'{backend:<8} {options["workers"]} workers  '
+                    f'{throughput:10.0f} gets/s  hit rate {hit_rate:.1%}'
+                )
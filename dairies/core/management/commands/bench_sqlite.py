@@ -0,0 +1,174 @@
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.core.signals import request_finished, request_started
+from django.db import connections, OperationalError, transaction
+
+from core.replicas import copy_sqlite_database
+from posts.models import Comment, Follow, Post, User
+
+# the stock backend as Django configures it, compared with the profile
+# of DATABASES['default']
+STOCK = {'ENGINE': 'django.db.backends.sqlite3', 'CONN_MAX_AGE': 0}
+
+
+def read_page(generator, targets):
+    # what index and post_detail read
+    list(Post.objects.select_related('author', 'group')[:10])
+    list(
+        Comment.objects.filter(post_id=generator.choice(targets['posts']))
+        .select_related('author')[:20]
+    )
+
+
+@transaction.atomic
+def write_comment(generator, targets):
+    # add_comment reads the post before writing the comment
+    post = Post.objects.get(pk=generator.choice(targets['posts']))
+    Comment.objects.create(
+        post=post, author_id=generator.choice(targets['users']),
+        text='Комментарий нагрузочного теста',
+    )
+
+
+@transaction.atomic
+def write_follow(generator, targets):
+    user_id, author_id = generator.sample(targets['users'], 2)
+    follow, created = Follow.objects.get_or_create(
+        user_id=user_id, author_id=author_id
+    )
+    if not created:
+        follow.delete()
+
+
+def run_worker(targets, operations, write_share, seed, results):
+    """Runs operations requests, write_share of them write. Puts
+    (reads, writes, errors, seconds) to results.
+    """
+    generator = random.Random(seed)
+    reads = writes = errors = 0
+    started = time.perf_counter()
+    for _ in range(operations):
+        request_started.send(sender=None)
+        try:
+            if generator.random() >= write_share:
+                read_page(generator, targets)
+                reads += 1
+            else:
+                generator.choice((write_comment, write_follow))(
+                    generator, targets
+                )
+                writes += 1
+        except OperationalError:
+            # database is locked
+            errors += 1
+        finally:
+            # closes the connection unless CONN_MAX_AGE keeps it
+            request_finished.send(sender=None)
+    connections.close_all()
+    results.put((reads, writes, errors, time.perf_counter() - started))
+
+
+class Command(BaseCommand):
+    help = (
+        'Runs a read/write mix of worker processes on copies of the SQLite '
+        'database, with the stock backend and with the tuned profile '
+        'of DATABASES, and reports throughput and "database is locked" '
+        'errors of both'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--operations', type=int, default=500)
+        parser.add_argument(
+            '--writes', type=float, default=0.2,
+            help='Share of operations writing comments or follows',
+        )
+
+    def use_database(self, database):
+        """Points the default alias at database, worker processes
+        forked afterwards connect to it.
+        """
+        connections.close_all()
+        settings.DATABASES['default'] = database
+        try:
+            del connections['default']
+        except AttributeError:
+            # not connected in this thread yet
+            pass
+
+    def targets(self):
+        targets = {
+            'posts': list(
+                Post.objects.order_by('?').values_list('pk', flat=True)[
+                    :1000
+                ]
+            ),
+            'users': list(
+                User.objects.order_by('?').values_list('pk', flat=True)[
+                    :1000
+                ]
+            ),
+        }
+        connections.close_all()
+        if not targets['posts'] or len(targets['users']) < 2:
+            raise CommandError('No posts to load, run seed_dairies first')
+        return targets
+
+    def run_profile(self, targets, options):
+        context = multiprocessing.get_context('fork')
+        results = context.Queue()
+        workers = [
+            context.Process(
+                target=run_worker,
+                args=(targets, options['operations'], options['writes'],
+                      seed, results),
+            )
+            for seed in range(options['workers'])
+        ]
+        started = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        stats = [results.get() for _ in workers]
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - started
+        reads, writes, errors = (
+            sum(stat[column] for stat in stats) for column in range(3)
+        )
+        return reads / elapsed, writes / elapsed, errors
+
+    def handle(self, *args, **options):
+        database = settings.DATABASES['default']
+        if (
+            connections['default'].vendor != 'sqlite'
+            or not os.path.isfile(database['NAME'])
+        ):
+            raise CommandError('The default database is not an SQLite file')
+        profiles = {'stock': {**database, **STOCK}, 'tuned': database}
+        # version bumps of the written rows stay in worker processes
+        settings.CACHES = {
+            'default': {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            },
+        }
+        with tempfile.TemporaryDirectory() as directory:
+            for name, profile in profiles.items():
+                # every profile starts from the same copy
+                copy = os.path.join(directory, f'{name}.sqlite3')
+                copy_sqlite_database(database['NAME'], copy)
+                self.use_database({**profile, 'NAME': copy})
+                reads, writes, errors = self.run_profile(
+                    self.targets(), options
+                )
+                self.stdout.write(
+                    f'{name:<6} {options["workers"]} workers  '
+                    f'{reads:8.0f} reads/s  {writes:7.0f} writes/s  '
+                    f'{errors} locked'
+                )
+        self.use_database(database)
@@ -0,0 +1,264 @@
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from urllib.error import URLError
+from urllib.request import urlopen
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+
+from core.loadtest import (
+    DEFAULT_MIX, LOGIN_REQUIRED, PERCENTILES, HTTPTransport, LoadTest,
+    WSGITransport,
+)
+from posts.models import Group, Post
+
+User = get_user_model()
+
+# views needing targets of a kind, others need none
+VIEW_TARGETS = {
+    'group_posts': 'groups',
+    'profile': 'authors',
+    'post_detail': 'posts',
+    'add_comment': 'posts',
+}
+
+
+def parse_mix(value):
+    """Parses 'index=30,post_detail=25' into {view: weight}.
+    """
+    mix = {}
+    for item in value.split(','):
+        view, _, weight = item.partition('=')
+        if view.strip() not in DEFAULT_MIX:
+            raise CommandError(
+                f'Unknown view {view!r}, choose from {", ".join(DEFAULT_MIX)}'
+            )
+        mix[view.strip()] = float(weight or 1)
+    return mix
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class Command(BaseCommand):
+    help = (
+        'Replays a mix of anonymous and logged-in requests against the '
+        'WSGI application and reports throughput, latency percentiles '
+        'and queries per request. add_comment requests write comments'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument(
+            '--duration', type=float,
+            help='Stop after this many seconds even if requests remain',
+        )
+        parser.add_argument('--concurrency', type=int, default=4)
+        parser.add_argument('--warmup', type=int, default=50)
+        parser.add_argument(
+            '--mix', type=parse_mix, default=DEFAULT_MIX,
+            help='Weights of views, e.g. index=30,post_detail=25',
+        )
+        parser.add_argument(
+            '--logged-in', type=float, default=0.2,
+            help='Share of requests sent by logged-in users',
+        )
+        parser.add_argument(
+            '--users', type=int, default=20,
+            help='Number of logged-in users taking part',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        target = parser.add_mutually_exclusive_group()
+        target.add_argument(
+            '--url',
+            help='Base URL of a running server using the same database, '
+                 'by default the application is called in-process',
+        )
+        target.add_argument(
+            '--gunicorn', type=int, metavar='WORKERS',
+            help='Launch gunicorn with this many workers and load it',
+        )
+        parser.add_argument(
+            '--output', help='Write results as JSON to this file',
+        )
+        parser.add_argument(
+            '--compare', help='JSON results of a previous run to compare to',
+        )
+
+    def targets(self, users):
+        targets = {
+            'groups': list(
+                Group.objects.order_by('?').values_list('slug', flat=True)[
+                    :1000
+                ]
+            ),
+            'authors': list(
+                User.objects.filter(stats__posts_count__gt=0)
+                .order_by('?').values_list('username', flat=True)[:1000]
+            ),
+            'posts': list(
+                Post.objects.order_by('?').values_list('pk', flat=True)[
+                    :1000
+                ]
+            ),
+            'sessions': [],
+        }
+        if not targets['posts']:
+            raise CommandError('No posts to load, run seed_dairies first')
+        # followers see a non-empty subscriptions feed
+        for user in User.objects.filter(
+            follower__isnull=False
+        ).distinct().order_by('?')[:users]:
+            client = Client()
+            client.force_login(user)
+            targets['sessions'].append(
+                client.cookies[settings.SESSION_COOKIE_NAME].value
+            )
+        return targets
+
+    @contextmanager
+    def transport(self, options):
+        if options['url']:
+            yield HTTPTransport(options['url']), options['url']
+            return
+        if not options['gunicorn']:
+            from dairies.wsgi import application
+
+            yield WSGITransport(application), 'wsgi'
+            return
+        port = free_port()
+        url = f'http://127.0.0.1:{port}'
+        server = subprocess.Popen(
+            [
+                sys.executable, '-m', 'gunicorn', 'dairies.wsgi:application',
+                '--bind', f'127.0.0.1:{port}',
+                '--workers', str(options['gunicorn']),
+            ],
+            env={
+                **os.environ,
+                'DJANGO_SETTINGS_MODULE': os.environ.get(
+                    'DJANGO_SETTINGS_MODULE', 'dairies.settings'
+                ),
+            },
+        )
+        try:
+            self.wait_for(server, url)
+            yield HTTPTransport(url), f'gunicorn x{options["gunicorn"]}'
+        finally:
+            server.terminate()
+            server.wait()
+
+    def wait_for(self, server, url, timeout=30):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise CommandError('gunicorn exited, is it installed?')
+            try:
+                urlopen(url, timeout=1).close()
+                return
+            except URLError as error:
+                # any HTTP response means the server is up
+                if hasattr(error, 'code'):
+                    return
+            except OSError:
+                pass
+            time.sleep(0.2)
+        raise CommandError(f'gunicorn did not start within {timeout} s')
+
+    def handle(self, *args, **options):
+        targets = self.targets(options['users'])
+        mix = {
+            view: weight for view, weight in options['mix'].items()
+            if targets.get(VIEW_TARGETS.get(view), True)
+            and (view not in LOGIN_REQUIRED or targets['sessions'])
+        }
+        if not mix:
+            raise CommandError('No view of the mix can be requested')
+        with self.transport(options) as (transport, target):
+            load = LoadTest(
+                transport, targets, mix, options['logged_in'], options['seed']
+            )
+            if options['warmup']:
+                load.run(options['warmup'], options['concurrency'])
+            summary = load.run(
+                options['requests'], options['concurrency'],
+                options['duration'],
+            )
+        results = {
+            'started': datetime.now(timezone.utc).isoformat(),
+            'target': target,
+            'concurrency': options['concurrency'],
+            'logged_in': options['logged_in'],
+            'seed': options['seed'],
+            'mix': mix,
+            **summary,
+        }
+        self.report(results)
+        if options['compare']:
+            with open(options['compare']) as file:
+                self.compare(json.load(file), results)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump(results, file, indent=2)
+
+    def row(self, name, summary):
+        latency = summary.get('latency_ms', {})
+        queries = summary.get('queries')
+        return '{:<14}{:>7}{:>7}{}{:>9}'.format(
+            name,
+            summary['requests'],
+            summary['errors'],
+            ''.join(
+                '{:>9.1f}'.format(latency.get(f'p{p}', 0))
+                for p in PERCENTILES
+            ),
+            '{:.1f}'.format(queries['mean']) if queries else '-',
+        )
+
+    def report(self, results):
+        self.stdout.write(
+            f'{results["target"]}, {results["concurrency"]} workers: '
+            f'{results["requests"]} requests in {results["duration"]:.1f} s, '
+            f'{results["throughput"]:.1f} requests/s'
+        )
+        self.stdout.write('{:<14}{:>7}{:>7}{}{:>9}'.format(
+            'view', 'reqs', 'errors',
+            ''.join('{:>9}'.format(f'p{p} ms') for p in PERCENTILES),
+            'queries',
+        ))
+        for view, summary in results['views'].items():
+            self.stdout.write(self.row(view, summary))
+        self.stdout.write(self.row('total', results))
+
+    def compare(self, previous, results):
+        def change(old, new):
+            return f'{(new - old) / old:+.0%}' if old else 'n/a'
+
+        self.stdout.write(
+            'throughput {:.1f} -> {:.1f} requests/s ({})'.format(
+                previous['throughput'], results['throughput'],
+                change(previous['throughput'], results['throughput']),
+            )
+        )
+        for view, summary in results['views'].items():
+            old = previous['views'].get(view)
+            if not old or 'latency_ms' not in old:
+                continue
+            self.stdout.write('{:<14} p95 {:.1f} -> {:.1f} ms ({})'.format(
+                view,
+                old['latency_ms']['p95'], summary['latency_ms']['p95'],
+                change(
+                    old['latency_ms']['p95'], summary['latency_ms']['p95']
+                ),
+            ))
@@ -0,0 +1,65 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, DEFAULT_DB_ALIAS
+
+from core.replicas import copy_sqlite_database
+
+
+class Command(BaseCommand):
+    help = (
+        'Copies the SQLite primary database over every SQLite alias '
+        'of DATABASE_REPLICAS, once or every --interval seconds, '
+        'which has to be below REPLICA_PIN_SECONDS'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=float,
+            help='Repeat the copy every this many seconds until stopped',
+        )
+        parser.add_argument(
+            '--database', default=DEFAULT_DB_ALIAS,
+            help='Alias of the primary database, "default" by default',
+        )
+
+    def handle(self, *args, **options):
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError(
+                'No replicas configured, list SQLite files in DB_REPLICAS'
+            )
+        # visitors read their own writes only if replicas catch up
+        # before the pin to the primary expires
+        interval = options['interval']
+        if interval is not None and interval >= settings.REPLICA_PIN_SECONDS:
+            raise CommandError(
+                f'--interval has to be below REPLICA_PIN_SECONDS '
+                f'({settings.REPLICA_PIN_SECONDS} s)'
+            )
+        primary = connections[options['database']]
+        replicas = [connections[alias] for alias in settings.DATABASE_REPLICAS]
+        for database in (primary, *replicas):
+            if database.vendor != 'sqlite':
+                raise CommandError(
+                    'Only SQLite databases are copied, other engines '
+                    'replicate with their own tools'
+                )
+            if database.is_in_memory_db():
+                raise CommandError(
+                    f'{database.alias} is an in-memory database, '
+                    'there is no file to copy'
+                )
+        while True:
+            started = time.perf_counter()
+            for replica in replicas:
+                copy_sqlite_database(
+                    primary.settings_dict['NAME'],
+                    replica.settings_dict['NAME'],
+                )
+            self.stdout.write('Synced {} replicas in {:.2f} s'.format(
+                len(replicas), time.perf_counter() - started
+            ))
+            if not interval:
+                return
+            time.sleep(max(0, interval - time.perf_counter() + started))
@@ -0,0 +1,123 @@
+# routing of reads to database replicas with read-your-writes pinning
+
+import os
+import random
+import sqlite3
+import threading
+from contextlib import closing, contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+# requests carrying this cookie read from the primary, it is set
+# for REPLICA_PIN_SECONDS after a request that wrote to the database
+PIN_COOKIE = 'primary_pin'
+
+_state = threading.local()
+
+
+@contextmanager
+def replica_reads(enabled=True):
+    """Lets reads of the current thread go to replicas until a write.
+    Yields the state, state.wrote tells whether anything was written.
+    Code outside of the block (commands, background workers) always
+    reads from the primary.
+    """
+    previous = getattr(_state, 'current', None)
+    state = _state.current = ReplicaState(enabled)
+    try:
+        yield state
+    finally:
+        _state.current = previous
+
+
+class ReplicaState:
+    def __init__(self, enabled):
+        self.enabled = enabled
+        self.wrote = False
+        # replica all reads of the block go to, picked by the first one
+        self.alias = None
+
+
+def reads_replicas():
+    """Tells whether reads of the current thread may go to replicas.
+    """
+    state = getattr(_state, 'current', None)
+    return bool(
+        state is not None and state.enabled and settings.DATABASE_REPLICAS
+    )
+
+
+class PrimaryReplicaRouter:
+    """Sends reads inside replica_reads() blocks to an alias
+    of DATABASE_REPLICAS picked at random once per block, so a page
+    doesn't mix rows of copies synced at different times. Everything
+    else goes to 'default'. After the first write, and inside
+    transactions, the thread reads from 'default' so it sees its own
+    writes.
+    """
+    def db_for_read(self, model, **hints):
+        if (
+            not reads_replicas()
+            or connections['default'].in_atomic_block
+        ):
+            return 'default'
+        state = _state.current
+        if state.alias is None:
+            state.alias = random.choice(settings.DATABASE_REPLICAS)
+        return state.alias
+
+    def db_for_write(self, model, **hints):
+        state = getattr(_state, 'current', None)
+        if state is not None:
+            state.wrote = True
+            state.enabled = False
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # every alias holds the same data
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        # replicas are copies of the migrated primary
+        return db not in settings.DATABASE_REPLICAS
+
+
+class ReplicaReadsMiddleware:
+    """Reads of GET and HEAD requests go to replicas, unless the visitor
+    wrote something less than REPLICA_PIN_SECONDS ago: a write pins
+    the visitor to the primary with a cookie, so e.g. the profile
+    shown after post_create already lists the new post.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        enabled = (
+            request.method in ('GET', 'HEAD')
+            and PIN_COOKIE not in request.COOKIES
+        )
+        with replica_reads(enabled) as state:
+            response = self.get_response(request)
+        if state.wrote and settings.DATABASE_REPLICAS:
+            response.set_cookie(
+                PIN_COOKIE, '1',
+                max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
+
+
+def copy_sqlite_database(source, target):
+    """Copies SQLite database file source over target with the online
+    backup API. The copy is written aside and moved in place, so
+    readers of target see either the previous or the new copy.
+    """
+    temporary = f'{target}.sync'
+    with closing(sqlite3.connect(source)) as primary:
+        with closing(sqlite3.connect(temporary)) as replica:
+            primary.backup(replica)
+            # replicas are read-only, they need no write-ahead log
+            replica.execute('PRAGMA journal_mode=DELETE')
+    os.replace(temporary, target)
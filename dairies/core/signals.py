@@ -0,0 +1,19 @@
+# signal receivers of core app
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from core.db_backends.sqlite3.base import DatabaseWrapper
+
+
+def apply_pragmas(connection, pragmas):
+    for name, value in pragmas.items():
+        connection.execute(f'PRAGMA {name}={value}')
+
+
+@receiver(connection_created, sender=DatabaseWrapper)
+def configure_sqlite(sender, connection, **kwargs):
+    """Runs SQLITE_PRAGMAS on every new connection of the tuned backend.
+    """
+    apply_pragmas(connection.connection, settings.SQLITE_PRAGMAS)
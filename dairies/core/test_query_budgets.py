@@ -0,0 +1,414 @@
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.tokens import default_token_generator
+from django.db import connection
+from django.test import Client, override_settings, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+
+import about.urls
+import api.urls
+import posts.urls
+import users.urls
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+# seconds a request may take on the larger dataset: the median
+# of TIMING_RUNS rounds of requests after a warm-up round, so cold
+# imports or a hiccup of the machine do not fail the test
+TIME_BUDGET = 1.0
+TIMING_RUNS = 5
+
+# view -> (client, maximum number of queries), clients are 'guest',
+# 'author' (writes the measured post) and 'reader' (follows the author)
+QUERY_BUDGETS = {
+    'posts:index': ('guest', 1),
+    'posts:group_posts': ('guest', 2),
+    'posts:profile': ('guest', 2),
+    'posts:post_detail': ('guest', 2),
+    'posts:search': ('guest', 2),
+    'posts:post_create': ('author', 5),
+    'posts:post_edit': ('author', 7),
+    'posts:post_delete': ('author', 11),
+    'posts:add_comment': ('reader', 4),
+    'posts:comments_more': ('guest', 2),
+    'posts:edit_comment': ('reader', 5),
+    'posts:delete_comment': ('reader', 11),
+    'posts:follow_index': ('reader', 4),
+    'posts:profile_follow': ('reader', 15),
+    'posts:profile_unfollow': ('reader', 11),
+    'posts:profile_export': ('author', 2),
+    'posts:feed_rss': ('guest', 1),
+    'posts:feed_atom': ('guest', 1),
+    'posts:group_feed_rss': ('guest', 2),
+    'posts:group_feed_atom': ('guest', 2),
+    'posts:profile_feed_rss': ('guest', 2),
+    'posts:profile_feed_atom': ('guest', 2),
+    'users:signup': ('guest', 0),
+    'users:login': ('guest', 0),
+    'users:logout': ('author', 4),
+    'users:password_change': ('author', 2),
+    'users:password_change_done': ('author', 2),
+    'users:password_reset': ('guest', 0),
+    'users:password_reset_done': ('guest', 0),
+    'users:password_reset_confirm': ('guest', 5),
+    'users:password_reset_complete': ('guest', 0),
+    'about:author': ('guest', 0),
+    'api:posts': ('guest', 1),
+    'api:post_detail': ('guest', 1),
+    'api:post_comments': ('guest', 2),
+    'api:groups': ('guest', 1),
+    'api:group_detail': ('guest', 1),
+    'api:group_posts': ('guest', 2),
+    'api:profile': ('guest', 1),
+    'api:profile_posts': ('guest', 2),
+    'api:follow_feed': ('reader', 4),
+}
+
+# view -> (client, maximum number of queries) of submitting its form
+POST_QUERY_BUDGETS = {
+    'posts:post_create': ('author', 14),
+    'posts:post_edit': ('author', 13),
+    'posts:add_comment': ('reader', 10),
+    'posts:edit_comment': ('reader', 9),
+    'posts:profile_follow': ('reader', 15),
+    'posts:profile_unfollow': ('reader', 11),
+    'users:signup': ('guest', 6),
+    'users:login': ('guest', 9),
+}
+
+# views changing the session of the client get a client of their own
+STATEFUL_VIEWS = {
+    'users:logout', 'users:password_reset_confirm', 'users:signup',
+    'users:login',
+}
+
+
+def url_names(*modules):
+    return [
+        f'{module.app_name}:{pattern.name}'
+        for module in modules for pattern in module.urlpatterns
+    ]
+
+
+def format_queries(queries):
+    return '\n'.join(
+        f'{number}. {query["sql"]}'
+        for number, query in enumerate(queries, 1)
+    )
+
+
+@override_settings(
+    CACHES={
+        'default': {
+            'BACKEND': 'django.core.cache.backends.dummy.DummyCache'
+        }
+    },
+    POSTS_PAGE_CACHE=False,
+)
+class QueryBudgetTests(TestCase):
+    """Requests every page with caches disabled, so the numbers are
+    those of a cold cache, on a dataset and on a ten times larger one.
+    """
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.test_author = User.objects.create_user(username='rock4ts')
+        cls.test_reader = User.objects.create_user(username='Celebrity')
+        cls.test_group = Group.objects.create(
+            title='Тестовое сообщество',
+            description='Тестовое описание сообщества',
+        )
+        cls.test_post = Post.objects.create(
+            text='Тестовый текст',
+            author=cls.test_author,
+            group=cls.test_group,
+        )
+        cls.test_comment = Comment.objects.create(
+            post=cls.test_post,
+            author=cls.test_reader,
+            text='Тестовый комментарий',
+        )
+        Follow.objects.create(user=cls.test_reader, author=cls.test_author)
+        cls.visitor = User.objects.create_user(
+            username='visitor', password='Visitor-Password-1'
+        )
+        cls.seeded = 0
+
+    def seed(self, scale):
+        """Grows the dataset up to scale units, every unit adds authors
+        followed by the reader, groups, posts and comments.
+        """
+        author = QueryBudgetTests.test_author
+        reader = QueryBudgetTests.test_reader
+        for unit in range(self.seeded, scale):
+            group = Group.objects.create(
+                title=f'Сообщество {unit}', description='Описание'
+            )
+            writer = User.objects.create_user(username=f'writer{unit}')
+            Follow.objects.create(user=reader, author=writer)
+            for i in range(4):
+                for post_author, post_group in (
+                    (author, QueryBudgetTests.test_group),
+                    (writer, group),
+                    (writer, None),
+                ):
+                    post = Post.objects.create(
+                        text=f'Тестовый текст {unit} {i}',
+                        author=post_author,
+                        group=post_group,
+                    )
+                    Comment.objects.create(
+                        post=post, author=reader, text='Комментарий'
+                    )
+            for commenter in (writer, reader, author):
+                Comment.objects.create(
+                    post=QueryBudgetTests.test_post,
+                    author=commenter,
+                    text=f'Тестовый комментарий {unit}',
+                )
+        self.seeded = scale
+
+    def requests(self):
+        """Returns {view: url}, objects changed by the requests
+        are created anew every time.
+        """
+        author = QueryBudgetTests.test_author
+        reader = QueryBudgetTests.test_reader
+        post = QueryBudgetTests.test_post
+        comment = QueryBudgetTests.test_comment
+        doomed_post = Post.objects.create(text='Удаляемый', author=author)
+        doomed_comment = Comment.objects.create(
+            post=post, author=reader, text='Удаляемый'
+        )
+        followed = User.objects.create_user(
+            username=f'followed{User.objects.count()}'
+        )
+        return {
+            'posts:index': reverse('posts:index'),
+            'posts:group_posts': reverse(
+                'posts:group_posts',
+                kwargs={'slug': QueryBudgetTests.test_group.slug},
+            ),
+            'posts:profile': reverse(
+                'posts:profile', kwargs={'username': author.username}
+            ),
+            'posts:post_detail': reverse(
+                'posts:post_detail', kwargs={'post_id': post.pk}
+            ),
+            'posts:search': reverse('posts:search') + '?q=текст',
+            'posts:post_create': reverse('posts:post_create'),
+            'posts:post_edit': reverse(
+                'posts:post_edit', kwargs={'post_id': post.pk}
+            ),
+            'posts:post_delete': reverse(
+                'posts:post_delete', kwargs={'post_id': doomed_post.pk}
+            ),
+            'posts:add_comment': reverse(
+                'posts:add_comment', kwargs={'post_id': post.pk}
+            ),
+            'posts:comments_more': reverse(
+                'posts:comments_more', kwargs={'post_id': post.pk}
+            ),
+            'posts:edit_comment': reverse(
+                'posts:edit_comment', kwargs={'comment_id': comment.pk}
+            ),
+            'posts:delete_comment': reverse(
+                'posts:delete_comment',
+                kwargs={'comment_id': doomed_comment.pk},
+            ),
+            'posts:follow_index': reverse('posts:follow_index'),
+            'posts:profile_follow': reverse(
+                'posts:profile_follow',
+                kwargs={'username': followed.username},
+            ),
+            'posts:profile_unfollow': reverse(
+                'posts:profile_unfollow',
+                kwargs={'username': followed.username},
+            ),
+            'posts:profile_export': reverse(
+                'posts:profile_export', kwargs={'username': author.username}
+            ),
+            'posts:feed_rss': reverse('posts:feed_rss'),
+            'posts:feed_atom': reverse('posts:feed_atom'),
+            'posts:group_feed_rss': reverse(
+                'posts:group_feed_rss',
+                kwargs={'slug': QueryBudgetTests.test_group.slug},
+            ),
+            'posts:group_feed_atom': reverse(
+                'posts:group_feed_atom',
+                kwargs={'slug': QueryBudgetTests.test_group.slug},
+            ),
+            'posts:profile_feed_rss': reverse(
+                'posts:profile_feed_rss', kwargs={'username': author.username}
+            ),
+            'posts:profile_feed_atom': reverse(
+                'posts:profile_feed_atom',
+                kwargs={'username': author.username},
+            ),
+            'users:signup': reverse('users:signup'),
+            'users:login': reverse('users:login'),
+            'users:logout': reverse('users:logout'),
+            'users:password_change': reverse('users:password_change'),
+            'users:password_change_done': reverse(
+                'users:password_change_done'
+            ),
+            'users:password_reset': reverse('users:password_reset'),
+            'users:password_reset_done': reverse(
+                'users:password_reset_done'
+            ),
+            'users:password_reset_confirm': reverse(
+                'users:password_reset_confirm',
+                kwargs={
+                    'uidb64': urlsafe_base64_encode(force_bytes(reader.pk)),
+                    'token': default_token_generator.make_token(
+                        User.objects.get(pk=reader.pk)
+                    ),
+                },
+            ),
+            'users:password_reset_complete': reverse(
+                'users:password_reset_complete'
+            ),
+            'about:author': reverse('about:author'),
+            'api:posts': reverse('api:posts'),
+            'api:post_detail': reverse(
+                'api:post_detail', kwargs={'post_id': post.pk}
+            ),
+            'api:post_comments': reverse(
+                'api:post_comments', kwargs={'post_id': post.pk}
+            ),
+            'api:groups': reverse('api:groups'),
+            'api:group_detail': reverse(
+                'api:group_detail',
+                kwargs={'slug': QueryBudgetTests.test_group.slug},
+            ),
+            'api:group_posts': reverse(
+                'api:group_posts',
+                kwargs={'slug': QueryBudgetTests.test_group.slug},
+            ),
+            'api:profile': reverse(
+                'api:profile', kwargs={'username': author.username}
+            ),
+            'api:profile_posts': reverse(
+                'api:profile_posts', kwargs={'username': author.username}
+            ),
+            'api:follow_feed': reverse('api:follow_feed'),
+        }
+
+    def post_data(self):
+        """Returns {view: data} of forms submitted to POST_QUERY_BUDGETS.
+        """
+        username = f'newcomer{User.objects.count()}'
+        group = QueryBudgetTests.test_group
+        return {
+            'posts:post_create': {'text': 'Новый текст', 'group': group.pk},
+            'posts:post_edit': {'text': 'Тестовый текст', 'group': group.pk},
+            'posts:add_comment': {'text': 'Новый комментарий'},
+            'posts:edit_comment': {'text': 'Тестовый комментарий'},
+            'posts:profile_follow': {},
+            'posts:profile_unfollow': {},
+            'users:signup': {
+                'username': username,
+                'password1': 'Newcomer-Password-1',
+                'password2': 'Newcomer-Password-1',
+            },
+            'users:login': {
+                'username': 'visitor', 'password': 'Visitor-Password-1',
+            },
+        }
+
+    def client_for(self, name):
+        client = Client()
+        users = {
+            'author': QueryBudgetTests.test_author,
+            'reader': QueryBudgetTests.test_reader,
+        }
+        if name in users:
+            client.force_login(users[name])
+        return client
+
+    def measure_round(self):
+        """Returns {(method, view): (queries, seconds)} of requesting
+        every view and submitting every form once.
+        """
+        # logging in changes last_login, so clients come before the
+        # password reset token
+        clients = {
+            name: self.client_for(name)
+            for name in ('guest', 'author', 'reader')
+        }
+        measurements = {}
+        for method, budgets in (
+            ('GET', QUERY_BUDGETS), ('POST', POST_QUERY_BUDGETS)
+        ):
+            # objects changed by GET requests are created anew for POST
+            urls = self.requests()
+            data = self.post_data() if method == 'POST' else {}
+            for view, (client_name, _) in budgets.items():
+                client = clients[client_name]
+                if view in STATEFUL_VIEWS:
+                    client = self.client_for(client_name)
+                with CaptureQueriesContext(connection) as queries:
+                    start = time.perf_counter()
+                    response = getattr(client, method.lower())(
+                        urls[view], data.get(view)
+                    )
+                    elapsed = time.perf_counter() - start
+                # accepted forms redirect
+                self.assertIn(
+                    response.status_code,
+                    (302,) if method == 'POST' else (200, 302), view,
+                )
+                measurements[method, view] = (
+                    queries.captured_queries, elapsed
+                )
+        return measurements
+
+    def measure(self):
+        """Returns {(method, view): (queries, seconds)}, queries of
+        the warm-up round and the median time of TIMING_RUNS rounds
+        after it.
+        """
+        rounds = [self.measure_round() for _ in range(TIMING_RUNS + 1)]
+        return {
+            key: (queries, statistics.median(
+                measurements[key][1] for measurements in rounds[1:]
+            ))
+            for key, (queries, _) in rounds[0].items()
+        }
+
+    def test_every_view_has_budget(self):
+        self.assertCountEqual(
+            url_names(posts.urls, users.urls, about.urls, api.urls),
+            QUERY_BUDGETS,
+        )
+
+    def test_views_stay_within_budgets(self):
+        self.seed(1)
+        small = self.measure()
+        self.seed(10)
+        large = self.measure()
+        for method, budgets in (
+            ('GET', QUERY_BUDGETS), ('POST', POST_QUERY_BUDGETS)
+        ):
+            for view, (_, budget) in budgets.items():
+                small_queries, _ = small[method, view]
+                large_queries, elapsed = large[method, view]
+                with self.subTest(method=method, view=view):
+                    self.assertLessEqual(
+                        len(large_queries), budget,
+                        f'{method} {view} ran {len(large_queries)} '
+                        'queries:\n' + format_queries(large_queries),
+                    )
+                    self.assertEqual(
+                        len(small_queries), len(large_queries),
+                        f'{method} {view} queries grow with the dataset, '
+                        f'small:\n{format_queries(small_queries)}\nlarge:\n'
+                        + format_queries(large_queries),
+                    )
+                    self.assertLess(elapsed, TIME_BUDGET)
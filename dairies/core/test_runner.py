@@ -0,0 +1,34 @@
+# test runner keeping tests away from the cache file of the site
+
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class TemporaryCacheRunner(DiscoverRunner):
+    """Points the SQLite cache at a file in a temporary directory,
+    removed after the run, so tests neither read entries of the site
+    nor leave theirs behind.
+    """
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.cache_directory = tempfile.mkdtemp()
+        self.cache_settings = override_settings(CACHES={
+            **settings.CACHES,
+            'default': {
+                **settings.CACHES['default'],
+                'LOCATION': os.path.join(
+                    self.cache_directory, 'cache.sqlite3'
+                ),
+            },
+        })
+        self.cache_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.cache_settings.disable()
+        shutil.rmtree(self.cache_directory, ignore_errors=True)
+        super().teardown_test_environment(**kwargs)
@@ -1,6 +1,35 @@
+import json
+import multiprocessing
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
 from http import HTTPStatus
+from io import StringIO
 
-from django.test import TestCase
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command, CommandError
+from django.db import connection, connections, transaction
+from django.http import HttpResponse
+from django.test import (
+    override_settings, RequestFactory, SimpleTestCase, TestCase,
+    TransactionTestCase,
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.cache_backends import SQLiteCache
+from core.loadtest import percentile, summarize
+from core.replicas import (
+    copy_sqlite_database, PIN_COOKIE, PrimaryReplicaRouter, replica_reads,
+    ReplicaReadsMiddleware,
+)
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
 
 
 class ViewTestClass(TestCase):
@@ -8,3 +37,365 @@ class ViewTestClass(TestCase):
         response = self.client.get('/nonexist_page/')
         self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
         self.assertTemplateUsed(response, 'core/404.html')
+
+
+class TemporaryCacheRunnerTests(SimpleTestCase):
+    def test_cache_file_is_temporary(self):
+        location = settings.CACHES['default']['LOCATION']
+        self.assertTrue(location.startswith(tempfile.gettempdir()))
+        self.assertEqual(cache._location, location)
+
+
+def increment_shared_counter(location, times):
+    cache = SQLiteCache(location, {})
+    for _ in range(times):
+        cache.incr('counter')
+
+
+class SQLiteCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.location = os.path.join(self.directory, 'cache.sqlite3')
+        self.cache = self.create_cache()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def create_cache(self, **options):
+        return SQLiteCache(self.location, {'OPTIONS': options})
+
+    def test_values_are_shared_between_instances(self):
+        self.cache.set('post', {'text': 'Тестовый текст'})
+        self.cache.set_many({'a': 1, 'b': [2]})
+        other_cache = self.create_cache()
+        self.assertEqual(other_cache.get('post'), {'text': 'Тестовый текст'})
+        self.assertEqual(other_cache.get_many(['a', 'b', 'c']),
+                         {'a': 1, 'b': [2]})
+        other_cache.delete('post')
+        self.assertIsNone(self.cache.get('post'))
+
+    def test_add_and_timeouts(self):
+        self.assertTrue(self.cache.add('key', 'first', 0.1))
+        self.assertFalse(self.cache.add('key', 'second'))
+        time.sleep(0.15)
+        self.assertIsNone(self.cache.get('key'))
+        self.assertFalse(self.cache.has_key('key'))
+        self.assertTrue(self.cache.add('key', 'third', None))
+        self.assertEqual(self.cache.get('key'), 'third')
+
+    def test_incr_is_atomic_across_processes(self):
+        self.cache.set('counter', 0)
+        context = multiprocessing.get_context('fork')
+        workers = [
+            context.Process(
+                target=increment_shared_counter, args=(self.location, 50)
+            )
+            for _ in range(4)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(self.cache.get('counter'), 200)
+        self.assertEqual(self.cache.decr('counter', 10), 190)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_least_recently_used_entries_are_evicted(self):
+        cache = self.create_cache(
+            MAX_ENTRIES=10, CULL_FREQUENCY=5, ACCESS_RESOLUTION=0
+        )
+        for number in range(10):
+            cache.set(f'key{number}', number)
+        cache.get('key0')  # recently used, must survive
+        cache.set('key10', 10)
+        self.assertEqual(cache.get('key0'), 0)
+        self.assertIsNone(cache.get('key1'))
+        self.assertEqual(cache.get('key10'), 10)
+
+    def test_memory_cap_is_respected(self):
+        cache = self.create_cache(MAX_SIZE=10 * 1024)
+        for number in range(100):
+            cache.set(f'key{number}', 'x' * 1024)
+        entries, size = cache._connection.execute(
+            'SELECT entries, size FROM cache_stats'
+        ).fetchone()
+        self.assertLessEqual(size, 10 * 1024)
+        stored_entries = cache._connection.execute(
+            'SELECT COUNT(*) FROM cache'
+        ).fetchone()[0]
+        self.assertEqual(entries, stored_entries)
+        self.assertIsNotNone(cache.get('key99'))
+
+
+class LoadTestTests(TransactionTestCase):
+    def setUp(self):
+        author = User.objects.create_user(username='rock4ts')
+        reader = User.objects.create_user(username='Celebrity')
+        group = Group.objects.create(
+            title='Тестовое сообщество',
+            description='Тестовое описание сообщества',
+        )
+        Follow.objects.create(user=reader, author=author)
+        for i in range(3):
+            Post.objects.create(
+                text='Тестовый текст ' + str(i), author=author, group=group
+            )
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_percentiles(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([7], 95), 7)
+        summary = summarize([3, 1, 2], [2, None, 4], 1)
+        self.assertEqual(summary['latency_ms']['max'], 3)
+        self.assertEqual(summary['queries'], {'mean': 3, 'max': 4})
+        self.assertEqual(summary['errors'], 1)
+
+    def test_replays_mix_in_process(self):
+        output = os.path.join(self.directory, 'results.json')
+        # in-memory test database locks tables between threads
+        call_command(
+            'loadtest', requests=60, concurrency=1, warmup=0,
+            logged_in=0.5, output=output, stdout=StringIO(),
+        )
+        with open(output) as file:
+            results = json.load(file)
+        self.assertEqual(results['requests'], 60)
+        self.assertEqual(results['errors'], 0)
+        self.assertEqual(
+            sum(view['requests'] for view in results['views'].values()), 60
+        )
+        for view, summary in results['views'].items():
+            with self.subTest(view=view):
+                self.assertIn('p99', summary['latency_ms'])
+                self.assertGreater(summary['queries']['mean'], 0)
+        # comments are posted through CSRF protection
+        self.assertEqual(
+            Comment.objects.count(),
+            results['views'].get('add_comment', {}).get('requests', 0),
+        )
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTests(SimpleTestCase):
+    def setUp(self):
+        self.router = PrimaryReplicaRouter()
+        self.factory = RequestFactory()
+
+    def test_reads_follow_replica_reads_blocks(self):
+        self.assertEqual(self.router.db_for_read(Post), 'default')
+        with replica_reads():
+            self.assertEqual(self.router.db_for_read(Post), 'replica')
+        with replica_reads(False):
+            self.assertEqual(self.router.db_for_read(Post), 'default')
+        with override_settings(DATABASE_REPLICAS=[]), replica_reads():
+            self.assertEqual(self.router.db_for_read(Post), 'default')
+
+    @override_settings(DATABASE_REPLICAS=['replica1', 'replica2'])
+    def test_block_reads_from_one_replica(self):
+        aliases = set()
+        for _ in range(20):
+            with replica_reads():
+                block_aliases = {
+                    self.router.db_for_read(Post) for _ in range(10)
+                }
+            self.assertEqual(len(block_aliases), 1)
+            aliases |= block_aliases
+        self.assertEqual(aliases, {'replica1', 'replica2'})
+
+    def test_write_pins_thread_to_primary(self):
+        with replica_reads() as state:
+            self.assertEqual(self.router.db_for_write(Post), 'default')
+            self.assertTrue(state.wrote)
+            self.assertEqual(self.router.db_for_read(Post), 'default')
+
+    def test_replicas_are_not_migrated(self):
+        self.assertFalse(self.router.allow_migrate('replica', 'posts'))
+        self.assertTrue(self.router.allow_migrate('default', 'posts'))
+
+    def test_middleware_routes_and_pins(self):
+        def view(request):
+            if request.method == 'POST':
+                self.router.db_for_write(Post)
+            return HttpResponse(self.router.db_for_read(Post))
+
+        middleware = ReplicaReadsMiddleware(view)
+        pinned = self.factory.get('/')
+        pinned.COOKIES[PIN_COOKIE] = '1'
+        cases = (
+            (self.factory.get('/'), b'replica', False),
+            (self.factory.head('/'), b'replica', False),
+            (pinned, b'default', False),
+            (self.factory.post('/'), b'default', True),
+        )
+        for request, database, pins in cases:
+            with self.subTest(method=request.method, cookies=request.COOKIES):
+                response = middleware(request)
+                self.assertEqual(response.content, database)
+                self.assertIs(PIN_COOKIE in response.cookies, pins)
+
+
+class ReplicaPinTests(TestCase):
+    @override_settings(DATABASE_REPLICAS=['default'])
+    def test_post_create_pins_author_to_primary(self):
+        user = User.objects.create_user(username='rock4ts')
+        self.client.force_login(user)
+        response = self.client.post(
+            reverse('posts:post_create'), {'text': 'Новая запись'}
+        )
+        self.assertRedirects(
+            response,
+            reverse('posts:profile', kwargs={'username': 'rock4ts'}),
+        )
+        cookie = response.cookies[PIN_COOKIE]
+        self.assertEqual(cookie['max-age'], settings.REPLICA_PIN_SECONDS)
+        self.assertContains(
+            self.client.get(response.url), 'Новая запись'
+        )
+
+    def test_no_pin_without_replicas(self):
+        user = User.objects.create_user(username='rock4ts')
+        self.client.force_login(user)
+        response = self.client.post(
+            reverse('posts:post_create'), {'text': 'Новая запись'}
+        )
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+
+class CopySQLiteDatabaseTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.primary = os.path.join(self.directory, 'primary.sqlite3')
+        self.replica = os.path.join(self.directory, 'replica.sqlite3')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def rows(self, path):
+        connection = sqlite3.connect(path)
+        try:
+            return connection.execute('SELECT value FROM item').fetchall()
+        finally:
+            connection.close()
+
+    def test_copies_primary_over_replica(self):
+        primary = sqlite3.connect(self.primary)
+        primary.execute('PRAGMA journal_mode=WAL')
+        primary.execute('CREATE TABLE item (value TEXT)')
+        primary.execute("INSERT INTO item VALUES ('first')")
+        primary.commit()
+        copy_sqlite_database(self.primary, self.replica)
+        self.assertEqual(self.rows(self.replica), [('first',)])
+        # committed rows still in the write-ahead log are copied too
+        primary.execute("INSERT INTO item VALUES ('second')")
+        primary.commit()
+        copy_sqlite_database(self.primary, self.replica)
+        primary.close()
+        self.assertEqual(
+            self.rows(self.replica), [('first',), ('second',)]
+        )
+        self.assertFalse(os.path.exists(self.replica + '.sync'))
+
+
+class SyncReplicasCommandTests(CopySQLiteDatabaseTests):
+    # the primary uses the tuned backend as in settings.py
+    aliases = {
+        'sync_primary': ('core.db_backends.sqlite3', 'primary'),
+        'sync_replica': ('django.db.backends.sqlite3', 'replica'),
+    }
+
+    def setUp(self):
+        super().setUp()
+        for alias, (engine, name) in self.aliases.items():
+            connections.databases[alias] = {
+                'ENGINE': engine,
+                'NAME': getattr(self, name),
+            }
+
+    def tearDown(self):
+        for alias in self.aliases:
+            # wrappers of the aliases are kept until deleted
+            try:
+                del connections[alias]
+            except AttributeError:
+                pass
+            del connections.databases[alias]
+        super().tearDown()
+
+    def sync(self, **options):
+        output = StringIO()
+        with override_settings(DATABASE_REPLICAS=['sync_replica']):
+            call_command(
+                'sync_replicas', database='sync_primary', stdout=output,
+                **options,
+            )
+        return output.getvalue()
+
+    def test_copies_primary_to_replicas(self):
+        primary = sqlite3.connect(self.primary)
+        primary.execute('CREATE TABLE item (value TEXT)')
+        primary.execute("INSERT INTO item VALUES ('first')")
+        primary.commit()
+        primary.close()
+        self.assertIn('Synced 1 replicas', self.sync())
+        self.assertEqual(self.rows(self.replica), [('first',)])
+
+    def test_rejects_databases_without_files(self):
+        with self.assertRaisesMessage(CommandError, 'No replicas'):
+            call_command('sync_replicas', stdout=StringIO())
+        connections.databases['sync_primary']['NAME'] = ':memory:'
+        with self.assertRaisesMessage(CommandError, 'in-memory'):
+            self.sync()
+
+    def test_rejects_interval_outliving_pin(self):
+        with self.assertRaisesMessage(CommandError, 'REPLICA_PIN_SECONDS'):
+            self.sync(interval=settings.REPLICA_PIN_SECONDS)
+        self.assertFalse(os.path.exists(self.replica))
+
+
+class SQLiteProfileTests(TransactionTestCase):
+    def test_connections_are_tuned(self):
+        with connection.cursor() as cursor:
+            for pragma, value in (
+                ('busy_timeout', 5000),
+                ('cache_size', -32 * 1024),
+                # 1 is NORMAL
+                ('synchronous', 1),
+            ):
+                with self.subTest(pragma=pragma):
+                    cursor.execute(f'PRAGMA {pragma}')
+                    self.assertEqual(cursor.fetchone()[0], value)
+
+    def test_transactions_take_write_lock_at_once(self):
+        with CaptureQueriesContext(connection) as queries:
+            with transaction.atomic():
+                Group.objects.exists()
+        self.assertEqual(queries[0]['sql'], 'BEGIN IMMEDIATE')
+
+    def test_form_renders_take_no_write_lock(self):
+        author = User.objects.create_user(username='writer')
+        post = Post.objects.create(text='Запись', author=author)
+        self.client.force_login(author)
+        for url in (
+            reverse('posts:post_create'),
+            reverse('posts:post_edit', kwargs={'post_id': post.pk}),
+        ):
+            with self.subTest(url=url):
+                with CaptureQueriesContext(connection) as queries:
+                    self.client.get(url)
+                self.assertNotIn(
+                    'BEGIN IMMEDIATE', [query['sql'] for query in queries]
+                )
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(
+                reverse('posts:post_edit', kwargs={'post_id': post.pk}),
+                {'text': 'Исправленная запись'},
+            )
+        self.assertIn(
+            'BEGIN IMMEDIATE', [query['sql'] for query in queries]
+        )
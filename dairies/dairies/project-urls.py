@@ -13,4 +13,5 @@ urlpatterns = [
     path('', include('posts.urls', namespace='posts')),
     path('group/', include('posts.urls', namespace='posts')),
     path('about/', include('about.urls', namespace='about')),
+    path('api/v1/', include('api.urls', namespace='api')),
 ]
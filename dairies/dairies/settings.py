@@ -17,12 +17,24 @@ ALLOWED_HOSTS = [
     'testserver',
 ]
 
+# one cache file is shared by all worker processes of the host
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.cache_backends.SQLiteCache',
+        'LOCATION': os.getenv(
+            'CACHE_LOCATION',
+            os.path.join(BASE_DIR, 'cache', 'dairies-cache.sqlite3')
+        ),
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+            'MAX_SIZE': 128 * 1024 * 1024,
+        },
     }
 }
 
+# tests use a cache file of their own, see core.test_runner
+TEST_RUNNER = 'core.test_runner.TemporaryCacheRunner'
+
 FORM_RENDERER = 'django.forms.renderers.TemplatesSetting'
 
 INSTALLED_APPS = [
@@ -38,12 +50,14 @@ INSTALLED_APPS = [
     'posts.apps.PostsConfig',
     'about.apps.AboutConfig',
     'core.apps.CoreConfig',
+    'api.apps.ApiConfig',
     'sorl.thumbnail',
     'debug_toolbar',
 ]
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.replicas.ReplicaReadsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -79,13 +93,29 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'dairies.wsgi.application'
 
+# the tuned SQLite backend begins transactions with the write lock and
+# runs SQLITE_PRAGMAS on every connection, worker processes keep their
+# connections for CONN_MAX_AGE seconds
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'core.db_backends.sqlite3',
         'NAME': 'mydatabase',
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 600)),
     }
 }
 
+# write-ahead log lets reads go on during a write, busy_timeout is how
+# long a writer waits for the lock (ms), mmap_size and cache_size (KiB
+# when negative) are per connection, manage.py bench_sqlite compares
+# this profile with the stock backend
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -32 * 1024,
+}
+
 # DATABASES = {
 # 	'default': {
 # 		'ENGINE': os.getenv('DB_ENGINE'),
@@ -97,6 +127,26 @@ DATABASES = {
 # 	}
 # }
 
+# reads of a GET request go to one random alias of DATABASE_REPLICAS,
+# writes, and reads for REPLICA_PIN_SECONDS after a visitor's write,
+# to 'default'. DB_REPLICAS lists SQLite files (comma separated)
+# that manage.py sync_replicas keeps in step with the primary
+DATABASE_ROUTERS = ['core.replicas.PrimaryReplicaRouter']
+DATABASE_REPLICAS = []
+for number, name in enumerate(
+    filter(None, os.getenv('DB_REPLICAS', '').split(',')), 1
+):
+    # replica files are replaced by every sync, so their connections
+    # are not kept and they stay out of write-ahead log mode
+    DATABASES[f'replica{number}'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': name,
+        'CONN_MAX_AGE': 0,
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica{number}')
+REPLICA_PIN_SECONDS = 10
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -129,6 +179,9 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 MEDIA_URL = '/media/dairies/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# uploads are always streamed to disk, see POSTS_UPLOAD_* below
+FILE_UPLOAD_HANDLERS = ['posts.uploads.BoundedUploadHandler']
+
 LOGIN_URL = 'users:login'
 LOGIN_REDIRECT_URL = 'posts:index'
 
@@ -140,3 +193,75 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 # Project variables
 
 posts_per_page = 10
+
+# 'keyset' paginates feeds with ?before= / ?after= cursors,
+# 'numbered' falls back to ?page= with COUNT and OFFSET queries
+POSTS_PAGINATION = os.getenv('POSTS_PAGINATION', 'keyset')
+
+# numbered pages show at most POSTS_COUNT_CAP posts and a "cap+" label,
+# feed totals are cached for POSTS_COUNT_TIMEOUT seconds
+POSTS_COUNT_CAP = 10000
+POSTS_COUNT_TIMEOUT = 60 * 60
+
+# posts are copied to timelines of at most POSTS_FANOUT_LIMIT followers,
+# subscriptions feed reads posts of more popular authors directly,
+# new follower gets POSTS_TIMELINE_BACKFILL latest posts of the author
+POSTS_FANOUT_LIMIT = 1000
+POSTS_TIMELINE_BACKFILL = 1000
+POSTS_TIMELINE_BATCH = 500
+
+# ids of authors a user follows are cached for POSTS_FOLLOWING_TIMEOUT
+# seconds or until the user follows or unfollows somebody
+POSTS_FOLLOWING_TIMEOUT = 60 * 60 * 24
+
+# rendered post cards are cached for POSTS_CARD_TIMEOUT seconds
+POSTS_CARD_CACHE = True
+POSTS_CARD_TIMEOUT = 60 * 60 * 24
+
+# feed and post pages are cached for visitors without a session
+POSTS_PAGE_CACHE = True
+POSTS_PAGE_CACHE_TIMEOUT = 60 * 10
+
+# comments of a post are shown POSTS_COMMENTS_PER_PAGE at a time,
+# later ones are loaded on demand
+POSTS_COMMENTS_PER_PAGE = 20
+
+# thumbnails of uploaded images are generated by POSTS_THUMBNAIL_WORKERS
+# background threads, 0 generates them right after the upload commits
+POSTS_THUMBNAIL_WORKERS = 2
+
+# uploaded images are rejected past POSTS_UPLOAD_MAX_SIZE bytes or
+# POSTS_UPLOAD_MAX_PIXELS pixels, then re-encoded without metadata and
+# downscaled to POSTS_UPLOAD_MAX_SIDE by POSTS_UPLOAD_WORKERS processes
+# within POSTS_UPLOAD_TIMEOUT seconds, 0 workers process them in-request
+POSTS_UPLOAD_MAX_SIZE = 10 * 1024 * 1024
+POSTS_UPLOAD_MAX_PIXELS = 40 * 1000 * 1000
+POSTS_UPLOAD_MAX_SIDE = 4096
+POSTS_UPLOAD_WORKERS = 2
+POSTS_UPLOAD_TIMEOUT = 10
+
+# full-text search of posts and comments, SQLiteFTSBackend needs SQLite
+# with FTS5, posts.search.backends.BasicSearchBackend works everywhere
+# and is the default on other databases
+POSTS_SEARCH_BACKEND = os.getenv('POSTS_SEARCH_BACKEND') or (
+    'posts.search.backends.SQLiteFTSBackend'
+    if DATABASES['default']['ENGINE'].endswith('sqlite3')
+    else 'posts.search.backends.BasicSearchBackend'
+)
+
+# users download archives of their diaries reading POSTS_EXPORT_CHUNK
+# rows at a time, at most POSTS_EXPORT_PER_USER downloads of a user
+# run at once, slots of interrupted ones expire after POSTS_EXPORT_TIMEOUT
+POSTS_EXPORT_CHUNK = 500
+POSTS_EXPORT_PER_USER = 1
+POSTS_EXPORT_TIMEOUT = 60 * 60
+
+# RSS and Atom feeds list POSTS_FEED_ITEMS latest posts, generated
+# feeds are cached until a listed post changes, at most POSTS_FEED_TIMEOUT
+POSTS_FEED_ITEMS = 20
+POSTS_FEED_TIMEOUT = 60 * 60 * 24
+
+# pages of the JSON API hold API_PAGE_SIZE objects, clients may ask
+# for up to API_MAX_PAGE_SIZE with ?limit=
+API_PAGE_SIZE = 20
+API_MAX_PAGE_SIZE = 100
@@ -1,9 +1,28 @@
 from django.contrib import admin
 
 from .models import Comment, Follow, Group, Post
+from .search import get_backend
 
 
-class AdminPost(admin.ModelAdmin):
+class IndexedSearchMixin:
+    """Serves admin search from the full-text index
+    instead of LIKE scans over search_fields.
+    """
+    search_kind = None
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        return (
+            get_backend().filter_queryset(
+                queryset, self.search_kind, search_term
+            ),
+            False,
+        )
+
+
+class AdminPost(IndexedSearchMixin, admin.ModelAdmin):
+    search_kind = 'posts'
     list_display = ('pk', 'text', 'pub_date', 'author', 'group',)
     search_fields = ('text',)
     list_filter = ('pub_date',)
@@ -11,7 +30,8 @@ class AdminPost(admin.ModelAdmin):
     list_editable = ('group',)
 
 
-class AdminComment(admin.ModelAdmin):
+class AdminComment(IndexedSearchMixin, admin.ModelAdmin):
+    search_kind = 'comments'
     list_display = ('pk', 'text', 'pub_date', 'author', 'post',)
     search_fields = ('text',)
     list_filter = ('author', 'pub_date',)
@@ -3,3 +3,11 @@ from django.apps import AppConfig
 
 class PostsConfig(AppConfig):
     name = 'posts'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from .search import get_backend
+
+        # a backend unfit for the database fails at startup
+        # rather than on the first save
+        get_backend()
@@ -0,0 +1,211 @@
+# streamed ZIP archive of a user's diary
+
+import json
+import zipfile
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from .models import Comment, Post
+
+# images are copied into the archive this many bytes at a time
+COPY_BLOCK = 64 * 1024
+
+
+def slots_key(user_id):
+    return f'posts:archive:slots:{user_id}'
+
+
+def acquire_slot(user_id):
+    """Takes one of POSTS_EXPORT_PER_USER download slots of a user,
+    returns False if all of them are taken. Slots of a worker that
+    died mid-download are freed after POSTS_EXPORT_TIMEOUT seconds.
+    """
+    key = slots_key(user_id)
+    cache.add(key, 0, settings.POSTS_EXPORT_TIMEOUT)
+    try:
+        slots = cache.incr(key)
+    except ValueError:
+        # the cache keeps nothing, downloads are not limited
+        return True
+    if slots > settings.POSTS_EXPORT_PER_USER:
+        release_slot(user_id)
+        return False
+    return True
+
+
+def release_slot(user_id):
+    try:
+        cache.decr(slots_key(user_id))
+    except ValueError:
+        pass
+
+
+def chunks(queryset, size):
+    """Yields lists of at most size objects of queryset in primary key
+    order, every list is read by a query of its own, so no cursor
+    stays open while the archive is being sent.
+    """
+    last_pk = 0
+    while True:
+        objects = list(queryset.filter(pk__gt=last_pk).order_by('pk')[:size])
+        if objects:
+            yield objects
+        if len(objects) < size:
+            return
+        last_pk = objects[-1].pk
+
+
+def zip_date(value):
+    return timezone.localtime(value).timetuple()[:6]
+
+
+class ArchiveBuffer:
+    """Unseekable file ZipFile writes to, the written bytes are taken
+    away and sent as soon as a part of the archive is complete.
+    """
+    def __init__(self):
+        self.parts = []
+        self.position = 0
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def take(self):
+        data = b''.join(self.parts)
+        self.parts = []
+        return data
+
+
+class DiaryArchive:
+    """Iterable of bytes of a ZIP archive with posts and comments
+    of user as posts.json, comments.json and diary.html, plus images
+    of the posts. Rows are read POSTS_EXPORT_CHUNK at a time and sent
+    before the next chunk is read, so memory does not grow with the
+    diary. Closing the archive frees the download slot of the user.
+    """
+    def __init__(self, user):
+        self.user = user
+        self.stream = self.generate()
+        self.closed = False
+
+    def __iter__(self):
+        return self.stream
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.stream.close()
+            release_slot(self.user.pk)
+
+    def posts(self):
+        return Post.objects.filter(author=self.user).select_related('group')
+
+    def comments(self):
+        return Comment.objects.filter(author=self.user)
+
+    def image_name(self, post):
+        return f'images/{post.image.name}' if post.image else None
+
+    def post_record(self, post):
+        return {
+            'id': post.pk,
+            'text': post.text,
+            'group': post.group.title if post.group else None,
+            'pub_date': post.pub_date,
+            'image': self.image_name(post),
+        }
+
+    def comment_record(self, comment):
+        return {
+            'id': comment.pk,
+            'post': comment.post_id,
+            'text': comment.text,
+            'is_edited': comment.is_edited,
+            'pub_date': comment.pub_date,
+        }
+
+    def json_entry(self, archive, buffer, name, queryset, to_record):
+        """Writes a JSON array of records of queryset to archive entry.
+        """
+        with archive.open(name, 'w') as entry:
+            separator = b'[\n'
+            for objects in chunks(queryset, settings.POSTS_EXPORT_CHUNK):
+                for obj in objects:
+                    entry.write(separator + json.dumps(
+                        to_record(obj), cls=DjangoJSONEncoder,
+                        ensure_ascii=False,
+                    ).encode())
+                    separator = b',\n'
+                yield buffer.take()
+            entry.write(b'[]\n' if separator == b'[\n' else b'\n]\n')
+
+    def html_entry(self, archive, buffer):
+        with archive.open('diary.html', 'w') as entry:
+            entry.write(render_to_string(
+                'posts/archive/header.html', {'author': self.user}
+            ).encode())
+            for name, queryset in (
+                ('posts', self.posts()), ('comments', self.comments()),
+            ):
+                for objects in chunks(queryset, settings.POSTS_EXPORT_CHUNK):
+                    entry.write(render_to_string(
+                        f'posts/archive/{name}.html', {name: objects}
+                    ).encode())
+                    yield buffer.take()
+            entry.write(
+                render_to_string('posts/archive/footer.html').encode()
+            )
+
+    def image_entries(self, archive, buffer):
+        copied = set()
+        posts = self.posts().exclude(image='')
+        for objects in chunks(posts, settings.POSTS_EXPORT_CHUNK):
+            for post in objects:
+                name = self.image_name(post)
+                if name in copied:
+                    continue
+                copied.add(name)
+                try:
+                    source = default_storage.open(post.image.name)
+                except FileNotFoundError:
+                    continue
+                info = zipfile.ZipInfo(name, zip_date(post.pub_date))
+                # images are compressed already
+                info.compress_type = zipfile.ZIP_STORED
+                with source, archive.open(info, 'w') as entry:
+                    for block in iter(lambda: source.read(COPY_BLOCK), b''):
+                        entry.write(block)
+                        yield buffer.take()
+
+    def entries(self, archive, buffer):
+        yield from self.json_entry(
+            archive, buffer, 'posts.json', self.posts(), self.post_record
+        )
+        yield from self.json_entry(
+            archive, buffer, 'comments.json', self.comments(),
+            self.comment_record,
+        )
+        yield from self.html_entry(archive, buffer)
+        yield from self.image_entries(archive, buffer)
+
+    def generate(self):
+        buffer = ArchiveBuffer()
+        with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+            for data in self.entries(archive, buffer):
+                # compressor may hold back all bytes of a chunk
+                if data:
+                    yield data
+        yield buffer.take()
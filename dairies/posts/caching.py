@@ -0,0 +1,239 @@
+# versioned cache keys, cached post card fragments and anonymous pages,
+# conditional GET of pages of logged-in users
+
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.template.loader import render_to_string
+from django.utils import translation
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+from core.replicas import reads_replicas
+
+# query parameters selecting a page of a feed
+PAGE_PARAMETERS = ('page', 'before', 'after')
+
+
+def version_key(tag):
+    return f'posts:version:{tag}'
+
+
+def new_version():
+    # time based versions never repeat after a version key is evicted
+    return format(time.time_ns(), 'x')
+
+
+def get_versions(tags):
+    """Returns {tag: version} for tags with a single cache round trip,
+    missing versions are initialized.
+    """
+    keys = {version_key(tag): tag for tag in tags}
+    versions = cache.get_many(keys)
+    missing = {key: new_version() for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, None)
+        versions.update(missing)
+    return {tag: versions[key] for key, tag in keys.items()}
+
+
+def versions_settled(versions):
+    """Tells whether changes that bumped versions are visible to reads.
+    Replicas lag up to REPLICA_PIN_SECONDS behind the primary, what is
+    read from them meanwhile must not be cached under new versions.
+    """
+    if not reads_replicas():
+        return True
+    # versions are bump times in nanoseconds
+    newest = max(int(version, 16) for version in versions) / 10 ** 9
+    return time.time() - newest > settings.REPLICA_PIN_SECONDS
+
+
+def bump_versions(*tags):
+    """Invalidates every cache entry built from tags once the transaction
+    commits: a request still reading the previous snapshot must not
+    cache it under the new versions. Outside transactions it is done
+    at once.
+    """
+    transaction.on_commit(lambda: cache.set_many(
+        {version_key(tag): new_version() for tag in tags}, None
+    ))
+
+
+def post_card_tags(post):
+    """Returns tags of objects a post card is rendered from.
+    """
+    tags = [f'post:{post.pk}', f'author:{post.author_id}']
+    if post.group_id is not None:
+        tags.append(f'group:{post.group_id}')
+    return tags
+
+
+def render_post_cards(posts, group_page=False):
+    """Returns rendered post_info.html for every post.
+    Cards are served from cache under keys built from versions
+    of the post, its author and group, so a page of cards costs
+    two cache round trips when every card is cached. Thumbnails
+    of cards being rendered are looked up in one batch.
+    """
+    # thumbnails module depends on this one
+    from .thumbnails import attach_thumbnails
+
+    posts = list(posts)
+    if not settings.POSTS_CARD_CACHE:
+        attach_thumbnails(posts, 'card')
+        return [render_post_card(post, group_page) for post in posts]
+    versions = get_versions(
+        {tag for post in posts for tag in post_card_tags(post)}
+    )
+    language = translation.get_language()
+    keys = [
+        'posts:card:{}:{}:{}:{}'.format(
+            post.pk,
+            int(bool(group_page)),
+            language,
+            '.'.join(versions[tag] for tag in post_card_tags(post)),
+        )
+        for post in posts
+    ]
+    cards = cache.get_many(keys)
+    missing_posts = {
+        key: post for key, post in zip(keys, posts) if key not in cards
+    }
+    attach_thumbnails(missing_posts.values(), 'card')
+    missing = {}
+    for key, post in missing_posts.items():
+        cards[key] = render_post_card(post, group_page)
+        if versions_settled(versions[tag] for tag in post_card_tags(post)):
+            missing[key] = cards[key]
+    if missing:
+        cache.set_many(missing, settings.POSTS_CARD_TIMEOUT)
+    return [cards[key] for key in keys]
+
+
+def render_post_card(post, group_page=False):
+    return render_to_string(
+        'posts/includes/post_info.html',
+        {'post': post, 'group_page': group_page},
+    )
+
+
+def is_anonymous_request(request):
+    """Tells whether response can't depend on the visitor. Visitors
+    having a session never get pages rendered for somebody else.
+    """
+    return (
+        request.method in ('GET', 'HEAD')
+        and settings.SESSION_COOKIE_NAME not in request.COOKIES
+        and not request.user.is_authenticated
+    )
+
+
+def page_cache_key(request, tags, versions):
+    location = '{}?{}|{}'.format(
+        request.path,
+        '&'.join(
+            f'{name}={request.GET[name]}'
+            for name in PAGE_PARAMETERS if name in request.GET
+        ),
+        translation.get_language(),
+    )
+    return 'posts:page:{}:{}'.format(
+        hashlib.md5(location.encode()).hexdigest(),
+        '.'.join(versions[tag] for tag in tags),
+    )
+
+
+def cache_anonymous_page(*tag_templates):
+    """Caches responses of view for visitors without a session.
+    tag_templates are formatted with view kwargs, e.g. 'post:{post_id}',
+    and bumping any of these tags (or 'pages') invalidates the page.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not (
+                settings.POSTS_PAGE_CACHE and is_anonymous_request(request)
+            ):
+                return view(request, *args, **kwargs)
+            tags = ['pages'] + [
+                template.format(**kwargs) for template in tag_templates
+            ]
+            versions = get_versions(tags)
+            key = page_cache_key(request, tags, versions)
+            response = cache.get(key)
+            if response is None:
+                response = view(request, *args, **kwargs)
+                if (
+                    response.status_code == 200
+                    and not response.cookies
+                    and not request.META.get('CSRF_COOKIE_USED')
+                    and versions_settled(versions.values())
+                ):
+                    cache.set(
+                        key, response, settings.POSTS_PAGE_CACHE_TIMEOUT
+                    )
+            return response
+        return wrapper
+    return decorator
+
+
+def page_validators(request, tags, versions):
+    """Returns (etag, last_modified) of a page of logged-in user built
+    from tags. Versions are creation times of the tags in nanoseconds,
+    so the newest of them is when the page last changed.
+    """
+    etag = '"{}"'.format(hashlib.md5('|'.join([
+        str(request.user.pk),
+        # embedded CSRF tokens stay valid until login starts a new session
+        request.session.session_key or '',
+        translation.get_language(),
+        *(versions[tag] for tag in tags),
+    ]).encode()).hexdigest())
+    last_modified = max(int(version, 16) for version in versions.values())
+    return etag, last_modified // 10 ** 9
+
+
+def conditional_page(get_tags):
+    """Answers 304 Not Modified to logged-in users whose copy of the page
+    is still valid, before the view runs. get_tags(request, **kwargs)
+    returns tags the page is built from, e.g. ['post:1'], or None if
+    the page can't be validated. Checking costs a cache round trip
+    plus whatever get_tags queries.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if (
+                request.method not in ('GET', 'HEAD')
+                or not request.user.is_authenticated
+            ):
+                return view(request, *args, **kwargs)
+            tags = get_tags(request, **kwargs)
+            if tags is None:
+                return view(request, *args, **kwargs)
+            tags = ['pages'] + tags
+            versions = get_versions(tags)
+            etag, last_modified = page_validators(request, tags, versions)
+            response = get_conditional_response(
+                request, etag=etag, last_modified=last_modified
+            )
+            if response is None:
+                response = view(request, *args, **kwargs)
+                # a page read from a lagging replica is not validated
+                if (
+                    response.status_code != 200
+                    or not versions_settled(versions.values())
+                ):
+                    return response
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(last_modified)
+            # browsers revalidate instead of showing a stale page
+            patch_cache_control(response, private=True, no_cache=True)
+            return response
+        return wrapper
+    return decorator
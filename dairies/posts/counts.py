@@ -0,0 +1,209 @@
+# cached and approximate post counts for feed pagination,
+# denormalized counters of posts and users
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, connection, transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from core.bulk import bulk_create_chunked
+
+from .models import AuthorStats, Comment, Follow, Post, User
+
+
+def scope_key(scope):
+    """Returns cache key of a feed scope, e.g. 'all', 'group:1', 'author:2'.
+    """
+    return f'posts:count:{scope}'
+
+
+def capped_count(queryset, cap=None):
+    """Counts at most cap + 1 rows so huge feeds are never fully scanned.
+    Feeds that are not querysets count themselves.
+    """
+    if cap is None or not hasattr(queryset, 'order_by'):
+        return queryset.count()
+    return queryset.order_by()[:cap + 1].count()
+
+
+def estimated_post_count():
+    """Returns table size from database statistics
+    or None if the database has not collected them.
+    """
+    table = Post._meta.db_table
+    if connection.vendor == 'postgresql':
+        sql = 'SELECT reltuples FROM pg_class WHERE oid = %s::regclass'
+    elif connection.vendor == 'sqlite':
+        # filled by ANALYZE with a row per index (idx is NULL only for
+        # tables without indexes), first number of stat is the number
+        # of rows in the index, the largest one is the table size
+        sql = 'SELECT stat FROM sqlite_stat1 WHERE tbl = %s'
+    else:
+        return None
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [table])
+            rows = cursor.fetchall()
+    except DatabaseError:
+        return None
+    if not rows:
+        return None
+    estimate = max(int(float(str(row[0]).split()[0])) for row in rows)
+    return estimate if estimate >= 0 else None
+
+
+def get_post_count(queryset, scope=None):
+    """Returns (count, capped) pair for feed queryset.
+    Group and author scopes are exact counters kept by signals,
+    'all' scope uses database statistics, feeds without scope
+    get a capped count. Every value is cached.
+    """
+    cap = settings.POSTS_COUNT_CAP
+    key = scope_key(scope) if scope else None
+    count = cache.get(key) if key else None
+    if count is None:
+        if scope == 'all':
+            count = estimated_post_count()
+        if count is None:
+            count = capped_count(queryset, cap)
+        if key:
+            cache.add(key, count, settings.POSTS_COUNT_TIMEOUT)
+    if cap is not None and count > cap:
+        return cap, True
+    return count, False
+
+
+def change_post_counts(scopes, delta):
+    """Shifts cached counters of scopes by delta once the transaction
+    commits, a rolled back change leaves them as they are. Counters
+    that are not cached yet will be computed on the next read.
+    """
+    def shift():
+        for scope in scopes:
+            try:
+                cache.incr(scope_key(scope), delta)
+            except ValueError:
+                pass
+
+    transaction.on_commit(shift)
+
+
+def post_scopes(author_id, group_id):
+    """Returns feed scopes containing a post.
+    """
+    scopes = ['all', f'author:{author_id}']
+    if group_id is not None:
+        scopes.append(f'group:{group_id}')
+    return scopes
+
+
+def exact_author_stats(user_id):
+    return {
+        'posts_count': Post.objects.filter(author_id=user_id).count(),
+        'followers_count': Follow.objects.filter(author_id=user_id).count(),
+        'following_count': Follow.objects.filter(user_id=user_id).count(),
+    }
+
+
+def change_author_stats(user_id, **deltas):
+    """Shifts counters of user by deltas in a single UPDATE.
+    Missing counters row is created from exact values, which already
+    include the change as signals are sent after the write.
+    """
+    updated = AuthorStats.objects.filter(user_id=user_id).update(
+        **{field: F(field) + delta for field, delta in deltas.items()}
+    )
+    # rows of users being deleted are never recreated
+    if not updated and max(deltas.values()) > 0:
+        AuthorStats.objects.get_or_create(
+            user_id=user_id, defaults=exact_author_stats(user_id)
+        )
+
+
+def change_comments_count(post_id, delta):
+    Post.objects.filter(pk=post_id).update(
+        comments_count=F('comments_count') + delta
+    )
+
+
+def count_subquery(queryset, field):
+    """Returns expression counting rows of queryset
+    whose field refers to the outer row.
+    """
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{field: OuterRef('pk')})
+            .order_by().values(field)
+            .annotate(total=Count('pk')).values('total')
+        ),
+        0,
+    )
+
+
+def actual_author_stats():
+    return {
+        'posts_count': count_subquery(Post.objects.all(), 'author'),
+        'followers_count': count_subquery(Follow.objects.all(), 'author'),
+        'following_count': count_subquery(Follow.objects.all(), 'user'),
+    }
+
+
+def actual_comments_count():
+    return {
+        'comments_count': count_subquery(Comment.objects.all(), 'post'),
+    }
+
+
+def create_missing_stats(users, chunk_size):
+    bulk_create_chunked(
+        AuthorStats,
+        (
+            AuthorStats(user_id=pk) for pk in users.filter(
+                stats__isnull=True
+            ).values_list('pk', flat=True).iterator()
+        ),
+        chunk_size,
+        ignore_conflicts=True,
+    )
+
+
+def repair_counters(chunk_size=1000):
+    """Recomputes denormalized counters which drifted from the data
+    and returns numbers of repaired AuthorStats and Post rows.
+    """
+    create_missing_stats(User.objects.all(), chunk_size)
+    repaired = []
+    for model, actual in (
+        (AuthorStats, actual_author_stats()), (Post, actual_comments_count())
+    ):
+        drifted_ids = list(
+            model.objects.annotate(
+                **{f'actual_{field}': value for field, value in actual.items()}
+            ).exclude(
+                **{field: F(f'actual_{field}') for field in actual}
+            ).values_list('pk', flat=True)
+        )
+        for start in range(0, len(drifted_ids), chunk_size):
+            model.objects.filter(
+                pk__in=drifted_ids[start:start + chunk_size]
+            ).update(**actual)
+        repaired.append(len(drifted_ids))
+    return tuple(repaired)
+
+
+def recount(user_ids, post_ids, chunk_size=1000):
+    """Recomputes counters of users and comment counts of posts
+    of the given ids, after rows were inserted in bulk.
+    """
+    user_ids, post_ids = list(user_ids), list(post_ids)
+    for start in range(0, len(user_ids), chunk_size):
+        chunk = user_ids[start:start + chunk_size]
+        create_missing_stats(User.objects.filter(pk__in=chunk), chunk_size)
+        AuthorStats.objects.filter(user_id__in=chunk).update(
+            **actual_author_stats()
+        )
+    for start in range(0, len(post_ids), chunk_size):
+        Post.objects.filter(
+            pk__in=post_ids[start:start + chunk_size]
+        ).update(**actual_comments_count())
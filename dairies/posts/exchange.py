@@ -0,0 +1,378 @@
+# streaming JSONL export and import of users, groups, posts,
+# comments and follows
+
+import json
+import os
+import shutil
+from datetime import datetime
+from functools import lru_cache
+
+from django.contrib.auth.hashers import make_password
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+from django.utils._os import safe_join
+from django.utils.dateparse import parse_datetime
+from pytils.translit import slugify
+
+from core.bulk import explicit_pub_dates
+
+from .maintenance import (
+    last_pks, rebuild_derived_data, update_inserted_data,
+)
+from .models import (
+    Comment, Follow, Group, ImportedPost, ImportProgress, Post, User,
+)
+
+# kinds of records in order of a file, records refer to earlier ones:
+# users by username, groups by slug, posts by exported id
+MODELS = ('user', 'group', 'post', 'comment', 'follow')
+
+USER_FIELDS = (
+    'username', 'first_name', 'last_name', 'email', 'password',
+    'is_active', 'date_joined',
+)
+
+
+class RecordEncoder(DjangoJSONEncoder):
+    """Keeps microseconds of dates, which DjangoJSONEncoder drops,
+    so imported posts keep their order in feeds.
+    """
+    def default(self, o):
+        if isinstance(o, datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+class InvalidRecord(ValueError):
+    """Raised on lines of a file that are not records.
+    """
+
+
+def export_records(chunk_size=2000):
+    """Yields a record of every exported object, reading tables
+    in primary key order with iterator(), so memory is constant.
+    """
+    users = User.objects.order_by('pk').values(*USER_FIELDS)
+    for user in users.iterator(chunk_size):
+        yield {'model': 'user', **user}
+    groups = Group.objects.order_by('pk').values(
+        'slug', 'title', 'description'
+    )
+    for group in groups.iterator(chunk_size):
+        yield {'model': 'group', **group}
+    posts = Post.objects.order_by('pk').values_list(
+        'pk', 'author__username', 'group__slug', 'text', 'pub_date', 'image'
+    )
+    for pk, author, group, text, pub_date, image in posts.iterator(
+        chunk_size
+    ):
+        yield {
+            'model': 'post', 'id': pk, 'author': author, 'group': group,
+            'text': text, 'pub_date': pub_date, 'image': image,
+        }
+    comments = Comment.objects.order_by('pk').values_list(
+        'post_id', 'author__username', 'text', 'initial_text', 'is_edited',
+        'pub_date',
+    )
+    for post, author, text, initial_text, is_edited, pub_date in (
+        comments.iterator(chunk_size)
+    ):
+        yield {
+            'model': 'comment', 'post': post, 'author': author,
+            'text': text, 'initial_text': initial_text,
+            'is_edited': is_edited, 'pub_date': pub_date,
+        }
+    follows = Follow.objects.order_by('pk').values_list(
+        'user__username', 'author__username'
+    )
+    for user, author in follows.iterator(chunk_size):
+        yield {'model': 'follow', 'user': user, 'author': author}
+
+
+def export_dairies(file, media_dir=None, chunk_size=2000):
+    """Writes a JSON record per line to text file and copies images
+    of posts to media_dir. Returns {kind: number of records}.
+    """
+    counts = dict.fromkeys(MODELS, 0)
+    for record in export_records(chunk_size):
+        file.write(
+            json.dumps(record, cls=RecordEncoder, ensure_ascii=False)
+            + '\n'
+        )
+        counts[record['model']] += 1
+        if media_dir and record.get('image'):
+            export_image(record['image'], media_dir)
+    return counts
+
+
+def export_image(name, media_dir):
+    target = safe_join(media_dir, name)
+    if os.path.exists(target):
+        return
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    try:
+        source = default_storage.open(name)
+    except FileNotFoundError:
+        # the post keeps its reference, importer leaves it without image
+        return
+    with source, open(target, 'wb') as copy:
+        shutil.copyfileobj(source, copy)
+
+
+@lru_cache(maxsize=10000)
+def group_slug(title):
+    # same slug Group.save() would give
+    return slugify(title)[:100]
+
+
+def parse_date(value):
+    return parse_datetime(value) if value else timezone.now()
+
+
+class Importer:
+    """Imports records of a file in chunks of chunk_size, each chunk
+    in its own transaction. Users, groups and follows that already
+    exist are kept, references are resolved per chunk with one query
+    for every referenced model, only ids of posts are kept in memory.
+
+    With source, a name of the file, the position in the file and
+    imported post ids are saved as ImportProgress in the transaction
+    of every chunk, and a new Importer continues an interrupted import
+    from there. A chunk is imported exactly once.
+    """
+    def __init__(self, media_dir=None, chunk_size=1000, source=None):
+        self.media_dir = media_dir
+        self.chunk_size = chunk_size
+        self.source = source
+        self.progress = None
+        self.offset = 0
+        self.counts = dict.fromkeys(MODELS, 0)
+        self.skipped = 0
+        # largest pks before the import, see last_pks()
+        self.since = {}
+        # exported id of post -> imported pk
+        self.post_ids = {}
+        self.new_post_ids = []
+
+    def load_state(self):
+        self.since = last_pks()
+        if not self.source:
+            return
+        self.progress, created = ImportProgress.objects.get_or_create(
+            source=self.source, defaults={'since': json.dumps(self.since)}
+        )
+        if created:
+            return
+        self.since = json.loads(self.progress.since)
+        self.offset = self.progress.offset
+        self.counts.update(json.loads(self.progress.counts))
+        self.skipped = self.progress.skipped
+        self.post_ids = dict(
+            self.progress.posts.values_list('exported_id', 'post_pk')
+        )
+
+    def save_state(self):
+        # runs in the transaction of the chunk
+        if self.progress is None:
+            return
+        ImportedPost.objects.bulk_create(
+            ImportedPost(
+                progress=self.progress, exported_id=exported, post_pk=pk
+            )
+            for exported, pk in self.new_post_ids
+        )
+        self.new_post_ids = []
+        ImportProgress.objects.filter(pk=self.progress.pk).update(
+            offset=self.offset,
+            counts=json.dumps(self.counts),
+            skipped=self.skipped,
+        )
+
+    def clear_state(self):
+        if self.source:
+            ImportProgress.objects.filter(source=self.source).delete()
+
+    def run(self, file):
+        """Imports records of binary file from the saved position,
+        then updates data derived from imported rows. Returns counts
+        of imported records by kind.
+        """
+        self.load_state()
+        if self.offset:
+            file.seek(self.offset)
+        offset = self.offset
+        kind, records = None, []
+        for line in file:
+            if not line.strip():
+                offset += len(line)
+                continue
+            record = json.loads(line)
+            if record.get('model') not in MODELS:
+                raise InvalidRecord(
+                    f'Unknown record at byte {offset}: {line[:80]!r}'
+                )
+            if record['model'] != kind and records:
+                self.flush(kind, records, offset)
+                records = []
+            kind = record['model']
+            records.append(record)
+            offset += len(line)
+            if len(records) >= self.chunk_size:
+                self.flush(kind, records, offset)
+                records = []
+        if records:
+            self.flush(kind, records, offset)
+        if self.since:
+            update_inserted_data(self.since, self.chunk_size)
+        else:
+            # progress saved before since was recorded
+            rebuild_derived_data(self.chunk_size)
+        self.clear_state()
+        return self.counts
+
+    def flush(self, kind, records, offset):
+        with transaction.atomic(), explicit_pub_dates(Post, Comment):
+            self.counts[kind] += getattr(self, f'import_{kind}s')(records)
+            self.offset = offset
+            self.save_state()
+
+    def user_ids(self, usernames):
+        return dict(
+            User.objects.filter(username__in=set(usernames))
+            .values_list('username', 'pk')
+        )
+
+    def import_users(self, records):
+        records = {record['username']: record for record in records}
+        existing = self.user_ids(records)
+        unusable_password = make_password(None)
+        users = [
+            User(
+                username=username,
+                first_name=record.get('first_name', ''),
+                last_name=record.get('last_name', ''),
+                email=record.get('email', ''),
+                password=record.get('password') or unusable_password,
+                is_active=record.get('is_active', True),
+                date_joined=parse_date(record.get('date_joined')),
+            )
+            for username, record in records.items()
+            if username not in existing
+        ]
+        User.objects.bulk_create(users)
+        return len(users)
+
+    def import_groups(self, records):
+        records = {
+            record.get('slug') or group_slug(record['title']): record
+            for record in records
+        }
+        existing = set(
+            Group.objects.filter(slug__in=records)
+            .values_list('slug', flat=True)
+        )
+        groups = [
+            Group(
+                slug=slug,
+                title=record['title'],
+                description=record.get('description', ''),
+            )
+            for slug, record in records.items() if slug not in existing
+        ]
+        Group.objects.bulk_create(groups)
+        return len(groups)
+
+    def copy_image(self, name):
+        """Stores image exported with the post, returns its name
+        in the storage or '' if the file was not exported.
+        """
+        if not name or not self.media_dir:
+            return ''
+        if default_storage.exists(name):
+            return name
+        path = safe_join(self.media_dir, name)
+        if not os.path.exists(path):
+            return ''
+        with open(path, 'rb') as file:
+            return default_storage.save(name, File(file))
+
+    def import_posts(self, records):
+        authors = self.user_ids(record['author'] for record in records)
+        groups = dict(
+            Group.objects.filter(
+                slug__in={record.get('group') for record in records}
+            ).values_list('slug', 'pk')
+        )
+        imported, posts = [], []
+        for record in records:
+            if record['author'] not in authors:
+                self.skipped += 1
+                continue
+            imported.append(record['id'])
+            posts.append(Post(
+                author_id=authors[record['author']],
+                group_id=groups.get(record.get('group')),
+                text=record['text'],
+                pub_date=parse_date(record.get('pub_date')),
+                image=self.copy_image(record.get('image')),
+            ))
+        last_pk = Post.objects.order_by('-pk').values_list(
+            'pk', flat=True
+        ).first() or 0
+        Post.objects.bulk_create(posts)
+        if posts and posts[0].pk is None:
+            # backends not returning ids, the chunk is the only writer
+            pks = Post.objects.filter(pk__gt=last_pk).order_by(
+                'pk'
+            ).values_list('pk', flat=True)
+        else:
+            pks = [post.pk for post in posts]
+        new_post_ids = list(zip(imported, pks))
+        self.post_ids.update(new_post_ids)
+        self.new_post_ids.extend(new_post_ids)
+        return len(posts)
+
+    def import_comments(self, records):
+        authors = self.user_ids(record['author'] for record in records)
+        comments = []
+        for record in records:
+            post_id = self.post_ids.get(record['post'])
+            if post_id is None or record['author'] not in authors:
+                self.skipped += 1
+                continue
+            comments.append(Comment(
+                post_id=post_id,
+                author_id=authors[record['author']],
+                text=record['text'],
+                initial_text=record.get('initial_text', record['text']),
+                is_edited=record.get('is_edited', False),
+                pub_date=parse_date(record.get('pub_date')),
+            ))
+        Comment.objects.bulk_create(comments)
+        return len(comments)
+
+    def import_follows(self, records):
+        users = self.user_ids(
+            name for record in records
+            for name in (record['user'], record['author'])
+        )
+        pairs = set()
+        for record in records:
+            pair = (users.get(record['user']), users.get(record['author']))
+            if None in pair or pair[0] == pair[1]:
+                self.skipped += 1
+                continue
+            pairs.add(pair)
+        pairs -= set(
+            Follow.objects.filter(
+                user_id__in={user for user, _ in pairs},
+                author_id__in={author for _, author in pairs},
+            ).values_list('user_id', 'author_id')
+        )
+        Follow.objects.bulk_create(
+            Follow(user_id=user, author_id=author) for user, author in pairs
+        )
+        return len(pairs)
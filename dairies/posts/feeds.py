@@ -0,0 +1,161 @@
+# RSS and Atom feeds of latest posts, cached and served conditionally
+
+import hashlib
+
+from django.conf import settings
+from django.contrib.syndication.views import Feed
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.cache import get_conditional_response
+from django.utils.feedgenerator import Atom1Feed
+from django.utils.http import http_date, parse_http_date_safe
+from django.utils.text import Truncator
+
+from .caching import get_versions, versions_settled
+from .models import Group, Post, User
+
+
+class LatestPostsFeed(Feed):
+    title = 'Дневники: новые записи'
+    description = 'Последние записи всех авторов'
+
+    def link(self, obj):
+        return reverse('posts:index')
+
+    def posts(self, obj):
+        return Post.objects.select_related('author', 'group')
+
+    def items(self, obj):
+        return self.posts(obj)[:settings.POSTS_FEED_ITEMS]
+
+    def item_title(self, item):
+        return Truncator(item.text).words(8)
+
+    def item_description(self, item):
+        return item.text
+
+    def item_link(self, item):
+        return reverse('posts:post_detail', kwargs={'post_id': item.pk})
+
+    def item_pubdate(self, item):
+        return item.pub_date
+
+    def item_author_name(self, item):
+        return item.author.get_full_name() or item.author.username
+
+    def item_categories(self, item):
+        return [item.group.title] if item.group else []
+
+
+class GroupPostsFeed(LatestPostsFeed):
+    def get_object(self, request, slug):
+        return get_object_or_404(Group, slug=slug)
+
+    def title(self, obj):
+        return f'Дневники: {obj.title}'
+
+    def description(self, obj):
+        return obj.description
+
+    def link(self, obj):
+        return reverse('posts:group_posts', kwargs={'slug': obj.slug})
+
+    def posts(self, obj):
+        return obj.posts.select_related('author', 'group')
+
+
+class AuthorPostsFeed(LatestPostsFeed):
+    def get_object(self, request, username):
+        return get_object_or_404(User, username=username)
+
+    def title(self, obj):
+        return f'Дневник пользователя {obj.username}'
+
+    def description(self, obj):
+        return f'Последние записи пользователя {obj.username}'
+
+    def link(self, obj):
+        return reverse('posts:profile', kwargs={'username': obj.username})
+
+    def posts(self, obj):
+        return obj.posts.select_related('author', 'group')
+
+
+class AtomLatestPostsFeed(LatestPostsFeed):
+    feed_type = Atom1Feed
+    subtitle = LatestPostsFeed.description
+
+
+class AtomGroupPostsFeed(GroupPostsFeed):
+    feed_type = Atom1Feed
+
+    def subtitle(self, obj):
+        return obj.description
+
+
+class AtomAuthorPostsFeed(AuthorPostsFeed):
+    feed_type = Atom1Feed
+
+    def subtitle(self, obj):
+        return self.description(obj)
+
+
+def render_feed(feed, request, kwargs):
+    """Returns (content, content_type, etag, last_modified) of feed.
+    """
+    response = feed(request, **kwargs)
+    etag = '"{}"'.format(hashlib.md5(response.content).hexdigest())
+    last_modified = None
+    if response.has_header('Last-Modified'):
+        last_modified = parse_http_date_safe(response['Last-Modified'])
+    return response.content, response['Content-Type'], etag, last_modified
+
+
+def conditional_feed(feed, *tag_templates):
+    """Serves feed from cache under versions of tag_templates formatted
+    with view kwargs, the same tags that invalidate HTML pages listing
+    the posts. Clients still holding the cached version get 304 without
+    a single query, the ETag is a digest of the XML, so re-rendering
+    an unchanged feed keeps it valid.
+    """
+    def view(request, **kwargs):
+        tags = ['pages'] + [
+            template.format(**kwargs) for template in tag_templates
+        ]
+        versions = get_versions(tags)
+        key = 'posts:feed:{}:{}'.format(
+            hashlib.md5(request.path.encode()).hexdigest(),
+            '.'.join(versions[tag] for tag in tags),
+        )
+        cached = cache.get(key)
+        if cached is None:
+            cached = render_feed(feed, request, kwargs)
+            if versions_settled(versions.values()):
+                cache.set(key, cached, settings.POSTS_FEED_TIMEOUT)
+        content, content_type, etag, last_modified = cached
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = HttpResponse(content, content_type=content_type)
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        return response
+    return view
+
+
+latest_posts_rss = conditional_feed(LatestPostsFeed(), 'feed')
+latest_posts_atom = conditional_feed(AtomLatestPostsFeed(), 'feed')
+group_posts_rss = conditional_feed(GroupPostsFeed(), 'group_page:{slug}')
+group_posts_atom = conditional_feed(
+    AtomGroupPostsFeed(), 'group_page:{slug}'
+)
+author_posts_rss = conditional_feed(
+    AuthorPostsFeed(), 'profile:{username}'
+)
+author_posts_atom = conditional_feed(
+    AtomAuthorPostsFeed(), 'profile:{username}'
+)
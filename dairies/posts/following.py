@@ -0,0 +1,53 @@
+# cached sets of authors followed by users
+
+from array import array
+from bisect import bisect_left
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Follow
+
+# ids are stored as native 64-bit integers, 8 bytes per followed author
+ID_TYPE = 'q'
+
+
+def following_key(user_id):
+    return f'posts:following:{user_id}'
+
+
+def followed_author_ids(user_id):
+    """Returns sorted array of ids of authors user follows. It is read
+    from the primary database once and cached until user follows
+    or unfollows somebody.
+    """
+    author_ids = array(ID_TYPE)
+    data = cache.get(following_key(user_id))
+    if data is None:
+        author_ids.extend(
+            Follow.objects.using('default').filter(user_id=user_id)
+            .order_by('author_id').values_list('author_id', flat=True)
+        )
+        cache.set(
+            following_key(user_id), author_ids.tobytes(),
+            settings.POSTS_FOLLOWING_TIMEOUT,
+        )
+    else:
+        author_ids.frombytes(data)
+    return author_ids
+
+
+def is_following(user_id, author_id):
+    author_ids = followed_author_ids(user_id)
+    index = bisect_left(author_ids, author_id)
+    return index < len(author_ids) and author_ids[index] == author_id
+
+
+def forget_followed_authors(user_id):
+    """Drops cached set of user now and once the transaction commits,
+    so a request reading before the commit can't keep the old set.
+    """
+    key = following_key(user_id)
+    cache.delete(key)
+    transaction.on_commit(lambda: cache.delete(key))
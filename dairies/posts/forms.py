@@ -1,12 +1,14 @@
 from django.forms import ModelForm, Textarea
 
 from .models import Comment, Post
+from .uploads import UploadedImageField
 
 
 class PostForm(ModelForm):
     class Meta:
         model = Post
         fields = ('text', 'group', 'image',)
+        field_classes = {'image': UploadedImageField}
 
 
 class CommentForm(ModelForm):
@@ -0,0 +1,56 @@
+# re-encoding of uploaded images, runs in worker processes
+# and must not import Django models or settings
+
+import signal
+import warnings
+
+from PIL import Image, ImageOps
+
+
+class ProcessingTimeout(Exception):
+    pass
+
+
+def _raise_timeout(signum, frame):
+    raise ProcessingTimeout()
+
+
+def init_worker():
+    signal.signal(signal.SIGALRM, _raise_timeout)
+
+
+def sanitize_image(source_path, target_path, format_, max_side,
+                   max_pixels, timeout=None):
+    """Re-encodes image at source_path into target_path without EXIF
+    and other metadata, applying EXIF orientation and downscaling it
+    to fit max_side. Returns (width, height) of the new image,
+    images of more than max_pixels raise ValueError before decoding.
+    timeout (seconds) is enforced with SIGALRM in worker processes.
+    """
+    if timeout:
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        with warnings.catch_warnings():
+            # pixels are counted below, decoding stays bounded
+            warnings.simplefilter('ignore', Image.DecompressionBombWarning)
+            with Image.open(source_path) as image:
+                # not Image.MAX_IMAGE_PIXELS, a global of PIL shared
+                # by every thread of the process
+                if image.width * image.height > max_pixels:
+                    raise ValueError(
+                        f'Image has more than {max_pixels} pixels'
+                    )
+                image = ImageOps.exif_transpose(image)
+                image.thumbnail((max_side, max_side))
+                if format_ == 'JPEG' and image.mode not in ('RGB', 'L'):
+                    image = image.convert('RGB')
+                params = {}
+                if image.info.get('icc_profile'):
+                    params['icc_profile'] = image.info['icc_profile']
+                if format_ in ('JPEG', 'WEBP'):
+                    params['quality'] = 90
+                image.save(target_path, format=format_, **params)
+                return image.size
+    finally:
+        if timeout:
+            signal.setitimer(signal.ITIMER_REAL, 0)
@@ -0,0 +1,110 @@
+# data derived from posts, comments and follows, rebuilt after bulk inserts
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Max
+
+from .caching import bump_versions
+from .counts import post_scopes, recount, repair_counters, scope_key
+from .following import following_key
+from .models import Comment, Follow, Group, Post, User
+from .search import index_objects, rebuild_index
+from .timeline import rebuild_author_timelines, rebuild_timelines
+
+# models import_dairies inserts rows of in bulk
+BULK_MODELS = {
+    'user': User, 'post': Post, 'comment': Comment, 'follow': Follow,
+}
+
+
+def rebuild_derived_data(chunk_size=1000):
+    """Brings counters, timelines, search index and caches up to date
+    with rows inserted by bulk_create, which bypasses signals.
+    Returns number of timeline entries.
+    """
+    repair_counters(chunk_size)
+    with transaction.atomic():
+        entries = rebuild_timelines()
+    rebuild_index()
+    cache.clear()
+    return entries
+
+
+def last_pks():
+    """Returns {kind: largest pk} of BULK_MODELS, rows inserted
+    afterwards have larger pks.
+    """
+    return {
+        kind: model.objects.aggregate(last=Max('pk'))['last'] or 0
+        for kind, model in BULK_MODELS.items()
+    }
+
+
+def chunks(values, chunk_size):
+    values = list(values)
+    for start in range(0, len(values), chunk_size):
+        yield values[start:start + chunk_size]
+
+
+def update_inserted_data(since, chunk_size=1000):
+    """Brings counters, timelines, search index and caches up to date
+    with rows inserted by bulk_create after since, a result
+    of last_pks(). Data of other rows and unrelated cache entries
+    are left as they are.
+    """
+    users = User.objects.filter(pk__gt=since['user'])
+    posts = Post.objects.filter(pk__gt=since['post'])
+    comments = Comment.objects.filter(pk__gt=since['comment'])
+    follows = Follow.objects.filter(pk__gt=since['follow'])
+    follows = set(follows.values_list('user_id', 'author_id'))
+    new_posts = set(posts.values_list('author_id', 'group_id'))
+    commented_ids = set(comments.values_list('post_id', flat=True))
+    commented_posts = set()
+    for chunk in chunks(commented_ids, chunk_size):
+        commented_posts.update(
+            Post.objects.filter(pk__in=chunk)
+            .values_list('author_id', 'group_id')
+        )
+    author_ids = (
+        {author_id for author_id, _ in new_posts}
+        | {author_id for _, author_id in follows}
+    )
+    recount(
+        author_ids | {user_id for user_id, _ in follows}
+        | set(users.values_list('pk', flat=True)),
+        commented_ids, chunk_size,
+    )
+    with transaction.atomic():
+        rebuild_author_timelines(author_ids)
+    index_objects('posts', posts, chunk_size)
+    index_objects('comments', comments, chunk_size)
+
+    # cached counts of feeds with new posts, follow sets of followers
+    cache.delete_many([
+        scope_key(scope)
+        for author_id, group_id in new_posts
+        for scope in post_scopes(author_id, group_id)
+    ])
+    cache.delete_many([following_key(user_id) for user_id, _ in follows])
+    # profiles show counters, cards show numbers of comments
+    listed_posts = new_posts | commented_posts
+    user_ids = (
+        {author_id for author_id, _ in listed_posts}
+        | {user_id for follow in follows for user_id in follow}
+    )
+    group_ids = {group_id for _, group_id in listed_posts} - {None}
+    bump_versions('feed')
+    for chunk in chunks(user_ids, chunk_size):
+        bump_versions(*(
+            f'profile:{username}' for username in User.objects.filter(
+                pk__in=chunk
+            ).values_list('username', flat=True)
+        ))
+    for chunk in chunks(group_ids, chunk_size):
+        bump_versions(*(
+            f'group_page:{slug}' for slug in Group.objects.filter(
+                pk__in=chunk
+            ).values_list('slug', flat=True)
+        ))
+    for chunk in chunks(commented_ids, chunk_size):
+        bump_versions(*(f'post:{post_id}' for post_id in chunk))
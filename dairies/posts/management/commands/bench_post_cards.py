@@ -0,0 +1,57 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import Client, override_settings
+from django.urls import reverse
+
+# isolated cache, only post cards may be cached
+BENCH_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'bench_post_cards',
+    },
+}
+
+
+class Command(BaseCommand):
+    help = 'Compares index render time with and without cached post cards'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests', type=int, default=50,
+            help='Number of measured requests for every mode',
+        )
+
+    def measure(self, client, url, requests):
+        client.get(url)  # warm up thumbnails and caches
+        timings = []
+        for _ in range(requests):
+            started = time.perf_counter()
+            client.get(url)
+            timings.append((time.perf_counter() - started) * 1000)
+        return timings
+
+    def handle(self, *args, **options):
+        url = reverse('posts:index')
+        client = Client()
+        results = {}
+        for card_cache in (False, True):
+            with override_settings(
+                CACHES=BENCH_CACHES,
+                POSTS_CARD_CACHE=card_cache,
+                POSTS_PAGE_CACHE=False,
+            ):
+                timings = self.measure(client, url, options['requests'])
+            results[card_cache] = statistics.mean(timings)
+            self.stdout.write(
+                '{:<14} mean {:7.2f} ms  median {:7.2f} ms  max {:7.2f} ms'
+                .format(
+                    'cached cards' if card_cache else 'no card cache',
+                    results[card_cache],
+                    statistics.median(timings),
+                    max(timings),
+                )
+            )
+        saving = 1 - results[True] / results[False]
+        self.stdout.write(f'render time saving: {saving:.0%}')
@@ -0,0 +1,40 @@
+import os
+
+from django.core.management.base import BaseCommand
+
+from posts.exchange import export_dairies
+
+
+class Command(BaseCommand):
+    help = (
+        'Exports users, groups, posts, comments and follows as JSON lines, '
+        'images of posts are copied to a directory alongside. '
+        'Users are exported with password hashes'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='File to write, - for stdout')
+        parser.add_argument(
+            '--media-dir',
+            help='Directory for images, <path without extension>_media '
+                 'by default, images are not exported to stdout without it',
+        )
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        media_dir = options['media_dir']
+        if media_dir is None and path != '-':
+            media_dir = os.path.splitext(path)[0] + '_media'
+        if path == '-':
+            counts = export_dairies(
+                self.stdout, media_dir, options['chunk_size']
+            )
+            report = self.stderr
+        else:
+            with open(path, 'w', encoding='utf-8') as file:
+                counts = export_dairies(file, media_dir, options['chunk_size'])
+            report = self.stdout
+        report.write('Exported ' + ', '.join(
+            f'{count} {kind}s' for kind, count in counts.items()
+        ))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from posts.models import Post
+from posts.thumbnails import generate_post_thumbnails
+
+
+class Command(BaseCommand):
+    help = 'Generates missing thumbnails of post images'
+
+    def handle(self, *args, **options):
+        post_ids = Post.objects.exclude(image='').values_list(
+            'pk', flat=True
+        )
+        generated = 0
+        for post_id in post_ids.iterator():
+            generate_post_thumbnails(post_id)
+            generated += 1
+        self.stdout.write(f'Generated thumbnails of {generated} posts')
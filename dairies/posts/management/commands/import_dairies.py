@@ -0,0 +1,57 @@
+import os
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.exchange import Importer, InvalidRecord
+
+
+class Command(BaseCommand):
+    help = (
+        'Imports JSON lines written by export_dairies. An interrupted '
+        'import of a file continues where it stopped when started again'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='File to read, - for stdin')
+        parser.add_argument(
+            '--media-dir',
+            help='Directory with exported images, '
+                 '<path without extension>_media by default',
+        )
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument(
+            '--restart', action='store_true',
+            help='Ignore progress saved by an interrupted import',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        media_dir = options['media_dir']
+        source = None
+        if path != '-':
+            media_dir = media_dir or os.path.splitext(path)[0] + '_media'
+            # progress of the import is saved under the file's path
+            source = os.path.abspath(path)
+        importer = Importer(media_dir, options['chunk_size'], source)
+        if options['restart']:
+            importer.clear_state()
+        try:
+            if path == '-':
+                counts = importer.run(sys.stdin.buffer)
+            else:
+                with open(path, 'rb') as file:
+                    counts = importer.run(file)
+        except InvalidRecord as error:
+            raise CommandError(error)
+        self.stdout.write('Imported ' + ', '.join(
+            f'{count} {kind}s' for kind, count in counts.items()
+        ))
+        if importer.skipped:
+            self.stdout.write(
+                f'Skipped {importer.skipped} records referring to '
+                'missing users or posts'
+            )
+        self.stdout.write(
+            'Run generate_thumbnails to prepare images of imported posts'
+        )
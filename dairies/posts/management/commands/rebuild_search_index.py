@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from posts.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds full-text search index of posts and comments'
+
+    def handle(self, *args, **options):
+        posts, comments = rebuild_index()
+        self.stdout.write(
+            f'Indexed {posts} posts and {comments} comments'
+        )
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from posts.counts import repair_counters
+
+
+class Command(BaseCommand):
+    help = 'Recomputes post, comment and follower counters that drifted'
+
+    def handle(self, *args, **options):
+        repaired_stats, repaired_posts = repair_counters()
+        self.stdout.write(
+            f'Repaired counters of {repaired_stats} users '
+            f'and {repaired_posts} posts'
+        )
@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand
+
+from posts.seeding import SEED_PASSWORD, Seeder
+
+
+class Command(BaseCommand):
+    help = (
+        'Fills the database with a synthetic dataset, posts, followers '
+        'and comments are distributed by power laws. Clears the cache'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument('--comments', type=int, default=30000)
+        parser.add_argument('--follows', type=int, default=20000)
+        parser.add_argument(
+            '--images', type=float, default=0,
+            help='Share of posts having a tiny generated image',
+        )
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='Same seed generates the same dataset',
+        )
+        parser.add_argument(
+            '--exponent', type=float, default=1.1,
+            help='Exponent of power laws, higher is more skewed',
+        )
+        parser.add_argument('--days', type=int, default=365)
+        parser.add_argument('--chunk-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        seeder = Seeder(
+            seed=options['seed'],
+            chunk_size=options['chunk_size'],
+            days=options['days'],
+            exponent=options['exponent'],
+            stdout=self.stdout,
+        )
+        seeder.seed(
+            users=options['users'],
+            groups=options['groups'],
+            posts=options['posts'],
+            comments=options['comments'],
+            follows=options['follows'],
+            image_ratio=options['images'],
+        )
+        self.stdout.write(f'Password of generated users: {SEED_PASSWORD}')
@@ -0,0 +1,111 @@
+import re
+from functools import lru_cache
+
+from django.db import migrations
+
+# snapshot of posts.search at the time of this migration, later changes
+# of the app must not change what the migration does
+
+TABLES = {'posts_search_post': 'Post', 'posts_search_comment': 'Comment'}
+
+WORD = re.compile(r'\w+')
+
+PERFECTIVE_GERUND = re.compile(
+    r'((ив|ивши|ившись|ыв|ывши|ывшись)|((?<=[ая])(в|вши|вшись)))$'
+)
+REFLEXIVE = re.compile(r'(с[яь])$')
+ADJECTIVE = re.compile(
+    r'(ее|ие|ые|ое|ими|ыми|ей|ий|ый|ой|ем|им|ым|ом|его|ого|ему|ому|их|ых|'
+    r'ую|юю|ая|яя|ою|ею)$'
+)
+PARTICIPLE = re.compile(r'((ивш|ывш|ующ)|((?<=[ая])(ем|нн|вш|ющ|щ)))$')
+VERB = re.compile(
+    r'((ила|ыла|ена|ейте|уйте|ите|или|ыли|ей|уй|ил|ыл|им|ым|ен|ило|ыло|'
+    r'ено|ят|ует|уют|ит|ыт|ены|ить|ыть|ишь|ую|ю)|'
+    r'((?<=[ая])(ла|на|ете|йте|ли|й|л|ем|н|ло|но|ет|ют|ны|ть|ешь|нно)))$'
+)
+NOUN = re.compile(
+    r'(а|ев|ов|ие|ье|е|иями|ями|ами|еи|ии|и|ией|ей|ой|ий|й|иям|ям|ием|ем|'
+    r'ам|ом|о|у|ах|иях|ях|ы|ь|ию|ью|ю|ия|ья|я)$'
+)
+RV = re.compile(r'^(.*?[аеиоуыэюя])(.*)$')
+DERIVATIONAL = re.compile(r'.*[^аеиоуыэюя]+[аеиоуыэюя].*ость?$')
+DERIVATIONAL_ENDING = re.compile(r'ость?$')
+SUPERLATIVE = re.compile(r'(ейше|ейш)$')
+I_ENDING = re.compile(r'и$')
+SOFT_SIGN = re.compile(r'ь$')
+DOUBLE_N = re.compile(r'нн$')
+
+
+@lru_cache(maxsize=100000)
+def stem(word):
+    word = word.replace('ё', 'е')
+    match = RV.match(word)
+    if match is None:
+        return word
+    start, rv = match.groups()
+    stripped = PERFECTIVE_GERUND.sub('', rv, 1)
+    if stripped == rv:
+        rv = REFLEXIVE.sub('', rv, 1)
+        stripped = ADJECTIVE.sub('', rv, 1)
+        if stripped != rv:
+            rv = PARTICIPLE.sub('', stripped, 1)
+        else:
+            stripped = VERB.sub('', rv, 1)
+            if stripped == rv:
+                rv = NOUN.sub('', rv, 1)
+            else:
+                rv = stripped
+    else:
+        rv = stripped
+    rv = I_ENDING.sub('', rv, 1)
+    if DERIVATIONAL.match(rv):
+        rv = DERIVATIONAL_ENDING.sub('', rv, 1)
+    stripped = SOFT_SIGN.sub('', rv, 1)
+    if stripped == rv:
+        rv = SUPERLATIVE.sub('', rv, 1)
+        rv = DOUBLE_N.sub('н', rv, 1)
+    else:
+        rv = stripped
+    return start + rv
+
+
+def tokenize(text):
+    return [stem(word) for word in WORD.findall(text.lower())]
+
+
+def create_search_index(apps, schema_editor):
+    # other databases are searched with BasicSearchBackend
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for table, model_name in TABLES.items():
+        schema_editor.execute(
+            f'CREATE VIRTUAL TABLE IF NOT EXISTS {table} USING fts5('
+            "body, tokenize='unicode61 remove_diacritics 0')"
+        )
+        model = apps.get_model('posts', model_name)
+        with schema_editor.connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {table} (rowid, body) VALUES (%s, %s)',
+                (
+                    (pk, ' '.join(tokenize(text)))
+                    for pk, text in model.objects.values_list('pk', 'text')
+                ),
+            )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        for table in TABLES:
+            schema_editor.execute(f'DROP TABLE IF EXISTS {table}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0007_post_image_variants'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,51 @@
+from django.conf import settings
+from django.db import migrations
+
+
+def fill_timelines(apps, schema_editor):
+    """Copies latest posts of followed authors to timelines of their
+    followers, as rebuild_timelines() of the time did. Entries that
+    already exist are kept, so installs that rebuilt timelines by hand
+    are left as they are.
+    """
+    Follow = apps.get_model('posts', 'Follow')
+    Post = apps.get_model('posts', 'Post')
+    TimelineEntry = apps.get_model('posts', 'TimelineEntry')
+    tables = {
+        'timeline': TimelineEntry._meta.db_table,
+        'follow': Follow._meta.db_table,
+        'post': Post._meta.db_table,
+    }
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            """
+            INSERT INTO {timeline} (user_id, post_id, author_id, pub_date)
+            SELECT follow.user_id, post.id, post.author_id, post.pub_date
+            FROM {follow} follow JOIN (
+                SELECT id, author_id, pub_date, ROW_NUMBER() OVER (
+                    PARTITION BY author_id ORDER BY pub_date DESC, id DESC
+                ) AS position
+                FROM {post}
+            ) post ON post.author_id = follow.author_id
+            WHERE post.position <= %s AND follow.author_id NOT IN (
+                SELECT author_id FROM {follow}
+                GROUP BY author_id HAVING COUNT(*) > %s
+            ) AND NOT EXISTS (
+                SELECT 1 FROM {timeline} entry
+                WHERE entry.user_id = follow.user_id
+                AND entry.post_id = post.id
+            )
+            """.format(**tables),
+            [settings.POSTS_TIMELINE_BACKFILL, settings.POSTS_FANOUT_LIMIT],
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0009_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_timelines, migrations.RunPython.noop),
+    ]
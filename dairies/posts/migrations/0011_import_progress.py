@@ -0,0 +1,33 @@
+# Generated by Django 2.2.28 on 2026-10-18 00:15
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0010_fill_timelines'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportProgress',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=1024, unique=True, verbose_name='Файл')),
+                ('offset', models.BigIntegerField(default=0, verbose_name='Позиция в файле')),
+                ('counts', models.TextField(default='{}', verbose_name='Импортировано')),
+                ('skipped', models.PositiveIntegerField(default=0, verbose_name='Пропущено')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ImportedPost',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('exported_id', models.BigIntegerField(verbose_name='Id в файле')),
+                ('post_pk', models.BigIntegerField(verbose_name='Id записи')),
+                ('progress', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='posts', to='posts.ImportProgress')),
+            ],
+        ),
+    ]
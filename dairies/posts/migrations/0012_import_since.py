@@ -0,0 +1,18 @@
+# Generated by Django 2.2.28 on 2026-10-18 00:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0011_import_progress'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importprogress',
+            name='since',
+            field=models.TextField(default='{}', verbose_name='Последние id до импорта'),
+        ),
+    ]
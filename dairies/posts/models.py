@@ -1,3 +1,5 @@
+import json
+
 from django.contrib.auth import get_user_model
 from django.db import models
 
@@ -31,13 +33,46 @@ class Post(PubDateModel):
         upload_to='posts/',
         blank=True
     )
+    comments_count = models.PositiveIntegerField(
+        'Число комментариев',
+        default=0,
+        editable=False,
+    )
+    image_variants = models.TextField(
+        'Варианты изображения',
+        blank=True,
+        editable=False,
+    )
 
     class Meta:
         ordering = ['-pub_date']
+        # feeds are read newest first with (pub_date, id) keyset cursors
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='post_feed_idx',
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_feed_idx',
+            ),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_feed_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.text[:15]
 
+    def get_image_variants(self):
+        """Returns {format: [[name, width, height], ...]} of generated
+        responsive variants of the image, empty until they are ready.
+        """
+        if not self.image_variants:
+            return {}
+        return json.loads(self.image_variants)
+
 
 class Group(models.Model):
     title = models.CharField(
@@ -85,6 +120,12 @@ class Comment(PubDateModel):
 
     class Meta:
         ordering = ['-pub_date']
+        indexes = [
+            models.Index(
+                fields=['post', '-pub_date', '-id'],
+                name='comment_thread_idx',
+            ),
+        ]
 
     def save(self, *args, **kwargs):
         self.initial_text = self.text
@@ -119,3 +160,108 @@ class Follow(models.Model):
                 name='Пользователь не может подписаться сам на себя'
             ),
         ]
+        # unique constraint covers lookups by user, this one by author
+        indexes = [
+            models.Index(
+                fields=['author', 'user'],
+                name='follow_author_idx',
+            ),
+        ]
+
+
+class TimelineEntry(models.Model):
+    """Post materialized in subscriptions feed of a follower.
+    Author and pub_date are copied from the post so the feed
+    is read and pruned without joins.
+    """
+    user = models.ForeignKey(
+        User,
+        verbose_name='Подписчик',
+        on_delete=models.CASCADE,
+        related_name='timeline',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+    )
+    author = models.ForeignKey(
+        User,
+        verbose_name='Автор',
+        on_delete=models.CASCADE,
+        related_name='+',
+    )
+    pub_date = models.DateTimeField('Дата публикации')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='unique_timeline_entry',
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='timeline_feed_idx',
+            ),
+            models.Index(
+                fields=['user', 'author'],
+                name='timeline_prune_idx',
+            ),
+        ]
+
+
+class AuthorStats(models.Model):
+    """Counters of a user kept exact by signals of Post and Follow
+    write paths, repaired with manage.py repair_counters.
+    """
+    user = models.OneToOneField(
+        User,
+        verbose_name='Пользователь',
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+    )
+    posts_count = models.PositiveIntegerField('Число постов', default=0)
+    followers_count = models.PositiveIntegerField(
+        'Число подписчиков',
+        default=0,
+    )
+    following_count = models.PositiveIntegerField(
+        'Число подписок',
+        default=0,
+    )
+
+    def __str__(self):
+        return f'Счётчики {self.user_id}'
+
+
+class ImportProgress(models.Model):
+    """Position of import_dairies in a file, saved in the transaction
+    of every imported chunk, so an interrupted import continues right
+    after the last committed chunk.
+    """
+    source = models.CharField('Файл', max_length=1024, unique=True)
+    offset = models.BigIntegerField('Позиция в файле', default=0)
+    counts = models.TextField('Импортировано', default='{}')
+    skipped = models.PositiveIntegerField('Пропущено', default=0)
+    # largest pks of tables before the import, later rows are imported
+    since = models.TextField('Последние id до импорта', default='{}')
+
+    def __str__(self):
+        return self.source
+
+
+class ImportedPost(models.Model):
+    """Imported post of an unfinished import, comments of the file
+    refer to posts by their exported ids. A plain id rather than
+    a foreign key keeps deletes of posts free of this table.
+    """
+    progress = models.ForeignKey(
+        ImportProgress,
+        on_delete=models.CASCADE,
+        related_name='posts',
+    )
+    exported_id = models.BigIntegerField('Id в файле')
+    post_pk = models.BigIntegerField('Id записи')
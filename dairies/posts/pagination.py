@@ -0,0 +1,171 @@
+# keyset (cursor) and counted pagination for post feeds
+
+import base64
+import binascii
+from collections.abc import Sequence
+
+from django.core.paginator import Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+
+def encode_cursor(obj):
+    """Returns url-safe token pointing at object position in the feed.
+    """
+    raw = '{}|{}'.format(obj.pub_date.isoformat(), obj.pk)
+    token = base64.urlsafe_b64encode(raw.encode())
+    return token.decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Returns (pub_date, pk) pair encoded in token
+    or None if token is missing or malformed.
+    """
+    if not token:
+        return None
+    try:
+        padding = '=' * (-len(token) % 4)
+        raw = base64.urlsafe_b64decode(token + padding).decode()
+        pub_date, pk = raw.rsplit('|', 1)
+        pub_date = parse_datetime(pub_date)
+        pk = int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    if pub_date is None:
+        return None
+    return pub_date, pk
+
+
+def keyset_queryset(queryset, position=None, newer=False, pk_field='pk'):
+    """Filters queryset to objects older (or newer) than position
+    and orders it starting from the nearest one.
+    """
+    if position is not None:
+        pub_date, pk = position
+        if newer:
+            queryset = queryset.filter(
+                Q(pub_date__gt=pub_date)
+                | Q(pub_date=pub_date, **{pk_field + '__gt': pk})
+            )
+        else:
+            queryset = queryset.filter(
+                Q(pub_date__lt=pub_date)
+                | Q(pub_date=pub_date, **{pk_field + '__lt': pk})
+            )
+    if newer:
+        return queryset.order_by('pub_date', pk_field)
+    return queryset.order_by('-pub_date', '-' + pk_field)
+
+
+class KeysetPage(Sequence):
+    """Page of objects with cursors to its neighbours.
+    Mirrors the parts of django.core.paginator.Page
+    that templates rely on.
+    """
+    def __init__(self, object_list, paginator, cursor='',
+                 has_previous=False, has_next=False):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.cursor = cursor
+        self._has_previous = has_previous
+        self._has_next = has_next
+
+    def __repr__(self):
+        return '<Keyset page {!r}>'.format(self.cursor or 'first')
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_previous or self._has_next
+
+    @property
+    def next_cursor(self):
+        if not self._has_next or not self.object_list:
+            return None
+        return encode_cursor(self.object_list[-1])
+
+    @property
+    def previous_cursor(self):
+        if not self._has_previous or not self.object_list:
+            return None
+        return encode_cursor(self.object_list[0])
+
+
+class KeysetPaginator:
+    """Paginates queryset ordered by (-pub_date, -pk) using
+    ?before= and ?after= cursors instead of COUNT and OFFSET,
+    so every page costs one indexed range read.
+    """
+    keyset = True
+
+    def __init__(self, object_list, per_page):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+
+    def fetch(self, position=None, newer=False):
+        """Returns up to per_page objects older (or newer) than position
+        in feed order and flag telling whether more objects exist.
+        object_list may be a queryset or provide its own keyset_fetch.
+        """
+        limit = self.per_page + 1
+        keyset_fetch = getattr(self.object_list, 'keyset_fetch', None)
+        if keyset_fetch is not None:
+            rows = keyset_fetch(position, newer, limit)
+        else:
+            rows = list(
+                keyset_queryset(self.object_list, position, newer)[:limit]
+            )
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if newer:
+            rows.reverse()
+        return rows, has_more
+
+    def get_page(self, before=None, after=None):
+        """Returns a page for cursor tokens, falling back to the first page
+        if tokens are malformed.
+        """
+        after_position = decode_cursor(after)
+        if after_position is not None:
+            rows, has_more = self.fetch(after_position, newer=True)
+            if has_more or len(rows) == self.per_page:
+                return KeysetPage(
+                    rows, self, 'a' + after,
+                    has_previous=has_more, has_next=True,
+                )
+            # reached the top of the feed, show the full first page
+            return self.get_page()
+        before_position = decode_cursor(before)
+        rows, has_more = self.fetch(before_position)
+        if before_position is None:
+            return KeysetPage(rows, self, has_next=has_more)
+        return KeysetPage(
+            rows, self, 'b' + before,
+            has_previous=True, has_next=has_more,
+        )
+
+
+class CountedPaginator(Paginator):
+    """Numbered paginator that takes the total from count provider
+    instead of running COUNT(*) over object_list on every request.
+    """
+    def __init__(self, object_list, per_page, count_provider, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.count_provider = count_provider
+        self.capped = False
+
+    @cached_property
+    def count(self):
+        count, self.capped = self.count_provider()
+        return count
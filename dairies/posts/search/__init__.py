@@ -0,0 +1,143 @@
+# full-text search over posts and comments
+
+import base64
+import binascii
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from dairies.settings import posts_per_page
+
+from ..models import Comment, Post
+from ..pagination import KeysetPage
+
+_backends = {}
+
+
+def get_backend():
+    """Returns instance of POSTS_SEARCH_BACKEND.
+    """
+    path = settings.POSTS_SEARCH_BACKEND
+    if path not in _backends:
+        _backends[path] = import_string(path)()
+    return _backends[path]
+
+
+def encode_search_cursor(score, pk):
+    raw = '{!r}|{}'.format(score, pk)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_search_cursor(token):
+    """Returns (score, pk) pair encoded in token
+    or None if token is missing or malformed.
+    """
+    if not token:
+        return None
+    try:
+        padding = '=' * (-len(token) % 4)
+        raw = base64.urlsafe_b64decode(token + padding).decode()
+        score, pk = raw.rsplit('|', 1)
+        return float(score), int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+
+
+class SearchPaginator:
+    keyset = True
+
+    def __init__(self, per_page):
+        self.per_page = per_page
+
+
+class SearchPage(KeysetPage):
+    """Page of ranked search results, only moves forward.
+    """
+    def __init__(self, object_list, paginator, cursor='', next_cursor=None):
+        super().__init__(
+            object_list, paginator, cursor,
+            has_previous=bool(cursor), has_next=next_cursor is not None,
+        )
+        self._next_cursor = next_cursor
+
+    @property
+    def next_cursor(self):
+        return self._next_cursor
+
+    @property
+    def previous_cursor(self):
+        return None
+
+
+def search_querysets():
+    return {
+        'posts': Post.objects.select_related('author', 'group'),
+        'comments': Comment.objects.select_related('author', 'post'),
+    }
+
+
+def search_page(kind, query, after=None, per_page=None):
+    """Returns page of kind ('posts' or 'comments') objects matching
+    query, best matches first, continuing after the cursor token.
+    """
+    per_page = per_page or posts_per_page
+    position = decode_search_cursor(after)
+    rows = get_backend().search(kind, query, position, per_page + 1)
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        last_pk, last_score = rows[-1]
+        next_cursor = encode_search_cursor(last_score, last_pk)
+    objects = search_querysets()[kind].in_bulk([pk for pk, _ in rows])
+    return SearchPage(
+        [objects[pk] for pk, _ in rows if pk in objects],
+        SearchPaginator(per_page),
+        after if position is not None else '',
+        next_cursor,
+    )
+
+
+def index_object(kind, obj):
+    get_backend().index(kind, obj.pk, obj.text)
+
+
+def remove_object(kind, obj):
+    get_backend().remove(kind, obj.pk)
+
+
+def remove_objects(kind, pks):
+    if pks:
+        get_backend().remove_rows(kind, pks)
+
+
+def index_objects(kind, queryset, chunk_size=1000):
+    """Indexes objects of queryset, e.g. rows inserted in bulk,
+    in chunks of chunk_size.
+    """
+    backend = get_backend()
+    rows = queryset.order_by('pk').values_list('pk', 'text')
+    last_pk = None
+    while True:
+        # keyset chunks, the index is written between reads
+        chunk = list(
+            (rows if last_pk is None else rows.filter(pk__gt=last_pk))[
+                :chunk_size
+            ]
+        )
+        if not chunk:
+            break
+        backend.index_rows(kind, chunk)
+        last_pk = chunk[-1][0]
+
+
+def rebuild_index():
+    """Reindexes every post and comment, returns numbers of them.
+    """
+    backend = get_backend()
+    counts = []
+    for kind, queryset in (
+        ('posts', Post.objects.all()), ('comments', Comment.objects.all())
+    ):
+        backend.rebuild(kind, queryset.values_list('pk', 'text').iterator())
+        counts.append(queryset.count())
+    return tuple(counts)
@@ -0,0 +1,178 @@
+# pluggable full-text search backends
+
+from abc import ABC, abstractmethod
+
+from django.apps import apps
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection, transaction
+from django.db.models.expressions import RawSQL
+
+from .stemming import tokenize
+
+# indexed models: kind -> (table of the index, indexed model label)
+INDEXES = {
+    'posts': ('posts_search_post', 'posts.Post'),
+    'comments': ('posts_search_comment', 'posts.Comment'),
+}
+
+
+class BaseSearchBackend(ABC):
+    """Search backend keeps its index of post and comment texts
+    in sync through index/remove, search returns ranked
+    (pk, score) pairs where smaller score is a better match.
+    """
+    @abstractmethod
+    def index(self, kind, pk, text):
+        pass
+
+    @abstractmethod
+    def remove(self, kind, pk):
+        pass
+
+    def index_rows(self, kind, rows):
+        """Indexes (pk, text) rows, e.g. of objects inserted in bulk.
+        """
+        for pk, text in rows:
+            self.index(kind, pk, text)
+
+    def remove_rows(self, kind, pks):
+        """Removes objects of pks, e.g. comments of a deleted post.
+        """
+        for pk in pks:
+            self.remove(kind, pk)
+
+    @abstractmethod
+    def rebuild(self, kind, rows):
+        """Replaces index of kind with (pk, text) rows.
+        """
+
+    @abstractmethod
+    def search(self, kind, query, position=None, limit=20):
+        pass
+
+    @abstractmethod
+    def filter_queryset(self, queryset, kind, query):
+        """Returns queryset narrowed to objects matching query.
+        """
+
+
+class BasicSearchBackend(BaseSearchBackend):
+    """Index-less backend for databases without FTS5: matches all
+    words of the query with LIKE and orders by recency.
+    """
+    # there is no index to keep
+    def index(self, kind, pk, text):
+        pass
+
+    def remove(self, kind, pk):
+        pass
+
+    def rebuild(self, kind, rows):
+        pass
+
+    def matching(self, queryset, query):
+        for word in query.split():
+            queryset = queryset.filter(text__icontains=word)
+        return queryset
+
+    def filter_queryset(self, queryset, kind, query):
+        return self.matching(queryset, query)
+
+    def search(self, kind, query, position=None, limit=20):
+        model = apps.get_model(INDEXES[kind][1])
+        queryset = self.matching(model.objects.all(), query)
+        if position is not None:
+            queryset = queryset.filter(pk__lt=position[1])
+        pks = queryset.order_by('-pk').values_list('pk', flat=True)[:limit]
+        return [(pk, 0.0) for pk in pks]
+
+
+class SQLiteFTSBackend(BaseSearchBackend):
+    """Inverted index in SQLite FTS5 tables over stemmed texts,
+    rowid of an index row is the pk of indexed object and
+    matches are ranked with bm25.
+    """
+    def __init__(self):
+        if connection.vendor != 'sqlite':
+            raise ImproperlyConfigured(
+                'SQLiteFTSBackend needs SQLite database, set '
+                'POSTS_SEARCH_BACKEND to BasicSearchBackend on '
+                f'{connection.vendor}'
+            )
+
+    @staticmethod
+    def match_expression(query):
+        # every word of the query has to match a stem prefix
+        return ' '.join(f'"{token}"*' for token in tokenize(query))
+
+    def index(self, kind, pk, text):
+        table = INDEXES[kind][0]
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {table} WHERE rowid = %s', [pk])
+            cursor.execute(
+                f'INSERT INTO {table} (rowid, body) VALUES (%s, %s)',
+                [pk, ' '.join(tokenize(text))],
+            )
+
+    def remove(self, kind, pk):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {INDEXES[kind][0]} WHERE rowid = %s', [pk]
+            )
+
+    def remove_rows(self, kind, pks):
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'DELETE FROM {INDEXES[kind][0]} WHERE rowid = %s',
+                [(pk,) for pk in pks],
+            )
+
+    def index_rows(self, kind, rows):
+        table = INDEXES[kind][0]
+        rows = [(pk, ' '.join(tokenize(text))) for pk, text in rows]
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.executemany(
+                f'DELETE FROM {table} WHERE rowid = %s',
+                [(pk,) for pk, _ in rows],
+            )
+            cursor.executemany(
+                f'INSERT INTO {table} (rowid, body) VALUES (%s, %s)', rows
+            )
+
+    def rebuild(self, kind, rows):
+        table = INDEXES[kind][0]
+        # one transaction, autocommit would commit every row
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {table}')
+            cursor.executemany(
+                f'INSERT INTO {table} (rowid, body) VALUES (%s, %s)',
+                ((pk, ' '.join(tokenize(text))) for pk, text in rows),
+            )
+
+    def search(self, kind, query, position=None, limit=20):
+        expression = self.match_expression(query)
+        if not expression:
+            return []
+        table = INDEXES[kind][0]
+        score = f'bm25({table})'
+        sql = f'SELECT rowid, {score} FROM {table} WHERE {table} MATCH %s'
+        params = [expression]
+        if position is not None:
+            # keyset over (score, rowid), same order as the ranking
+            sql += f' AND ({score} > %s OR ({score} = %s AND rowid > %s))'
+            params += [position[0], position[0], position[1]]
+        sql += f' ORDER BY {score}, rowid LIMIT %s'
+        params.append(limit)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+
+    def filter_queryset(self, queryset, kind, query):
+        expression = self.match_expression(query)
+        if not expression:
+            return queryset
+        table = INDEXES[kind][0]
+        return queryset.filter(pk__in=RawSQL(
+            f'SELECT rowid FROM {table} WHERE {table} MATCH %s',
+            [expression],
+        ))
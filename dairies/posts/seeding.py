@@ -0,0 +1,236 @@
+# synthetic dataset of the volume of production for local profiling
+
+import bisect
+import io
+import random
+from datetime import timedelta
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+from faker import Faker
+from PIL import Image
+from pytils.translit import slugify
+
+from core.bulk import bulk_create_chunked, explicit_pub_dates
+
+from .maintenance import rebuild_derived_data
+from .models import Comment, Follow, Group, Post, User
+
+# password of every generated user
+SEED_PASSWORD = 'dairies'
+
+# generated texts are joined from a pool of this many sentences
+SENTENCE_POOL = 2000
+
+# distinct tiny images shared by posts having an image
+IMAGE_POOL = 50
+
+
+def power_law_weights(size, exponent):
+    """Returns cumulative Zipf weights of ranks 1..size,
+    rank r is chosen proportionally to 1 / r ** exponent.
+    """
+    return list(accumulate(
+        1 / rank ** exponent for rank in range(1, size + 1)
+    ))
+
+
+class Seeder:
+    """Inserts users, groups, posts, comments and follows with chunked
+    bulk_create. Posts per author, followers per author and comments
+    per post follow power laws, so a few authors and posts get most of
+    the activity. The same seed generates the same dataset.
+    """
+    def __init__(self, seed=0, chunk_size=5000, days=365, exponent=1.1,
+                 stdout=None):
+        self.random = random.Random(seed)
+        self.faker = Faker('ru_RU')
+        self.faker.seed_instance(seed)
+        self.chunk_size = chunk_size
+        self.exponent = exponent
+        self.end = timezone.now()
+        self.start = self.end - timedelta(days=days)
+        self.stdout = stdout
+        self.sentences = [
+            self.faker.sentence(nb_words=self.random.randint(4, 14))
+            for _ in range(SENTENCE_POOL)
+        ]
+
+    def log(self, message):
+        if self.stdout is not None:
+            self.stdout.write(message)
+
+    def text(self, low, high):
+        sentences = self.random.randint(low, high)
+        return ' '.join(self.random.choices(self.sentences, k=sentences))
+
+    def pick(self, items, cum_weights):
+        return items[bisect.bisect_left(
+            cum_weights, self.random.random() * cum_weights[-1]
+        )]
+
+    def new_ids(self, model, previous_max_id):
+        return list(
+            model.objects.filter(pk__gt=previous_max_id)
+            .order_by('pk').values_list('pk', flat=True)
+        )
+
+    def max_id(self, model):
+        last = model.objects.order_by('-pk').values_list('pk', flat=True)
+        return last.first() or 0
+
+    def create_users(self, count):
+        previous_max_id = self.max_id(User)
+        password = make_password(SEED_PASSWORD)
+        prefix = f'seed{previous_max_id}'
+
+        def users():
+            for number in range(count):
+                yield User(
+                    username=f'{prefix}_{number}',
+                    first_name=self.faker.first_name(),
+                    last_name=self.faker.last_name(),
+                    password=password,
+                    date_joined=self.start,
+                )
+
+        bulk_create_chunked(User, users(), self.chunk_size)
+        user_ids = self.new_ids(User, previous_max_id)
+        # users active in the feeds come first in power law ranks
+        self.random.shuffle(user_ids)
+        return user_ids
+
+    def create_groups(self, count):
+        previous_max_id = self.max_id(Group)
+
+        def groups():
+            for number in range(count):
+                title = self.faker.sentence(nb_words=3).rstrip('.')
+                yield Group(
+                    title=title,
+                    slug=f'{slugify(title)[:80]}-{previous_max_id + number}',
+                    description=self.text(1, 3),
+                )
+
+        bulk_create_chunked(Group, groups(), self.chunk_size)
+        return self.new_ids(Group, previous_max_id)
+
+    def create_images(self, count):
+        names = []
+        for number in range(count):
+            color = tuple(self.random.randrange(256) for _ in range(3))
+            content = io.BytesIO()
+            Image.new('RGB', (16, 16), color).save(content, 'PNG')
+            names.append(default_storage.save(
+                f'posts/seed_{number}.png', ContentFile(content.getvalue())
+            ))
+        return names
+
+    def create_posts(self, count, user_ids, group_ids, image_ratio):
+        """Returns [(pk, pub_date)] of new posts in order of pub_date.
+        """
+        previous_max_id = self.max_id(Post)
+        author_weights = power_law_weights(len(user_ids), self.exponent)
+        images = []
+        if image_ratio:
+            images = self.create_images(min(IMAGE_POOL, count))
+        span = (self.end - self.start) / max(count, 1)
+        dates = []
+
+        def posts():
+            for number in range(count):
+                # ids grow with pub_date like in a live database
+                pub_date = self.start + span * (number + self.random.random())
+                dates.append(pub_date)
+                group_id = None
+                if group_ids and self.random.random() < 0.6:
+                    group_id = self.random.choice(group_ids)
+                image = ''
+                if images and self.random.random() < image_ratio:
+                    image = self.random.choice(images)
+                yield Post(
+                    text=self.text(1, 12),
+                    author_id=self.pick(user_ids, author_weights),
+                    group_id=group_id,
+                    image=image,
+                    pub_date=pub_date,
+                )
+
+        bulk_create_chunked(Post, posts(), self.chunk_size)
+        return list(zip(self.new_ids(Post, previous_max_id), dates))
+
+    def create_comments(self, count, user_ids, posts):
+        post_weights = power_law_weights(len(posts), self.exponent)
+        # newest posts are the most discussed ones
+        posts = posts[::-1]
+
+        def comments():
+            for _ in range(count):
+                post_id, post_date = self.pick(posts, post_weights)
+                pub_date = min(
+                    self.end,
+                    post_date + timedelta(
+                        hours=self.random.expovariate(1 / 24)
+                    ),
+                )
+                text = self.text(1, 3)
+                yield Comment(
+                    post_id=post_id,
+                    author_id=self.random.choice(user_ids),
+                    text=text,
+                    initial_text=text,
+                    pub_date=pub_date,
+                )
+
+        return bulk_create_chunked(Comment, comments(), self.chunk_size)
+
+    def create_follows(self, count, user_ids):
+        count = min(count, len(user_ids) * (len(user_ids) - 1))
+        # popularity is ranked independently of posting activity,
+        # otherwise timelines grow with the product of both
+        authors = self.random.sample(user_ids, len(user_ids))
+        author_weights = power_law_weights(len(authors), self.exponent)
+        pairs = set()
+
+        def follows():
+            while len(pairs) < count:
+                user_id = self.random.choice(user_ids)
+                author_id = self.pick(authors, author_weights)
+                if user_id == author_id or (user_id, author_id) in pairs:
+                    continue
+                pairs.add((user_id, author_id))
+                yield Follow(user_id=user_id, author_id=author_id)
+
+        return bulk_create_chunked(
+            Follow, follows(), self.chunk_size, ignore_conflicts=True
+        )
+
+    def seed(self, users, groups, posts, comments, follows, image_ratio=0):
+        """Inserts the dataset and brings derived data up to date:
+        counters, timelines, search index and caches.
+        """
+        with transaction.atomic():
+            user_ids = self.create_users(users)
+            self.log(f'Created {len(user_ids)} users')
+            group_ids = self.create_groups(groups)
+            self.log(f'Created {len(group_ids)} groups')
+            created_posts = []
+            if user_ids:
+                with explicit_pub_dates(Post, Comment):
+                    created_posts = self.create_posts(
+                        posts, user_ids, group_ids, image_ratio
+                    )
+                    self.log(f'Created {len(created_posts)} posts')
+                    if created_posts:
+                        created = self.create_comments(
+                            comments, user_ids, created_posts
+                        )
+                        self.log(f'Created {created} comments')
+                created = self.create_follows(follows, user_ids)
+                self.log(f'Created {created} follows')
+        entries = rebuild_derived_data(self.chunk_size)
+        self.log(f'Rebuilt timelines with {entries} entries')
@@ -0,0 +1,257 @@
+# signal receivers keeping caches of posts app in sync with the database
+
+import threading
+
+from django.db.models.signals import (
+    post_delete, post_save, pre_delete, pre_save,
+)
+from django.dispatch import receiver
+
+from .caching import bump_versions
+from .counts import (
+    change_author_stats, change_comments_count, change_post_counts,
+    post_scopes,
+)
+from .following import forget_followed_authors
+from .models import AuthorStats, Comment, Follow, Group, Post, User
+from .search import index_object, remove_object, remove_objects
+from .timeline import (
+    backfill_timeline, fan_out_post, followers_changed, prune_timeline,
+)
+
+
+# {post id: pks of its deleted comments} of posts this thread deletes
+_deleting = threading.local()
+
+
+def deleting_posts():
+    if not hasattr(_deleting, 'posts'):
+        _deleting.posts = {}
+    return _deleting.posts
+
+
+@receiver(pre_delete, sender=Post)
+def start_post_delete(sender, instance, **kwargs):
+    """Marks the post as being deleted. Receivers of its comments,
+    deleted by the cascade before the post, skip what goes away
+    with the post: its counter and card, and leave their index rows
+    to be removed at once with the post.
+    """
+    deleting_posts()[instance.pk] = []
+
+
+@receiver(post_delete, sender=Post)
+def finish_post_delete(sender, instance, **kwargs):
+    remove_objects('comments', deleting_posts().pop(instance.pk, []))
+
+
+@receiver(pre_save, sender=Post)
+def remember_previous_group(sender, instance, **kwargs):
+    """Stores group the post belonged to before edit.
+    """
+    instance._previous_group_id = None
+    if instance.pk is not None:
+        instance._previous_group_id = (
+            Post.objects.filter(pk=instance.pk)
+            .values_list('group_id', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Post)
+def count_saved_post(sender, instance, created, **kwargs):
+    previous_group_id = getattr(instance, '_previous_group_id', None)
+    if created:
+        change_post_counts(
+            post_scopes(instance.author_id, instance.group_id), 1
+        )
+    elif previous_group_id != instance.group_id:
+        if previous_group_id is not None:
+            change_post_counts([f'group:{previous_group_id}'], -1)
+        if instance.group_id is not None:
+            change_post_counts([f'group:{instance.group_id}'], 1)
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    change_post_counts(post_scopes(instance.author_id, instance.group_id), -1)
+
+
+@receiver(post_save, sender=User)
+def create_author_stats(sender, instance, created, **kwargs):
+    if created:
+        AuthorStats.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=Post)
+def count_author_post(sender, instance, created, **kwargs):
+    if created:
+        change_author_stats(instance.author_id, posts_count=1)
+
+
+@receiver(post_delete, sender=Post)
+def uncount_author_post(sender, instance, **kwargs):
+    change_author_stats(instance.author_id, posts_count=-1)
+
+
+@receiver(post_save, sender=Comment)
+def count_comment(sender, instance, created, **kwargs):
+    if created:
+        change_comments_count(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def uncount_comment(sender, instance, **kwargs):
+    if instance.post_id not in deleting_posts():
+        change_comments_count(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Follow)
+def count_follow(sender, instance, created, **kwargs):
+    if created:
+        change_author_stats(instance.author_id, followers_count=1)
+        change_author_stats(instance.user_id, following_count=1)
+
+
+@receiver(post_delete, sender=Follow)
+def uncount_follow(sender, instance, **kwargs):
+    change_author_stats(instance.author_id, followers_count=-1)
+    change_author_stats(instance.user_id, following_count=-1)
+
+
+@receiver(post_save, sender=Post)
+def fan_out_created_post(sender, instance, created, **kwargs):
+    if created:
+        fan_out_post(instance)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_followed_posts(sender, instance, created, **kwargs):
+    if created:
+        backfill_timeline(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def prune_unfollowed_posts(sender, instance, **kwargs):
+    prune_timeline(instance.user_id, instance.author_id)
+
+
+# after the counters, backfill and prune of the follow itself
+@receiver(post_save, sender=Follow)
+def reconcile_followed_author(sender, instance, created, **kwargs):
+    if created:
+        followers_changed(instance.author_id, 1)
+
+
+@receiver(post_delete, sender=Follow)
+def reconcile_unfollowed_author(sender, instance, **kwargs):
+    followers_changed(instance.author_id, -1)
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def forget_follows(sender, instance, **kwargs):
+    forget_followed_authors(instance.user_id)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_save, sender=Comment)
+def index_text(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or 'text' in update_fields:
+        kind = 'posts' if sender is Post else 'comments'
+        index_object(kind, instance)
+
+
+@receiver(post_delete, sender=Post)
+@receiver(post_delete, sender=Comment)
+def unindex_text(sender, instance, **kwargs):
+    if sender is Post:
+        remove_object('posts', instance)
+    elif instance.post_id in deleting_posts():
+        deleting_posts()[instance.post_id].append(instance.pk)
+    else:
+        remove_object('comments', instance)
+
+
+def post_listing_tags(username, group_slugs):
+    """Returns tags of pages listing posts of author and groups.
+    """
+    return [
+        'feed',
+        f'profile:{username}',
+        *(f'group_page:{slug}' for slug in group_slugs if slug),
+    ]
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post(sender, instance, **kwargs):
+    """Invalidates the post card and pages listing the post.
+    """
+    group_ids = {
+        instance.group_id, getattr(instance, '_previous_group_id', None)
+    } - {None}
+    group_slugs = Group.objects.filter(pk__in=group_ids).values_list(
+        'slug', flat=True
+    ) if group_ids else []
+    bump_versions(
+        f'post:{instance.pk}',
+        *post_listing_tags(instance.author.username, group_slugs),
+    )
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_commented_post(sender, instance, **kwargs):
+    if instance.post_id in deleting_posts():
+        return
+    # comments count is shown on cards of every feed with the post
+    post = Post.objects.filter(pk=instance.post_id).values_list(
+        'author__username', 'group__slug'
+    ).first()
+    tags = [f'post:{instance.post_id}']
+    if post is not None:
+        username, group_slug = post
+        tags += post_listing_tags(username, [group_slug])
+    bump_versions(*tags)
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_follow_profiles(sender, instance, **kwargs):
+    usernames = User.objects.filter(
+        pk__in=[instance.user_id, instance.author_id]
+    ).values_list('username', flat=True)
+    bump_versions(*(f'profile:{username}' for username in usernames))
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_group(sender, instance, **kwargs):
+    # group title is shown on every page listing its posts
+    bump_versions(f'group:{instance.pk}', 'pages')
+
+
+@receiver(post_delete, sender=User)
+def invalidate_deleted_author(sender, instance, **kwargs):
+    bump_versions('pages')
+
+
+@receiver(pre_save, sender=User)
+def invalidate_renamed_author(sender, instance, update_fields=None, **kwargs):
+    """Invalidates author's posts when the displayed name changes.
+    Saves touching other fields only (e.g. last_login) are skipped.
+    """
+    name_fields = {'username', 'first_name', 'last_name'}
+    if instance.pk is None:
+        return
+    if update_fields is not None and not name_fields & set(update_fields):
+        return
+    previous_name = (
+        User.objects.filter(pk=instance.pk)
+        .values_list('username', 'first_name', 'last_name').first()
+    )
+    current_name = (
+        instance.username, instance.first_name, instance.last_name
+    )
+    if previous_name != current_name:
+        bump_versions(f'author:{instance.pk}', 'pages')
@@ -0,0 +1,53 @@
+from collections import namedtuple
+
+from django import template
+from sorl.thumbnail import default
+
+from posts.thumbnails import ready_thumbnail
+
+register = template.Library()
+
+PostImage = namedtuple('PostImage', 'url width height')
+
+
+@register.simple_tag
+def post_thumbnail(post, size):
+    """Returns url and dimensions of generated thumbnail of post image
+    or url of the image itself while the thumbnail is queued.
+    Thumbnails preloaded by attach_thumbnails are not looked up again,
+    thumbnails are never created here.
+    """
+    preloaded = getattr(post, 'thumbnails', {})
+    if size in preloaded:
+        thumbnail = preloaded[size]
+    else:
+        thumbnail = ready_thumbnail(post.image, size)
+    if thumbnail is None:
+        return PostImage(post.image.url, None, None)
+    return PostImage(thumbnail.url, thumbnail.width, thumbnail.height)
+
+
+def srcset(variants):
+    return ', '.join(
+        f'{default.storage.url(name)} {width}w'
+        for name, width, _ in variants
+    )
+
+
+@register.inclusion_tag('posts/includes/post_picture.html')
+def post_picture(post, sizes):
+    """Renders post image with WebP and JPEG variants of every width
+    for the browser to choose from, or the card thumbnail while
+    variants are generated.
+    """
+    variants = post.get_image_variants()
+    if not variants:
+        return {'image': post_thumbnail(post, 'card')}
+    jpeg = variants['JPEG']
+    _, width, height = jpeg[-1]
+    return {
+        'image': PostImage(default.storage.url(jpeg[-1][0]), width, height),
+        'webp_srcset': srcset(variants['WEBP']),
+        'jpeg_srcset': srcset(jpeg),
+        'sizes': sizes,
+    }
@@ -0,0 +1,128 @@
+import io
+import json
+import shutil
+import tempfile
+import zipfile
+from http import HTTPStatus
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, override_settings, TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Group, Post
+from posts.tests.utils_for_tests import create_test_image
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, POSTS_EXPORT_CHUNK=2)
+class DiaryArchiveTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.test_author = User.objects.create_user(username='rock4ts')
+        cls.test_reader = User.objects.create_user(username='someone')
+        cls.test_group = Group.objects.create(
+            title='Тестовое сообщество',
+            description='Тестовое описание сообщества',
+        )
+        cls.test_image_post = Post.objects.create(
+            text='Запись с <картинкой>',
+            author=cls.test_author,
+            group=cls.test_group,
+            image=create_test_image('archive', 'gif'),
+        )
+        for number in range(4):
+            post = Post.objects.create(
+                text=f'Запись {number}', author=cls.test_author
+            )
+            Comment.objects.create(
+                post=post, author=cls.test_author,
+                text=f'Комментарий {number}',
+            )
+        Post.objects.create(text='Чужая запись', author=cls.test_reader)
+        cls.author_client = Client()
+        cls.author_client.force_login(cls.test_author)
+        cls.url = reverse(
+            'posts:profile_export',
+            kwargs={'username': cls.test_author.username},
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def download(self):
+        response = DiaryArchiveTests.author_client.get(DiaryArchiveTests.url)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(response['Content-Type'], 'application/zip')
+        content = b''.join(response.streaming_content)
+        response.close()
+        return zipfile.ZipFile(io.BytesIO(content))
+
+    def test_archive_contains_diary(self):
+        archive = self.download()
+        self.assertIsNone(archive.testzip())
+        post = DiaryArchiveTests.test_image_post
+        image = f'images/{post.image.name}'
+        self.assertCountEqual(
+            archive.namelist(),
+            ['posts.json', 'comments.json', 'diary.html', image],
+        )
+        posts = json.loads(archive.read('posts.json'))
+        self.assertEqual(
+            [record['text'] for record in posts],
+            list(
+                Post.objects.filter(author=DiaryArchiveTests.test_author)
+                .order_by('pk').values_list('text', flat=True)
+            ),
+        )
+        self.assertEqual(posts[0]['image'], image)
+        self.assertEqual(posts[0]['group'], DiaryArchiveTests.test_group.title)
+        comments = json.loads(archive.read('comments.json'))
+        self.assertEqual(len(comments), 4)
+        post.image.open()
+        with post.image:
+            self.assertEqual(archive.read(image), post.image.read())
+        diary = archive.read('diary.html').decode()
+        self.assertIn('Запись с &lt;картинкой&gt;', diary)
+        self.assertIn('Комментарий 3', diary)
+        self.assertNotIn('Чужая запись', diary)
+
+    def test_only_owner_downloads_diary(self):
+        reader_client = Client()
+        reader_client.force_login(DiaryArchiveTests.test_reader)
+        clients = {
+            'guest': (self.client, reverse('users:login')),
+            'reader': (
+                reader_client,
+                reverse(
+                    'posts:profile',
+                    kwargs={
+                        'username': DiaryArchiveTests.test_author.username
+                    },
+                ),
+            ),
+        }
+        for name, (client, redirect_url) in clients.items():
+            with self.subTest(client=name):
+                response = client.get(DiaryArchiveTests.url)
+                self.assertEqual(response.status_code, HTTPStatus.FOUND)
+                self.assertTrue(response.url.startswith(redirect_url))
+
+    def test_concurrent_downloads_are_limited(self):
+        first = DiaryArchiveTests.author_client.get(DiaryArchiveTests.url)
+        second = DiaryArchiveTests.author_client.get(DiaryArchiveTests.url)
+        self.assertEqual(second.status_code, HTTPStatus.TOO_MANY_REQUESTS)
+        # an interrupted download frees its slot
+        next(iter(first.streaming_content))
+        first.close()
+        self.download()
+        self.download()
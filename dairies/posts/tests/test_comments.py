@@ -0,0 +1,106 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client, override_settings, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Group, Post
+
+User = get_user_model()
+
+
+@override_settings(POSTS_COMMENTS_PER_PAGE=5, POSTS_PAGE_CACHE=False)
+class CommentThreadTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.test_author = User.objects.create_user(username='rock4ts')
+        cls.test_group = Group.objects.create(
+            title='Тестовое сообщество',
+            description='Тестовое описание сообщества',
+        )
+        cls.test_post = Post.objects.create(
+            text='Тестовый текст',
+            author=cls.test_author,
+            group=cls.test_group,
+        )
+        cls.short_post = Post.objects.create(
+            text='Пост с одним комментарием',
+            author=cls.test_author,
+            group=cls.test_group,
+        )
+        for i in range(1, 13):
+            commenter = User.objects.create_user(username=f'reader{i}')
+            Comment.objects.create(
+                post=cls.test_post,
+                author=commenter,
+                text='Комментарий ' + str(i),
+            )
+        Comment.objects.create(
+            post=cls.short_post,
+            author=cls.test_author,
+            text='Единственный комментарий',
+        )
+        cls.guest_client = Client()
+
+    def detail_queries(self, post):
+        with CaptureQueriesContext(connection) as queries:
+            response = CommentThreadTests.guest_client.get(
+                reverse('posts:post_detail', kwargs={'post_id': post.pk})
+            )
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_detail_queries_do_not_grow_with_thread(self):
+        self.assertEqual(
+            self.detail_queries(CommentThreadTests.test_post),
+            self.detail_queries(CommentThreadTests.short_post),
+        )
+
+    def test_load_more_walks_whole_thread(self):
+        post = CommentThreadTests.test_post
+        response = CommentThreadTests.guest_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': post.pk})
+        )
+        page = response.context['comments_page']
+        shown = [comment.pk for comment in page]
+        self.assertEqual(len(shown), 5)
+        while page.has_next():
+            response = CommentThreadTests.guest_client.get(
+                reverse('posts:comments_more', kwargs={'post_id': post.pk}),
+                {'before': page.next_cursor},
+            )
+            self.assertTemplateUsed(
+                response, 'posts/includes/comments_page.html'
+            )
+            self.assertNotContains(response, '<html')
+            page = response.context['comments_page']
+            shown.extend(comment.pk for comment in page)
+        self.assertEqual(
+            shown,
+            list(post.comments.order_by('-pub_date', '-pk')
+                 .values_list('pk', flat=True)),
+        )
+
+    def test_load_more_button_links_to_next_comments(self):
+        post = CommentThreadTests.test_post
+        response = CommentThreadTests.guest_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': post.pk})
+        )
+        cursor = response.context['comments_page'].next_cursor
+        self.assertContains(
+            response,
+            reverse('posts:comments_more', kwargs={'post_id': post.pk})
+            + f'?before={cursor}',
+        )
+        response = CommentThreadTests.guest_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': post.pk}),
+            {'before': cursor},
+        )
+        self.assertTrue(response.context['comments_page'].has_previous())
+
+    def test_load_more_for_missing_post(self):
+        response = CommentThreadTests.guest_client.get(
+            reverse('posts:comments_more', kwargs={'post_id': 0})
+        )
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,185 @@
+from io import StringIO
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, override_settings, TestCase
+from django.urls import reverse
+
+from posts.counts import estimated_post_count, get_post_count, scope_key
+from posts.models import AuthorStats, Comment, Follow, Group, Post
+from posts.tests.utils_for_tests import run_commit_callbacks_at_once
+
+User = get_user_model()
+
+
+@override_settings(POSTS_PAGINATION='numbered')
+class PostCountsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.test_author = User.objects.create_user(username='rock4ts')
+        cls.test_group = Group.objects.create(
+            title='Тестовое сообщество',
+            description='Тестовое описание сообщества',
+        )
+        cls.other_group = Group.objects.create(
+            title='Другое сообщество',
+            description='Другое описание сообщества',
+        )
+        for i in range(1, 14):
+            Post.objects.create(
+                text='Тестовый текст ' + str(i),
+                author=cls.test_author,
+                group=cls.test_group,
+            )
+        cls.guest_client = Client()
+
+    def setUp(self):
+        run_commit_callbacks_at_once(self)
+        cache.clear()
+
+    def test_scoped_counters_follow_create_edit_and_delete(self):
+        group = PostCountsTests.test_group
+        author = PostCountsTests.test_author
+        other_group = PostCountsTests.other_group
+        scopes = {
+            f'group:{group.pk}': group.posts.all(),
+            f'group:{other_group.pk}': other_group.posts.all(),
+            f'author:{author.pk}': author.posts.all(),
+        }
+        # warm up the counters
+        for scope, queryset in scopes.items():
+            get_post_count(queryset, scope)
+        post = Post.objects.create(
+            text='Новый пост', author=author, group=group
+        )
+        post.group = other_group
+        post.save()
+        Post.objects.filter(group=group).first().delete()
+        for scope, queryset in scopes.items():
+            with self.subTest(scope=scope):
+                self.assertEqual(
+                    cache.get(scope_key(scope)), queryset.count()
+                )
+
+    def test_cached_count_does_not_query_database(self):
+        queryset = PostCountsTests.test_group.posts.all()
+        scope = f'group:{PostCountsTests.test_group.pk}'
+        self.assertEqual(get_post_count(queryset, scope), (13, False))
+        with self.assertNumQueries(0):
+            self.assertEqual(get_post_count(queryset, scope), (13, False))
+
+    @override_settings(POSTS_COUNT_CAP=11)
+    def test_capped_count(self):
+        count, capped = get_post_count(Post.objects.all())
+        self.assertEqual(count, 11)
+        self.assertTrue(capped)
+        response = PostCountsTests.guest_client.get(reverse('posts:index'))
+        self.assertTrue(response.context['page_obj'].paginator.capped)
+        self.assertContains(response, '11+ постов')
+
+    @skipUnless(connection.vendor == 'sqlite', 'SQLite statistics')
+    def test_estimate_reads_index_statistics(self):
+        self.assertIsNone(estimated_post_count())
+        # the post table has indexes, ANALYZE keeps no idx IS NULL row
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        self.assertEqual(estimated_post_count(), 13)
+
+    def test_numbered_feed_pages_use_cached_count(self):
+        response = PostCountsTests.guest_client.get(reverse('posts:index'))
+        self.assertEqual(response.context['page_obj'].paginator.count, 13)
+        self.assertIsNotNone(cache.get(scope_key('all')))
+
+
+class DenormalizedCountersTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.test_author = User.objects.create_user(username='Celebrity')
+        cls.test_follower = User.objects.create_user(username='rock4ts')
+        cls.author_client = Client()
+        cls.author_client.force_login(cls.test_author)
+        cls.follower_client = Client()
+        cls.follower_client.force_login(cls.test_follower)
+
+    def stats(self, user):
+        return AuthorStats.objects.get(user=user)
+
+    def test_counters_follow_write_views(self):
+        author = DenormalizedCountersTests.test_author
+        follower = DenormalizedCountersTests.test_follower
+        DenormalizedCountersTests.author_client.post(
+            reverse('posts:post_create'), data={'text': 'Новый пост'}
+        )
+        post = Post.objects.get(author=author)
+        DenormalizedCountersTests.follower_client.post(
+            reverse('posts:add_comment', kwargs={'post_id': post.pk}),
+            data={'text': 'Комментарий'},
+        )
+        DenormalizedCountersTests.follower_client.post(
+            reverse(
+                'posts:profile_follow', kwargs={'username': author.username}
+            )
+        )
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(self.stats(author).posts_count, 1)
+        self.assertEqual(self.stats(author).followers_count, 1)
+        self.assertEqual(self.stats(follower).following_count, 1)
+        DenormalizedCountersTests.follower_client.post(
+            reverse(
+                'posts:delete_comment',
+                kwargs={'comment_id': Comment.objects.get(post=post).pk}
+            )
+        )
+        DenormalizedCountersTests.follower_client.post(
+            reverse(
+                'posts:profile_unfollow', kwargs={'username': author.username}
+            )
+        )
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+        self.assertEqual(self.stats(author).followers_count, 0)
+        self.assertEqual(self.stats(follower).following_count, 0)
+        DenormalizedCountersTests.author_client.post(
+            reverse('posts:post_delete', kwargs={'post_id': post.pk})
+        )
+        self.assertEqual(self.stats(author).posts_count, 0)
+
+    def test_profile_shows_counters_without_counting(self):
+        author = DenormalizedCountersTests.test_author
+        Post.objects.create(text='Новый пост', author=author)
+        Follow.objects.create(
+            user=DenormalizedCountersTests.test_follower, author=author
+        )
+        response = DenormalizedCountersTests.follower_client.get(
+            reverse('posts:profile', kwargs={'username': author.username})
+        )
+        self.assertContains(response, 'Всего постов: 1')
+        self.assertContains(response, 'Подписчиков: 1')
+        self.assertContains(response, 'подписок: 0')
+
+    def test_repair_counters_command_fixes_drift(self):
+        author = DenormalizedCountersTests.test_author
+        post = Post.objects.create(text='Новый пост', author=author)
+        Comment.objects.create(
+            post=post, author=author, text='Комментарий'
+        )
+        Post.objects.filter(pk=post.pk).update(comments_count=7)
+        AuthorStats.objects.filter(user=author).update(posts_count=5)
+        AuthorStats.objects.filter(
+            user=DenormalizedCountersTests.test_follower
+        ).delete()
+        output = StringIO()
+        call_command('repair_counters', stdout=output)
+        self.assertIn('1 users and 1 posts', output.getvalue())
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(self.stats(author).posts_count, 1)
+        self.assertEqual(
+            self.stats(DenormalizedCountersTests.test_follower).posts_count, 0
+        )
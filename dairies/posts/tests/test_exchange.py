@@ -0,0 +1,195 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import override_settings, TestCase
+
+from posts.caching import get_versions
+from posts.exchange import Importer
+from posts.models import (
+    AuthorStats, Comment, Follow, Group, ImportProgress, Post,
+    TimelineEntry,
+)
+from posts.search import search_page
+from posts.tests.utils_for_tests import (
+    create_test_image, run_commit_callbacks_at_once,
+)
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ExchangeTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.directory = tempfile.mkdtemp()
+        cls.path = os.path.join(cls.directory, 'dairies.jsonl')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        shutil.rmtree(ExchangeTests.directory, ignore_errors=True)
+
+    def setUp(self):
+        run_commit_callbacks_at_once(self)
+        author = User.objects.create_user(
+            username='author', password='secret'
+        )
+        reader = User.objects.create_user(username='reader')
+        group = Group.objects.create(title='Группа обмена')
+        self.image_post = Post.objects.create(
+            text='Запись с картинкой', author=author, group=group,
+            image=create_test_image('exchange', 'gif'),
+        )
+        for number in range(5):
+            post = Post.objects.create(text=f'Запись {number}', author=author)
+            Comment.objects.create(
+                post=post, author=reader, text=f'Комментарий {number}'
+            )
+        Follow.objects.create(user=reader, author=author)
+
+    def dataset(self):
+        return {
+            'users': list(User.objects.order_by('username').values_list(
+                'username', 'password'
+            )),
+            'groups': list(Group.objects.values_list('slug', 'title')),
+            'posts': list(Post.objects.order_by('pub_date').values_list(
+                'author__username', 'group__slug', 'text', 'pub_date'
+            )),
+            'comments': list(Comment.objects.order_by('text').values_list(
+                'post__text', 'author__username', 'text', 'pub_date'
+            )),
+            'follows': list(Follow.objects.values_list(
+                'user__username', 'author__username'
+            )),
+        }
+
+    def export_and_clear(self):
+        call_command('export_dairies', self.path, stdout=StringIO())
+        default_storage.delete(self.image_post.image.name)
+        User.objects.all().delete()
+        Group.objects.all().delete()
+
+    def test_round_trip(self):
+        dataset = self.dataset()
+        image = self.image_post.image.name
+        self.export_and_clear()
+        self.assertFalse(default_storage.exists(image))
+        call_command(
+            'import_dairies', self.path, chunk_size=2, stdout=StringIO()
+        )
+        self.assertEqual(self.dataset(), dataset)
+        self.assertEqual(
+            Post.objects.get(text='Запись с картинкой').image.name, image
+        )
+        self.assertTrue(default_storage.exists(image))
+        self.assertTrue(
+            User.objects.get(username='author').check_password('secret')
+        )
+        author = AuthorStats.objects.get(user__username='author')
+        self.assertEqual((author.posts_count, author.followers_count), (6, 1))
+        self.assertFalse(ImportProgress.objects.exists())
+
+    def interrupt(self, importer, name):
+        """Runs importer with method name failing once two chunks
+        of comments are counted as imported.
+        """
+        method = getattr(importer, name)
+
+        def fail_second_chunk(*args):
+            if importer.counts['comment'] >= 2 * importer.chunk_size:
+                raise RuntimeError('Interrupted')
+            return method(*args)
+
+        setattr(importer, name, fail_second_chunk)
+        with open(self.path, 'rb') as file:
+            with self.assertRaises(RuntimeError):
+                importer.run(file)
+
+    def test_interrupted_import_resumes(self):
+        dataset = self.dataset()
+        self.export_and_clear()
+        importer = Importer(
+            self.path[:-len('.jsonl')] + '_media', 2,
+            os.path.abspath(self.path),
+        )
+        self.interrupt(importer, 'import_comments')
+        self.assertEqual(Comment.objects.count(), 4)
+        self.assertTrue(ImportProgress.objects.exists())
+        with mock.patch.object(
+            Importer, 'import_users', side_effect=AssertionError
+        ):
+            call_command('import_dairies', self.path, stdout=StringIO())
+        self.assertEqual(self.dataset(), dataset)
+
+    def test_chunk_and_progress_commit_together(self):
+        dataset = self.dataset()
+        self.export_and_clear()
+        importer = Importer(
+            self.path[:-len('.jsonl')] + '_media', 2,
+            os.path.abspath(self.path),
+        )
+        # the second chunk of comments is inserted, then rolled back
+        self.interrupt(importer, 'save_state')
+        self.assertEqual(Comment.objects.count(), 2)
+        call_command('import_dairies', self.path, stdout=StringIO())
+        self.assertEqual(self.dataset(), dataset)
+
+    def test_import_updates_only_imported_data(self):
+        records = [
+            {'model': 'user', 'username': 'newcomer'},
+            {
+                'model': 'post', 'id': 1, 'author': 'author',
+                'group': Group.objects.get().slug,
+                'text': 'Импортированная запись',
+            },
+            {
+                'model': 'comment', 'post': 1, 'author': 'newcomer',
+                'text': 'Импортированный комментарий',
+            },
+            {'model': 'follow', 'user': 'newcomer', 'author': 'author'},
+        ]
+        with open(self.path, 'w') as file:
+            for record in records:
+                file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        cache.set('exchange:unrelated', 'kept')
+        self.addCleanup(cache.delete, 'exchange:unrelated')
+        tags = ['feed', 'profile:author', 'profile:reader']
+        versions = get_versions(tags)
+        call_command('import_dairies', self.path, stdout=StringIO())
+        self.assertEqual(cache.get('exchange:unrelated'), 'kept')
+        changed = get_versions(tags)
+        self.assertNotEqual(changed['feed'], versions['feed'])
+        self.assertNotEqual(
+            changed['profile:author'], versions['profile:author']
+        )
+        self.assertEqual(
+            changed['profile:reader'], versions['profile:reader']
+        )
+        author = AuthorStats.objects.get(user__username='author')
+        self.assertEqual((author.posts_count, author.followers_count), (7, 2))
+        post = Post.objects.get(text='Импортированная запись')
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(
+            TimelineEntry.objects.filter(user__username='newcomer').count(),
+            Post.objects.filter(author=author.user).count(),
+        )
+        for kind, query in (
+            ('posts', 'Импортированная'), ('comments', 'Импортированный'),
+        ):
+            with self.subTest(kind=kind):
+                self.assertEqual(
+                    len(search_page(kind, query).object_list), 1
+                )
@@ -0,0 +1,119 @@
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from posts.models import Group, Post
+from posts.tests.utils_for_tests import run_commit_callbacks_at_once
+
+User = get_user_model()
+
+
+class PostFeedsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.test_author = User.objects.create_user(username='rock4ts')
+        cls.test_group = Group.objects.create(
+            title='Тестовое сообщество',
+            description='Тестовое описание сообщества',
+        )
+        cls.test_post = Post.objects.create(
+            text='Тестовый текст',
+            author=cls.test_author,
+            group=cls.test_group,
+        )
+        cls.feed_urls = [
+            reverse(f'posts:{prefix}feed_{kind}', kwargs=kwargs)
+            for prefix, kwargs in (
+                ('', {}),
+                ('group_', {'slug': cls.test_group.slug}),
+                ('profile_', {'username': cls.test_author.username}),
+            )
+            for kind in ('rss', 'atom')
+        ]
+
+    def setUp(self):
+        run_commit_callbacks_at_once(self)
+        cache.clear()
+
+    def test_feeds_list_posts(self):
+        for url in PostFeedsTests.feed_urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                self.assertIn('xml', response['Content-Type'])
+                self.assertContains(response, 'Тестовый текст')
+                self.assertContains(
+                    response,
+                    reverse(
+                        'posts:post_detail',
+                        kwargs={'post_id': PostFeedsTests.test_post.pk},
+                    ),
+                )
+                self.assertTrue(response.has_header('ETag'))
+                self.assertTrue(response.has_header('Last-Modified'))
+
+    def test_unchanged_feed_is_not_modified_without_queries(self):
+        for url in PostFeedsTests.feed_urls:
+            response = self.client.get(url)
+            validators = {
+                'HTTP_IF_NONE_MATCH': response['ETag'],
+                'HTTP_IF_MODIFIED_SINCE': response['Last-Modified'],
+            }
+            for header, value in validators.items():
+                with self.subTest(url=url, header=header):
+                    with self.assertNumQueries(0):
+                        response = self.client.get(url, **{header: value})
+                    self.assertEqual(
+                        response.status_code, HTTPStatus.NOT_MODIFIED
+                    )
+
+    def test_post_changes_refresh_feeds(self):
+        etags = {
+            url: self.client.get(url)['ETag']
+            for url in PostFeedsTests.feed_urls
+        }
+
+        def create():
+            return Post.objects.create(
+                text='Новая запись',
+                author=PostFeedsTests.test_author,
+                group=PostFeedsTests.test_group,
+            )
+
+        def edit():
+            post = Post.objects.get(text='Новая запись')
+            post.text = 'Изменённая запись'
+            post.save()
+
+        def delete():
+            Post.objects.get(text='Изменённая запись').delete()
+
+        changes = (
+            (create, 'Новая запись'),
+            (edit, 'Изменённая запись'),
+            (delete, 'Тестовый текст'),
+        )
+        for change, text in changes:
+            change()
+            for url in PostFeedsTests.feed_urls:
+                with self.subTest(change=change.__name__, url=url):
+                    response = self.client.get(
+                        url, HTTP_IF_NONE_MATCH=etags[url]
+                    )
+                    self.assertEqual(response.status_code, HTTPStatus.OK)
+                    self.assertContains(response, text)
+                    etags[url] = response['ETag']
+
+    def test_unknown_group_or_author_feed_is_not_found(self):
+        urls = [
+            reverse('posts:group_feed_rss', kwargs={'slug': 'missing'}),
+            reverse('posts:profile_feed_atom', kwargs={'username': 'nobody'}),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
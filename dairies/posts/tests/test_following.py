@@ -0,0 +1,83 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, override_settings, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.following import followed_author_ids, is_following
+from posts.models import Follow, Post
+
+User = get_user_model()
+
+
+class FollowingCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.test_reader = User.objects.create_user(username='rock4ts')
+        cls.test_authors = [
+            User.objects.create_user(username=f'author{i}') for i in range(3)
+        ]
+        for author in cls.test_authors:
+            Post.objects.create(text=f'Пост {author}', author=author)
+        cls.reader_client = Client()
+        cls.reader_client.force_login(cls.test_reader)
+
+    def setUp(self):
+        cache.clear()
+
+    def follow(self, author, action='profile_follow'):
+        FollowingCacheTests.reader_client.post(
+            reverse(f'posts:{action}', kwargs={'username': author.username})
+        )
+
+    def test_ids_are_sorted_and_cached(self):
+        reader = FollowingCacheTests.test_reader
+        for author in reversed(FollowingCacheTests.test_authors):
+            Follow.objects.create(user=reader, author=author)
+        author_ids = followed_author_ids(reader.pk)
+        self.assertEqual(
+            list(author_ids),
+            sorted(author.pk for author in FollowingCacheTests.test_authors),
+        )
+        with self.assertNumQueries(0):
+            self.assertEqual(followed_author_ids(reader.pk), author_ids)
+            self.assertTrue(is_following(reader.pk, author_ids[1]))
+            self.assertFalse(is_following(reader.pk, reader.pk))
+
+    def test_follow_and_unfollow_invalidate_ids(self):
+        reader = FollowingCacheTests.test_reader
+        author = FollowingCacheTests.test_authors[0]
+        self.assertFalse(is_following(reader.pk, author.pk))
+        self.follow(author)
+        self.assertTrue(is_following(reader.pk, author.pk))
+        self.follow(author, 'profile_unfollow')
+        self.assertFalse(is_following(reader.pk, author.pk))
+        self.assertEqual(len(followed_author_ids(reader.pk)), 0)
+
+    @override_settings(POSTS_FANOUT_LIMIT=0)
+    def test_pages_do_not_query_follows(self):
+        author = FollowingCacheTests.test_authors[0]
+        self.follow(author)
+        urls = {
+            'index': reverse('posts:index'),
+            'profile': reverse(
+                'posts:profile', kwargs={'username': author.username}
+            ),
+            'follow_index': reverse('posts:follow_index'),
+        }
+        for name, url in urls.items():
+            FollowingCacheTests.reader_client.get(url)
+            with self.subTest(view=name):
+                with CaptureQueriesContext(connection) as queries:
+                    response = FollowingCacheTests.reader_client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertFalse([
+                    query['sql'] for query in queries
+                    if Follow._meta.db_table in query['sql']
+                ])
+        response = FollowingCacheTests.reader_client.get(urls['profile'])
+        self.assertTrue(response.context['following'])
+        response = FollowingCacheTests.reader_client.get(urls['index'])
+        self.assertTrue(response.context['has_subscriptions'])
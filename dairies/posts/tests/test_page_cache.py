@@ -0,0 +1,300 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.test import Client, TestCase, TransactionTestCase
+from django.urls import reverse
+
+from posts.caching import get_versions
+from posts.counts import scope_key
+from posts.models import Comment, Follow, Group, Post
+from posts.pagination import encode_cursor
+from posts.tests.utils_for_tests import run_commit_callbacks_at_once
+
+User = get_user_model()
+
+
+class AnonymousPageCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.test_author = User.objects.create_user(username='rock4ts')
+        cls.test_group = Group.objects.create(
+            title='Тестовое сообщество',
+            description='Тестовое описание сообщества',
+        )
+        for i in range(1, 14):
+            Post.objects.create(
+                text='Тестовый текст ' + str(i),
+                author=cls.test_author,
+                group=cls.test_group,
+            )
+        cls.test_post = Post.objects.latest('pub_date')
+        cls.author_client = Client()
+        cls.author_client.force_login(cls.test_author)
+
+    def setUp(self):
+        run_commit_callbacks_at_once(self)
+        cache.clear()
+        self.guest_client = Client()
+        self.urls = {
+            'index': reverse('posts:index'),
+            'group_posts': reverse(
+                'posts:group_posts',
+                kwargs={'slug': AnonymousPageCacheTests.test_group.slug}
+            ),
+            'profile': reverse(
+                'posts:profile',
+                kwargs={'username': AnonymousPageCacheTests.test_author}
+            ),
+            'post_detail': reverse(
+                'posts:post_detail',
+                kwargs={'post_id': AnonymousPageCacheTests.test_post.pk}
+            ),
+        }
+
+    def test_second_anonymous_request_skips_database(self):
+        for name, url in self.urls.items():
+            with self.subTest(view=name):
+                response = self.guest_client.get(url)
+                with self.assertNumQueries(0):
+                    cached_response = self.guest_client.get(url)
+                self.assertEqual(cached_response.content, response.content)
+
+    def test_page_parameters_are_part_of_key(self):
+        first_page = self.guest_client.get(self.urls['profile'])
+        cursor = encode_cursor(first_page.context['page_obj'][-1])
+        second_page = self.guest_client.get(
+            self.urls['profile'], {'before': cursor}
+        )
+        self.assertIsNotNone(second_page.context)
+        self.assertNotEqual(first_page.content, second_page.content)
+
+    def test_visitors_with_session_are_not_cached(self):
+        self.guest_client.cookies[settings.SESSION_COOKIE_NAME] = 'session'
+        for client in (AnonymousPageCacheTests.author_client,
+                       self.guest_client):
+            for name, url in self.urls.items():
+                with self.subTest(view=name):
+                    client.get(url)
+                    # rendered again instead of served from cache
+                    self.assertIsNotNone(client.get(url).context)
+
+    def test_post_changes_invalidate_listing_pages(self):
+        for url in self.urls.values():
+            self.guest_client.get(url)
+        AnonymousPageCacheTests.author_client.post(
+            reverse(
+                'posts:post_edit',
+                kwargs={'post_id': AnonymousPageCacheTests.test_post.pk}
+            ),
+            data={
+                'text': 'Изменённый текст',
+                'group': AnonymousPageCacheTests.test_group.pk,
+            },
+        )
+        for name, url in self.urls.items():
+            with self.subTest(view=name):
+                self.assertContains(
+                    self.guest_client.get(url), 'Изменённый текст'
+                )
+
+    def test_comment_invalidates_pages_showing_comments_count(self):
+        for url in self.urls.values():
+            self.guest_client.get(url)
+        Comment.objects.create(
+            post=AnonymousPageCacheTests.test_post,
+            author=AnonymousPageCacheTests.test_author,
+            text='Новый комментарий',
+        )
+        self.assertContains(
+            self.guest_client.get(self.urls['post_detail']),
+            'Новый комментарий'
+        )
+        self.assertContains(
+            self.guest_client.get(self.urls['profile']), 'Комментариев: 1'
+        )
+        other_author = User.objects.create_user(username='Celebrity')
+        other_profile_url = reverse(
+            'posts:profile', kwargs={'username': other_author.username}
+        )
+        self.guest_client.get(other_profile_url)
+        Comment.objects.create(
+            post=AnonymousPageCacheTests.test_post,
+            author=AnonymousPageCacheTests.test_author,
+            text='Ещё комментарий',
+        )
+        # profiles of other authors stay cached
+        self.assertIsNone(self.guest_client.get(other_profile_url).context)
+
+    def test_group_and_author_changes_invalidate_pages(self):
+        self.guest_client.get(self.urls['profile'])
+        group = Group.objects.get(pk=AnonymousPageCacheTests.test_group.pk)
+        group.title = 'Новое название'
+        group.save()
+        self.assertContains(
+            self.guest_client.get(self.urls['profile']), 'Новое название'
+        )
+        author = User.objects.get(pk=AnonymousPageCacheTests.test_author.pk)
+        author.first_name = 'Иван'
+        author.save()
+        self.assertContains(
+            self.guest_client.get(self.urls['post_detail']), 'Иван'
+        )
+
+
+class ConditionalPageTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.test_author = User.objects.create_user(username='rock4ts')
+        cls.test_reader = User.objects.create_user(username='someone')
+        cls.test_post = Post.objects.create(
+            text='Тестовый текст', author=cls.test_author
+        )
+        Follow.objects.create(user=cls.test_reader, author=cls.test_author)
+        cls.urls = {
+            'index': reverse('posts:index'),
+            'follow_index': reverse('posts:follow_index'),
+            'post_detail': reverse(
+                'posts:post_detail',
+                kwargs={'post_id': cls.test_post.pk},
+            ),
+        }
+
+    def setUp(self):
+        run_commit_callbacks_at_once(self)
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(ConditionalPageTests.test_reader)
+
+    def validators(self, client=None):
+        client = client or self.reader_client
+        validators = {}
+        for name, url in ConditionalPageTests.urls.items():
+            response = client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertIn('no-cache', response['Cache-Control'])
+            validators[name] = response['ETag'], response['Last-Modified']
+        return validators
+
+    def get(self, name, validators, client=None):
+        etag, last_modified = validators[name]
+        return (client or self.reader_client).get(
+            ConditionalPageTests.urls[name],
+            HTTP_IF_NONE_MATCH=etag,
+            HTTP_IF_MODIFIED_SINCE=last_modified,
+        )
+
+    def test_unchanged_pages_are_not_modified(self):
+        validators = self.validators()
+        # session and user, post detail looks up the author of the post
+        queries = {'index': 2, 'follow_index': 2, 'post_detail': 3}
+        for name, count in queries.items():
+            with self.subTest(view=name):
+                with self.assertNumQueries(count):
+                    response = self.get(name, validators)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response['ETag'], validators[name][0])
+
+    def test_if_modified_since_alone_is_checked(self):
+        validators = self.validators()
+        response = self.reader_client.get(
+            ConditionalPageTests.urls['index'],
+            HTTP_IF_MODIFIED_SINCE=validators['index'][1],
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_changes_modify_pages(self):
+        def comment():
+            Comment.objects.create(
+                post=ConditionalPageTests.test_post,
+                author=ConditionalPageTests.test_reader,
+                text='Комментарий',
+            )
+
+        def edit():
+            post = Post.objects.get(pk=ConditionalPageTests.test_post.pk)
+            post.text = 'Изменённый текст'
+            post.save()
+
+        def author_posts():
+            Post.objects.create(
+                text='Другая запись', author=ConditionalPageTests.test_author
+            )
+
+        def unfollow():
+            Follow.objects.filter(
+                user=ConditionalPageTests.test_reader
+            ).delete()
+
+        changes = {
+            comment: ['index', 'follow_index', 'post_detail'],
+            edit: ['index', 'follow_index', 'post_detail'],
+            author_posts: ['index', 'follow_index', 'post_detail'],
+            unfollow: ['index', 'follow_index'],
+        }
+        for change, names in changes.items():
+            validators = self.validators()
+            change()
+            for name in names:
+                with self.subTest(change=change.__name__, view=name):
+                    response = self.get(name, validators)
+                    self.assertEqual(response.status_code, 200)
+
+    def test_modified_page_matches_its_validators(self):
+        validators = self.validators()
+        Post.objects.create(
+            text='Свежая запись', author=ConditionalPageTests.test_author
+        )
+        for name in ('index', 'follow_index'):
+            with self.subTest(view=name):
+                response = self.get(name, validators)
+                # the body is as new as the validators sent with it
+                self.assertContains(response, 'Свежая запись')
+                validators[name] = (
+                    response['ETag'], response['Last-Modified']
+                )
+                self.assertEqual(self.get(name, validators).status_code, 304)
+
+    def test_validators_are_per_user(self):
+        validators = self.validators()
+        author_client = Client()
+        author_client.force_login(ConditionalPageTests.test_author)
+        response = self.get('post_detail', validators, author_client)
+        self.assertEqual(response.status_code, 200)
+
+    def test_anonymous_pages_have_no_validators(self):
+        response = self.client.get(ConditionalPageTests.urls['index'])
+        self.assertFalse(response.has_header('ETag'))
+
+
+class CommitTimeInvalidationTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='rock4ts')
+
+    def test_versions_are_bumped_once_committed(self):
+        tags = ['feed', 'profile:rock4ts']
+        versions = get_versions(tags)
+        with transaction.atomic():
+            Post.objects.create(text='Новая запись', author=self.author)
+            # readers of the committed data keep the old versions
+            self.assertEqual(get_versions(tags), versions)
+        changed = get_versions(tags)
+        for tag in tags:
+            with self.subTest(tag=tag):
+                self.assertNotEqual(changed[tag], versions[tag])
+
+    def test_rolled_back_post_keeps_cached_counts(self):
+        scopes = ['all', f'author:{self.author.pk}']
+        cache.set_many({scope_key(scope): 5 for scope in scopes})
+        versions = get_versions(['feed'])
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                Post.objects.create(text='Новая запись', author=self.author)
+                raise RuntimeError('Rolled back')
+        for scope in scopes:
+            with self.subTest(scope=scope):
+                self.assertEqual(cache.get(scope_key(scope)), 5)
+        self.assertEqual(get_versions(['feed']), versions)
@@ -0,0 +1,114 @@
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from posts.models import Group, Post
+from posts.pagination import KeysetPaginator, decode_cursor, encode_cursor
+
+User = get_user_model()
+
+
+class KeysetPaginatorTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.test_author = User.objects.create_user(username='rock4ts')
+        cls.test_group = Group.objects.create(
+            title='Тестовое сообщество',
+            description='Тестовое описание сообщества',
+        )
+        for i in range(1, 26):
+            Post.objects.create(
+                text='Тестовый текст ' + str(i),
+                author=cls.test_author,
+                group=cls.test_group,
+            )
+        # posts sharing pub_date must still be ordered by id
+        Post.objects.filter(text__endswith='7').update(
+            pub_date=timezone.now()
+        )
+        cls.feed_ids = list(
+            Post.objects.order_by('-pub_date', '-pk')
+            .values_list('pk', flat=True)
+        )
+        cls.guest_client = Client()
+
+    def walk_feed(self, paginator):
+        """Follows next cursors from the first page to the last one
+        and returns list of visited pages.
+        """
+        pages = [paginator.get_page()]
+        while pages[-1].has_next():
+            pages.append(paginator.get_page(before=pages[-1].next_cursor))
+        return pages
+
+    def test_cursor_roundtrip(self):
+        post = Post.objects.first()
+        self.assertEqual(
+            decode_cursor(encode_cursor(post)),
+            (post.pub_date, post.pk)
+        )
+
+    def test_malformed_cursor_is_ignored(self):
+        # empty, not base64, no separator, not a date
+        for token in ('', '!!!', 'Z2FyYmFnZQ', 'Z2FyYmFnZXwx'):
+            with self.subTest(token=token):
+                self.assertIsNone(decode_cursor(token))
+
+    def test_next_cursors_cover_feed_in_order(self):
+        paginator = KeysetPaginator(Post.objects.all(), 10)
+        pages = self.walk_feed(paginator)
+        self.assertEqual([len(page) for page in pages], [10, 10, 5])
+        visited_ids = [post.pk for page in pages for post in page]
+        self.assertEqual(visited_ids, KeysetPaginatorTests.feed_ids)
+        self.assertFalse(pages[0].has_previous())
+        self.assertTrue(pages[-1].has_previous())
+
+    def test_previous_cursor_returns_previous_page(self):
+        paginator = KeysetPaginator(Post.objects.all(), 10)
+        pages = self.walk_feed(paginator)
+        previous_page = paginator.get_page(after=pages[1].previous_cursor)
+        self.assertEqual(list(previous_page), list(pages[0]))
+        self.assertFalse(previous_page.has_previous())
+        # partial page at the top of the feed falls back to the first page
+        top_page = paginator.get_page(after=encode_cursor(pages[0][3]))
+        self.assertEqual(list(top_page), list(pages[0]))
+
+    def test_deep_page_costs_single_query(self):
+        paginator = KeysetPaginator(Post.objects.all(), 10)
+        last_post = Post.objects.order_by('pub_date', 'pk')[1]
+        with self.assertNumQueries(1):
+            page = paginator.get_page(before=encode_cursor(last_post))
+        self.assertEqual(len(page), 1)
+        self.assertFalse(page.has_next())
+
+    def test_feed_views_accept_cursors(self):
+        second_page_ids = KeysetPaginatorTests.feed_ids[10:20]
+        cursor_post = Post.objects.get(pk=KeysetPaginatorTests.feed_ids[9])
+        urls = (
+            reverse('posts:index'),
+            reverse(
+                'posts:group_posts',
+                kwargs={'slug': KeysetPaginatorTests.test_group.slug}
+            ),
+            reverse(
+                'posts:profile',
+                kwargs={'username': KeysetPaginatorTests.test_author.username}
+            ),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = KeysetPaginatorTests.guest_client.get(
+                    url, {'before': encode_cursor(cursor_post)}
+                )
+                page_obj = response.context['page_obj']
+                self.assertEqual(
+                    [post.pk for post in page_obj], second_page_ids
+                )
+                self.assertContains(
+                    response, '?before=' + page_obj.next_cursor
+                )
+                self.assertContains(
+                    response, '?after=' + page_obj.previous_cursor
+                )
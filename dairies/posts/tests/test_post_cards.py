@@ -0,0 +1,84 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.caching import render_post_cards
+from posts.models import Group, Post
+from posts.tests.utils_for_tests import run_commit_callbacks_at_once
+
+User = get_user_model()
+
+
+class PostCardsCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.test_author = User.objects.create_user(
+            username='rock4ts', first_name='Иван', last_name='Петров'
+        )
+        cls.test_group = Group.objects.create(
+            title='Тестовое сообщество',
+            description='Тестовое описание сообщества',
+        )
+        cls.test_post = Post.objects.create(
+            text='Тестовый текст',
+            author=cls.test_author,
+            group=cls.test_group,
+        )
+
+    def setUp(self):
+        run_commit_callbacks_at_once(self)
+        cache.clear()
+
+    def render_card(self):
+        post = Post.objects.select_related('author', 'group').get(
+            pk=PostCardsCacheTests.test_post.pk
+        )
+        return render_post_cards([post])[0]
+
+    def test_card_is_served_from_cache(self):
+        card = self.render_card()
+        # queryset update bypasses signals and keeps the cached card
+        Post.objects.filter(pk=PostCardsCacheTests.test_post.pk).update(
+            text='Изменённый текст'
+        )
+        self.assertEqual(self.render_card(), card)
+        self.assertIn('Тестовый текст', card)
+
+    def test_card_is_invalidated_by_post_changes(self):
+        self.render_card()
+        post = Post.objects.get(pk=PostCardsCacheTests.test_post.pk)
+        post.text = 'Изменённый текст'
+        post.save()
+        self.assertIn('Изменённый текст', self.render_card())
+
+    def test_card_is_invalidated_by_author_name_and_group_changes(self):
+        self.render_card()
+        author = User.objects.get(pk=PostCardsCacheTests.test_author.pk)
+        author.last_name = 'Сидоров'
+        author.save()
+        self.assertIn('Иван Сидоров', self.render_card())
+        group = Group.objects.get(pk=PostCardsCacheTests.test_group.pk)
+        group.title = 'Новое название'
+        group.save()
+        self.assertIn('Новое название', self.render_card())
+
+    def test_login_does_not_invalidate_cards(self):
+        card = self.render_card()
+        Post.objects.filter(pk=PostCardsCacheTests.test_post.pk).update(
+            text='Изменённый текст'
+        )
+        Client().force_login(PostCardsCacheTests.test_author)
+        self.assertEqual(self.render_card(), card)
+
+    def test_bench_post_cards_command(self):
+        output = StringIO()
+        call_command('bench_post_cards', requests=2, stdout=output)
+        self.assertIn('render time saving', output.getvalue())
+        self.assertEqual(
+            Client().get(reverse('posts:index')).status_code, 200
+        )
@@ -0,0 +1,117 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import override_settings, TestCase, skipUnlessDBFeature
+
+from posts.models import Follow, Group, Post
+from posts.pagination import keyset_queryset
+from posts.timeline import FollowFeed, PULL_AUTHORS_KEY
+
+User = get_user_model()
+
+
+@skipUnlessDBFeature('supports_explaining_query_execution')
+class FeedQueryPlanTests(TestCase):
+    """Every feed query has to be an index range read in feed order,
+    a full table scan or a temporary sort fails the test.
+    """
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.test_author = User.objects.create_user(username='rock4ts')
+        cls.second_author = User.objects.create_user(username='second')
+        cls.test_follower = User.objects.create_user(username='Celebrity')
+        cls.test_group = Group.objects.create(
+            title='Тестовое сообщество',
+            description='Тестовое описание сообщества',
+        )
+        cls.test_post = Post.objects.create(
+            text='Тестовый текст',
+            author=cls.test_author,
+            group=cls.test_group,
+        )
+        Post.objects.create(text='Второй текст', author=cls.second_author)
+        for author in (cls.test_author, cls.second_author):
+            Follow.objects.create(user=cls.test_follower, author=author)
+
+    def setUp(self):
+        # every followed author is pulled under POSTS_FANOUT_LIMIT=0
+        cache.delete(PULL_AUTHORS_KEY)
+        self.addCleanup(cache.delete, PULL_AUTHORS_KEY)
+
+    def query_plan(self, queryset):
+        sql, params = queryset.query.get_compiler(
+            queryset.db
+        ).as_sql()
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def assertIndexedPlan(self, queryset):
+        plan = self.query_plan(queryset)
+        for step in plan:
+            with self.subTest(step=step):
+                self.assertNotIn('TEMP B-TREE', step)
+                if step.startswith('SCAN'):
+                    self.assertIn('USING', step)
+
+    def feed_querysets(self):
+        post = FeedQueryPlanTests.test_post
+        feed = FollowFeed(FeedQueryPlanTests.test_follower)
+        return {
+            'index': Post.objects.select_related('group', 'author'),
+            'group_posts': FeedQueryPlanTests.test_group.posts
+            .select_related('author'),
+            'profile': FeedQueryPlanTests.test_author.posts
+            .select_related('group'),
+            'post_detail comments': post.comments.select_related('author'),
+            'follow_index timeline': feed.timeline_posts(),
+            **{
+                f'follow_index pulled posts {number}': posts
+                for number, posts in enumerate(feed.pulled_feeds())
+            },
+        }
+
+    @override_settings(POSTS_FANOUT_LIMIT=0)
+    def test_feed_pages_read_indexes(self):
+        querysets = self.feed_querysets()
+        self.assertIn('follow_index pulled posts 1', querysets)
+        position = (
+            FeedQueryPlanTests.test_post.pub_date,
+            FeedQueryPlanTests.test_post.pk,
+        )
+        for name, queryset in querysets.items():
+            pk_field = 'post_id' if 'timeline' in name else 'pk'
+            for cursor in (None, position):
+                with self.subTest(feed=name, cursor=cursor):
+                    self.assertIndexedPlan(
+                        keyset_queryset(
+                            queryset, cursor, pk_field=pk_field
+                        )[:11]
+                    )
+
+    def test_followers_lookup_reads_index(self):
+        self.assertIndexedPlan(
+            Follow.objects.filter(
+                author=FeedQueryPlanTests.test_author
+            ).values_list('user_id', flat=True)
+        )
+
+    def test_plan_check_catches_sort(self):
+        # guards the assertion itself: text order needs a temp sort
+        plan = self.query_plan(Post.objects.order_by('text'))
+        self.assertTrue(
+            any('TEMP B-TREE' in step for step in plan), plan
+        )
+
+    def test_posts_of_several_authors_are_sorted(self):
+        # why pulled authors are read one by one
+        authors = [
+            FeedQueryPlanTests.test_author, FeedQueryPlanTests.second_author
+        ]
+        plan = self.query_plan(
+            keyset_queryset(Post.objects.filter(author__in=authors))[:11]
+        )
+        self.assertTrue(
+            any('TEMP B-TREE' in step for step in plan), plan
+        )
@@ -0,0 +1,176 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.test import Client, SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Post
+from posts.search import get_backend, rebuild_index, search_page
+from posts.search.backends import (
+    BaseSearchBackend, BasicSearchBackend, SQLiteFTSBackend,
+)
+from posts.search.stemming import tokenize
+
+User = get_user_model()
+
+
+def found_pks(kind, query):
+    return [obj.pk for obj in search_page(kind, query)]
+
+
+class RussianStemmingTests(TestCase):
+    def test_word_forms_share_stem(self):
+        word_forms = [
+            ('кошка', 'кошки', 'кошками'),
+            ('гулять', 'гуляли', 'гуляет'),
+            ('красивый', 'красивые', 'красивого'),
+            ('ёлка', 'елки'),
+        ]
+        for forms in word_forms:
+            with self.subTest(forms=forms):
+                self.assertEqual(
+                    len({tuple(tokenize(form)) for form in forms}), 1
+                )
+
+
+class SearchBackendTests(SimpleTestCase):
+    def test_incomplete_backend_is_not_created(self):
+        class IndexOnlyBackend(BaseSearchBackend):
+            def index(self, kind, pk, text):
+                pass
+
+        with self.assertRaises(TypeError):
+            IndexOnlyBackend()
+        self.assertEqual(BasicSearchBackend().rebuild('posts', []), None)
+
+    def test_fts_backend_needs_sqlite(self):
+        with mock.patch.object(connection, 'vendor', 'postgresql'):
+            with self.assertRaisesMessage(
+                ImproperlyConfigured, 'POSTS_SEARCH_BACKEND'
+            ):
+                SQLiteFTSBackend()
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.test_author = User.objects.create_user(username='rock4ts')
+        cls.cat_post = Post.objects.create(
+            text='Красивые кошки гуляли по крышам',
+            author=cls.test_author,
+        )
+        cls.dog_post = Post.objects.create(
+            text='Собака лаяла на кошку, кошка убежала от собаки',
+            author=cls.test_author,
+        )
+        cls.test_comment = Comment.objects.create(
+            post=cls.dog_post,
+            author=cls.test_author,
+            text='Моя собака тоже не любит кошек',
+        )
+        cls.guest_client = Client()
+
+    def test_search_matches_word_forms_and_ranks(self):
+        self.assertEqual(
+            found_pks('posts', 'кошка'),
+            [SearchTests.dog_post.pk, SearchTests.cat_post.pk],
+        )
+        self.assertEqual(
+            found_pks('posts', 'гулять по крыше'), [SearchTests.cat_post.pk]
+        )
+        self.assertEqual(
+            found_pks('comments', 'собаки'), [SearchTests.test_comment.pk]
+        )
+        self.assertEqual(found_pks('posts', 'попугай'), [])
+
+    def test_index_follows_edit_and_delete(self):
+        post = Post.objects.get(pk=SearchTests.cat_post.pk)
+        post.text = 'Попугай сидел на ветке'
+        post.save()
+        self.assertEqual(found_pks('posts', 'гуляли'), [])
+        self.assertEqual(found_pks('posts', 'попугаи'), [post.pk])
+        Post.objects.get(pk=SearchTests.dog_post.pk).delete()
+        self.assertEqual(found_pks('posts', 'собака'), [])
+        self.assertEqual(found_pks('comments', 'собака'), [])
+
+    def test_post_delete_does_not_grow_with_comments(self):
+        def delete_commented_post(comments):
+            post = Post.objects.create(
+                text='Обсуждаемый пост', author=SearchTests.test_author
+            )
+            for i in range(comments):
+                Comment.objects.create(
+                    post=post, author=SearchTests.test_author,
+                    text='Комментарий номер ' + str(i),
+                )
+            with CaptureQueriesContext(connection) as queries:
+                post.delete()
+            return len(queries)
+
+        self.assertEqual(delete_commented_post(3), delete_commented_post(30))
+        self.assertEqual(found_pks('comments', 'комментарий'), [])
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT COUNT(*) FROM posts_search_comment')
+            self.assertEqual(cursor.fetchone()[0], 1)
+
+    def test_results_are_cursor_paginated(self):
+        for i in range(1, 14):
+            Post.objects.create(
+                text='Пост про котов номер ' + str(i),
+                author=SearchTests.test_author,
+            )
+        url = reverse('posts:search')
+        response = SearchTests.guest_client.get(url, {'q': 'кот'})
+        page = response.context['page_obj']
+        found = [post.pk for post in page]
+        self.assertEqual(len(found), 10)
+        self.assertTrue(page.has_next())
+        self.assertContains(response, f'after={page.next_cursor}')
+        response = SearchTests.guest_client.get(
+            url, {'q': 'кот', 'after': page.next_cursor}
+        )
+        page = response.context['page_obj']
+        self.assertFalse(page.has_next())
+        found += [post.pk for post in page]
+        self.assertEqual(len(set(found)), 13)
+
+    def test_search_view_shows_comments(self):
+        response = SearchTests.guest_client.get(
+            reverse('posts:search'), {'q': 'любит', 'type': 'comments'}
+        )
+        self.assertContains(response, SearchTests.test_comment.text)
+        self.assertContains(
+            response,
+            reverse(
+                'posts:post_detail',
+                kwargs={'post_id': SearchTests.dog_post.pk}
+            ),
+        )
+
+    def test_rebuild_restores_index(self):
+        get_backend().rebuild('posts', [])
+        self.assertEqual(found_pks('posts', 'кошка'), [])
+        self.assertEqual(rebuild_index(), (2, 1))
+        self.assertEqual(len(found_pks('posts', 'кошка')), 2)
+
+    def test_admin_search_uses_index(self):
+        admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password'
+        )
+        client = Client()
+        client.force_login(admin)
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(
+                reverse('admin:posts_post_changelist'), {'q': 'крыши'}
+            )
+        self.assertEqual(
+            list(response.context['cl'].result_list),
+            [SearchTests.cat_post],
+        )
+        changelist_sql = ' '.join(query['sql'] for query in queries)
+        self.assertIn('MATCH', changelist_sql)
+        self.assertNotIn('LIKE', changelist_sql)
@@ -0,0 +1,77 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db.models import F
+from django.test import TestCase
+
+from posts.models import AuthorStats, Comment, Follow, Post, TimelineEntry
+from posts.search import search_page
+
+User = get_user_model()
+
+
+class SeedDairiesTests(TestCase):
+    def seed(self, seed=0):
+        call_command(
+            'seed_dairies', users=30, groups=3, posts=200, comments=300,
+            follows=100, seed=seed, chunk_size=50, stdout=StringIO(),
+        )
+
+    def test_seeds_requested_volume(self):
+        self.seed()
+        counts = {User: 30, Post: 200, Comment: 300, Follow: 100}
+        for model, count in counts.items():
+            with self.subTest(model=model.__name__):
+                self.assertEqual(model.objects.count(), count)
+        self.assertFalse(
+            Comment.objects.filter(pub_date__lt=F('post__pub_date')).exists()
+        )
+
+    def test_derived_data_is_up_to_date(self):
+        self.seed()
+        author = AuthorStats.objects.order_by('-followers_count').first()
+        self.assertEqual(
+            author.followers_count,
+            Follow.objects.filter(author_id=author.user_id).count(),
+        )
+        self.assertEqual(
+            author.posts_count,
+            Post.objects.filter(author_id=author.user_id).count(),
+        )
+        post = Post.objects.order_by('-comments_count').first()
+        self.assertEqual(post.comments_count, post.comments.count())
+        follow = Follow.objects.filter(
+            author__posts__isnull=False
+        ).first()
+        self.assertTrue(
+            TimelineEntry.objects.filter(
+                user_id=follow.user_id, author_id=follow.author_id
+            ).exists()
+        )
+        word = post.text.split()[0].strip('.,')
+        self.assertTrue(search_page('posts', word).object_list)
+
+    def test_activity_follows_power_law(self):
+        self.seed()
+        followers = sorted(
+            AuthorStats.objects.values_list('followers_count', flat=True),
+            reverse=True,
+        )
+        # the most followed author has several times the median
+        self.assertGreater(followers[0], 3 * followers[len(followers) // 2])
+
+    def test_same_seed_generates_same_dataset(self):
+        def dataset():
+            return list(
+                Post.objects.order_by('pk').values_list(
+                    'text', 'group__title'
+                )
+            )
+
+        self.seed(seed=7)
+        first = dataset()
+        for model in (Post, Follow, User):
+            model.objects.all().delete()
+        self.seed(seed=7)
+        self.assertEqual(dataset(), first)
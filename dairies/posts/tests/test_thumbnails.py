@@ -0,0 +1,244 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+from io import StringIO
+from types import SimpleNamespace
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import (
+    Client, override_settings, TestCase, TransactionTestCase,
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Post
+from posts.tests.utils_for_tests import (
+    create_test_image, run_commit_callbacks_at_once,
+)
+from posts.thumbnails import (
+    POST_IMAGE_FORMATS, POST_IMAGE_WIDTHS, generate_post_thumbnails,
+    ready_thumbnail, ready_thumbnails, submit_post_thumbnails,
+)
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, POSTS_THUMBNAIL_WORKERS=0)
+class PostThumbnailsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.test_author = User.objects.create_user(username='rock4ts')
+        cls.author_client = Client()
+        cls.author_client.force_login(cls.test_author)
+        cls.guest_client = Client()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        run_commit_callbacks_at_once(self)
+        cache.clear()
+
+    def create_post(self, image_name):
+        with mock.patch(
+            'posts.thumbnails.submit_post_thumbnails',
+            wraps=submit_post_thumbnails,
+        ) as submit:
+            PostThumbnailsTests.author_client.post(
+                reverse('posts:post_create'),
+                data={
+                    'text': 'Пост с картинкой',
+                    'image': create_test_image(image_name, 'gif'),
+                },
+            )
+        return Post.objects.latest('pub_date'), submit.call_count
+
+    def test_upload_queues_thumbnail_generation(self):
+        post, queued = self.create_post('queued_image')
+        self.assertEqual(queued, 1)
+        thumbnail = ready_thumbnail(post.image, 'card')
+        self.assertIsNotNone(thumbnail)
+        self.assertEqual((thumbnail.width, thumbnail.height), (900, 500))
+        response = PostThumbnailsTests.guest_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': post.pk})
+        )
+        self.assertContains(response, thumbnail.url)
+        self.assertNotContains(response, post.image.url)
+
+    def test_pages_show_original_until_thumbnail_is_ready(self):
+        post = Post.objects.create(
+            text='Пост без миниатюры',
+            author=PostThumbnailsTests.test_author,
+            image=create_test_image('pending_image', 'gif'),
+        )
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:post_detail', kwargs={'post_id': post.pk}),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                response = PostThumbnailsTests.guest_client.get(url)
+                self.assertContains(response, post.image.url)
+        # reading pages never generates thumbnails
+        self.assertIsNone(ready_thumbnail(post.image, 'card'))
+
+    def test_edit_without_new_image_does_not_queue(self):
+        post, _ = self.create_post('kept_image')
+        with mock.patch('posts.thumbnails.submit_post_thumbnails') as queue:
+            PostThumbnailsTests.author_client.post(
+                reverse('posts:post_edit', kwargs={'post_id': post.pk}),
+                data={'text': 'Новый текст'},
+            )
+        queue.assert_not_called()
+
+    def test_feed_page_looks_thumbnails_up_in_one_query(self):
+        posts = [
+            Post.objects.create(
+                text='Пост с картинкой ' + str(i),
+                author=PostThumbnailsTests.test_author,
+                image=create_test_image(f'feed_image_{i}', 'gif'),
+            )
+            for i in range(4)
+        ]
+        for post in posts[:2]:
+            generate_post_thumbnails(post.pk)
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = PostThumbnailsTests.guest_client.get(
+                reverse('posts:index')
+            )
+        kvstore_queries = [
+            query for query in queries
+            if 'thumbnail_kvstore' in query['sql']
+        ]
+        self.assertEqual(len(kvstore_queries), 1)
+        for post in posts:
+            thumbnail = ready_thumbnail(post.image, 'card')
+            with self.subTest(post=post.text):
+                if post in posts[:2]:
+                    self.assertContains(response, thumbnail.url)
+                    self.assertContains(
+                        response, 'width="900" height="500"'
+                    )
+                else:
+                    self.assertIsNone(thumbnail)
+                    self.assertContains(response, post.image.url)
+
+    def test_batch_lookup_matches_single_lookups(self):
+        posts = [
+            Post.objects.create(
+                text='Пост с картинкой ' + str(i),
+                author=PostThumbnailsTests.test_author,
+                image=create_test_image(f'batch_image_{i}', 'gif'),
+            )
+            for i in range(3)
+        ]
+        generate_post_thumbnails(posts[1].pk)
+        images = [post.image for post in posts]
+        for attempt in ('database', 'cache'):
+            with self.subTest(attempt=attempt):
+                self.assertEqual(
+                    [
+                        thumbnail and thumbnail.name
+                        for thumbnail in ready_thumbnails(images, 'card')
+                    ],
+                    [
+                        thumbnail and thumbnail.name
+                        for thumbnail in (
+                            ready_thumbnail(image, 'card') for image in images
+                        )
+                    ],
+                )
+
+    def test_generated_variants_are_stored_with_post(self):
+        post, _ = self.create_post('variants_image')
+        variants = post.get_image_variants()
+        self.assertEqual(set(variants), set(POST_IMAGE_FORMATS))
+        for format_, format_variants in variants.items():
+            with self.subTest(format=format_):
+                self.assertEqual(
+                    [width for _, width, _ in format_variants],
+                    list(POST_IMAGE_WIDTHS),
+                )
+        # the widest JPEG variant is the card thumbnail itself
+        self.assertEqual(
+            variants['JPEG'][-1][0],
+            ready_thumbnail(post.image, 'card').name,
+        )
+        response = PostThumbnailsTests.guest_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': post.pk})
+        )
+        self.assertContains(response, '<source type="image/webp"')
+        self.assertContains(response, '.webp 300w')
+        self.assertContains(response, '.jpg 600w')
+        self.assertContains(response, 'sizes="(min-width: 1200px)')
+        self.assertContains(response, 'width="900" height="500"')
+
+    def test_new_image_replaces_variants(self):
+        post, _ = self.create_post('replaced_image')
+        old_variants = post.get_image_variants()
+        with mock.patch('posts.thumbnails.submit_post_thumbnails') as queue:
+            PostThumbnailsTests.author_client.post(
+                reverse('posts:post_edit', kwargs={'post_id': post.pk}),
+                data={
+                    'text': 'Новый текст',
+                    'image': create_test_image('new_image', 'gif'),
+                },
+            )
+        post.refresh_from_db()
+        self.assertEqual(post.get_image_variants(), {})
+        queue.assert_called_once_with(post.pk)
+        generate_post_thumbnails(post.pk)
+        post.refresh_from_db()
+        self.assertNotEqual(post.get_image_variants(), old_variants)
+
+
+@override_settings(POSTS_THUMBNAIL_WORKERS=2)
+class GenerateThumbnailsCommandTests(TransactionTestCase):
+    """Runs the command on a file copy of the test database: closing
+    connections of an in-memory database does nothing.
+    """
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        path = os.path.join(self.directory, 'dairies.sqlite3')
+        connection.ensure_connection()
+        copy = sqlite3.connect(path)
+        connection.connection.backup(copy)
+        copy.close()
+        # the in-memory database lives as long as its connection
+        self.memory_connection = connection.connection
+        self.memory_name = connection.settings_dict['NAME']
+        connection.connection = None
+        connection.settings_dict['NAME'] = path
+
+    def tearDown(self):
+        connection.close()
+        connection.settings_dict['NAME'] = self.memory_name
+        connection.connection = self.memory_connection
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_command_outlives_closed_connections(self):
+        author = User.objects.create_user(username='rock4ts')
+        # more than a chunk of rows read by iterator()
+        Post.objects.bulk_create(
+            Post(text=f'Пост {number}', author=author, image='posts/x.gif')
+            for number in range(250)
+        )
+        thumbnail = SimpleNamespace(name='posts/x.jpg', width=1, height=1)
+        output = StringIO()
+        with mock.patch(
+            'posts.thumbnails.get_thumbnail', return_value=thumbnail
+        ):
+            call_command('generate_thumbnails', stdout=output)
+        self.assertIn('Generated thumbnails of 250 posts', output.getvalue())
+        self.assertFalse(Post.objects.filter(image_variants='').exists())
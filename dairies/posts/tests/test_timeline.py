@@ -0,0 +1,179 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import (
+    Client, override_settings, TestCase, TransactionTestCase,
+)
+from django.urls import reverse
+
+from posts.models import Follow, Post, TimelineEntry
+
+User = get_user_model()
+
+
+class FollowTimelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.test_author = User.objects.create_user(username='Celebrity')
+        cls.test_follower = User.objects.create_user(username='rock4ts')
+        for i in range(1, 4):
+            Post.objects.create(
+                text='Старый пост ' + str(i),
+                author=cls.test_author,
+            )
+        cls.follower_client = Client()
+        cls.follower_client.force_login(cls.test_follower)
+
+    def setUp(self):
+        cache.clear()
+
+    def follow(self):
+        FollowTimelineTests.follower_client.post(
+            reverse(
+                'posts:profile_follow',
+                kwargs={'username': FollowTimelineTests.test_author.username}
+            )
+        )
+
+    def timeline_post_ids(self):
+        return set(
+            TimelineEntry.objects.filter(
+                user=FollowTimelineTests.test_follower
+            ).values_list('post_id', flat=True)
+        )
+
+    def feed_post_ids(self):
+        response = FollowTimelineTests.follower_client.get(
+            reverse('posts:follow_index')
+        )
+        return {post.pk for post in response.context['page_obj']}
+
+    def test_follow_backfills_and_unfollow_prunes_timeline(self):
+        author_post_ids = set(
+            FollowTimelineTests.test_author.posts.values_list('pk', flat=True)
+        )
+        self.follow()
+        self.assertEqual(self.timeline_post_ids(), author_post_ids)
+        FollowTimelineTests.follower_client.post(
+            reverse(
+                'posts:profile_unfollow',
+                kwargs={'username': FollowTimelineTests.test_author.username}
+            )
+        )
+        self.assertEqual(self.timeline_post_ids(), set())
+
+    def test_new_post_fans_out_and_deleted_post_leaves_timeline(self):
+        self.follow()
+        new_post = Post.objects.create(
+            text='Сообщение для подписчиков',
+            author=FollowTimelineTests.test_author,
+        )
+        self.assertIn(new_post.pk, self.timeline_post_ids())
+        self.assertIn(new_post.pk, self.feed_post_ids())
+        new_post.delete()
+        self.assertNotIn(new_post.pk, self.timeline_post_ids())
+
+    def test_feed_is_read_from_timeline_only(self):
+        self.follow()
+        # posts are not looked up through Follow once materialized
+        Follow.objects.filter(user=FollowTimelineTests.test_follower).update(
+            author=User.objects.create_user(username='random_user')
+        )
+        self.assertEqual(self.feed_post_ids(), self.timeline_post_ids())
+
+    @override_settings(POSTS_FANOUT_LIMIT=0)
+    def test_popular_author_posts_are_read_on_request(self):
+        self.follow()
+        new_post = Post.objects.create(
+            text='Сообщение для подписчиков',
+            author=FollowTimelineTests.test_author,
+        )
+        self.assertEqual(self.timeline_post_ids(), set())
+        feed_post_ids = self.feed_post_ids()
+        self.assertIn(new_post.pk, feed_post_ids)
+        self.assertEqual(len(feed_post_ids), 4)
+        with self.settings(POSTS_PAGINATION='numbered'):
+            self.assertEqual(self.feed_post_ids(), feed_post_ids)
+
+    @override_settings(POSTS_FANOUT_LIMIT=1)
+    def test_crossing_fanout_limit_reconciles_timelines(self):
+        # pulled authors are cached for the limit of this test only
+        self.addCleanup(cache.clear)
+        self.follow()
+        post_ids = set(
+            Post.objects.filter(
+                author=FollowTimelineTests.test_author
+            ).values_list('pk', flat=True)
+        )
+        self.assertEqual(self.timeline_post_ids(), post_ids)
+        second_client = Client()
+        second_client.force_login(
+            User.objects.create_user(username='second_follower')
+        )
+        url_kwargs = {'username': FollowTimelineTests.test_author.username}
+        # the author is pulled now, the feed is not counted twice
+        second_client.post(reverse('posts:profile_follow', kwargs=url_kwargs))
+        self.assertEqual(self.timeline_post_ids(), set())
+        response = FollowTimelineTests.follower_client.get(
+            reverse('posts:follow_index')
+        )
+        self.assertEqual(
+            {post.pk for post in response.context['page_obj']}, post_ids
+        )
+        with self.settings(POSTS_PAGINATION='numbered'):
+            response = FollowTimelineTests.follower_client.get(
+                reverse('posts:follow_index')
+            )
+        self.assertEqual(
+            response.context['page_obj'].paginator.count, len(post_ids)
+        )
+        # posts written while pulled come back to the timeline
+        new_post = Post.objects.create(
+            text='Пост популярного автора',
+            author=FollowTimelineTests.test_author,
+        )
+        second_client.post(
+            reverse('posts:profile_unfollow', kwargs=url_kwargs)
+        )
+        self.assertEqual(
+            self.timeline_post_ids(), post_ids | {new_post.pk}
+        )
+        self.assertIn(new_post.pk, self.feed_post_ids())
+
+
+class FillTimelinesMigrationTests(TransactionTestCase):
+    before = [('posts', '0009_feed_indexes')]
+    after = [('posts', '0010_fill_timelines')]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def test_follows_of_existing_install_fill_timelines(self):
+        apps = self.migrate(self.before)
+        # historical models send no signals, as on an old install
+        HistoricalUser = apps.get_model('auth', 'User')
+        HistoricalPost = apps.get_model('posts', 'Post')
+        author = HistoricalUser.objects.create(username='Celebrity')
+        follower = HistoricalUser.objects.create(username='rock4ts')
+        apps.get_model('posts', 'Follow').objects.create(
+            user=follower, author=author
+        )
+        post_ids = {
+            HistoricalPost.objects.create(
+                text=f'Старый пост {i}', author=author
+            ).pk
+            for i in range(3)
+        }
+        self.migrate(self.after)
+        self.assertEqual(
+            set(
+                TimelineEntry.objects.filter(user_id=follower.pk)
+                .values_list('post_id', flat=True)
+            ),
+            post_ids,
+        )
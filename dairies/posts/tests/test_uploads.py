@@ -0,0 +1,134 @@
+import io
+import shutil
+import signal
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, override_settings, TestCase
+from django.urls import reverse
+from PIL import Image
+
+from posts.image_processing import (
+    ProcessingTimeout, init_worker, sanitize_image,
+)
+from posts.models import Post
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def create_upload(name, size, format_='PNG', **save_options):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, 'red').save(buffer, format_, **save_options)
+    return SimpleUploadedFile(
+        name, buffer.getvalue(), 'image/' + format_.lower()
+    )
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, POSTS_THUMBNAIL_WORKERS=0)
+class ImageUploadTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.test_author = User.objects.create_user(username='rock4ts')
+        cls.author_client = Client()
+        cls.author_client.force_login(cls.test_author)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def create_post(self, image):
+        return ImageUploadTests.author_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Пост с картинкой', 'image': image},
+        )
+
+    @override_settings(POSTS_UPLOAD_MAX_SIZE=1024)
+    def test_oversized_upload_is_rejected(self):
+        upload = create_upload('noise.bmp', (64, 64), 'BMP')
+        response = self.create_post(upload)
+        self.assertFormError(
+            response, 'form', 'image', 'Файл больше 0 МБ.'
+        )
+        self.assertFalse(Post.objects.exists())
+
+    @override_settings(POSTS_UPLOAD_MAX_PIXELS=1000 * 1000)
+    def test_too_many_pixels_are_rejected_by_header(self):
+        upload = create_upload('huge.png', (2000, 1000))
+        with mock.patch('posts.uploads.run_sanitize_image') as sanitize:
+            response = self.create_post(upload)
+        sanitize.assert_not_called()
+        self.assertFormError(
+            response, 'form', 'image',
+            'Изображение больше 1 мегапикселей.',
+        )
+
+    def test_not_an_image_is_rejected(self):
+        upload = SimpleUploadedFile('fake.png', b'not an image', 'image/png')
+        response = self.create_post(upload)
+        self.assertFalse(response.context['form'].is_valid())
+        self.assertIn('image', response.context['form'].errors)
+
+    @override_settings(POSTS_UPLOAD_MAX_SIDE=50)
+    def test_upload_is_reencoded_in_worker_process(self):
+        exif = Image.Exif()
+        exif[0x0112] = 6  # orientation: rotated 90 degrees
+        exif[0x010F] = 'Camera maker'
+        upload = create_upload(
+            'photo.jpg', (200, 100), 'JPEG', exif=exif.tobytes()
+        )
+        self.create_post(upload)
+        post = Post.objects.get()
+        self.assertEqual(post.image.name, 'posts/photo.jpg')
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.format, 'JPEG')
+            self.assertEqual(image.size, (25, 50))
+            self.assertEqual(dict(image.getexif()), {})
+
+    def test_processing_timeout_is_reported(self):
+        upload = create_upload('slow.png', (20, 20))
+        with mock.patch(
+            'posts.uploads.run_sanitize_image', side_effect=ProcessingTimeout
+        ):
+            response = self.create_post(upload)
+        self.assertFormError(
+            response, 'form', 'image',
+            'Изображение обрабатывается слишком долго.',
+        )
+
+
+class SanitizeImageTests(TestCase):
+    def test_time_budget_interrupts_processing(self):
+        previous_handler = signal.getsignal(signal.SIGALRM)
+        self.addCleanup(signal.signal, signal.SIGALRM, previous_handler)
+        init_worker()
+        with tempfile.TemporaryDirectory() as directory:
+            source = f'{directory}/source.png'
+            Image.effect_noise((3000, 3000), 64).save(source)
+            with self.assertRaises(ProcessingTimeout):
+                sanitize_image(
+                    source, f'{directory}/target.png', 'PNG',
+                    4096, 10 ** 8, timeout=0.001,
+                )
+
+    def test_pixel_limit_leaves_pil_settings_alone(self):
+        max_image_pixels = Image.MAX_IMAGE_PIXELS
+        with tempfile.TemporaryDirectory() as directory:
+            source = f'{directory}/source.png'
+            Image.new('RGB', (100, 100), 'red').save(source)
+            with self.assertRaises(ValueError):
+                sanitize_image(
+                    source, f'{directory}/target.png', 'PNG', 4096, 9999,
+                )
+            self.assertEqual(
+                sanitize_image(
+                    source, f'{directory}/target.png', 'PNG', 4096, 10000,
+                ),
+                (100, 100),
+            )
+        self.assertEqual(Image.MAX_IMAGE_PIXELS, max_image_pixels)
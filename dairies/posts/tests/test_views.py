@@ -45,6 +45,8 @@ class PostsViewsTests(TestCase):
             author=cls.test_author,
             text='Тестовый комментарий',
         )
+        # pick up comments counter updated by the comment
+        cls.test_post.refresh_from_db()
         cls.unauthorized_client = Client()
         cls.random_user_client = Client()
         cls.random_user_client.force_login(cls.test_random_user)
@@ -57,6 +59,7 @@ class PostsViewsTests(TestCase):
         shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
 
     def setUp(self):
+        utils_for_tests.run_commit_callbacks_at_once(self)
         cache.clear()
 
     def test_pages_reverse_use_correct_template(self):
@@ -218,11 +221,11 @@ class PostsViewsTests(TestCase):
         context_comment_form = response.context['form']
         self.assertIsInstance(context_comment_form, CommentForm)
 
-        # test context also contains comments queryset
-        context_post_comments = response.context['post_comments']
-        self.assertIsInstance(
-            context_post_comments.latest('pub_date'),
-            Comment
+        # test context also contains page of comments, newest first
+        comments_page = response.context['comments_page']
+        self.assertIsInstance(comments_page[0], Comment)
+        self.assertEqual(
+            comments_page[0], test_post.comments.latest('pub_date')
         )
 
     def test_post_create_view_show_correct_context(self):
@@ -336,6 +339,7 @@ class PostsViewsTests(TestCase):
             expected_number_of_posts
         )
 
+    @override_settings(POSTS_PAGINATION='numbered')
     def test_index_view_second_page_contains_correct_number_of_records(self):
         expected_number_of_posts = utils_for_tests.posts_number_on_page(2)
         response = PostsViewsTests.author_client.get(
@@ -358,22 +362,21 @@ class PostsViewsTests(TestCase):
         response_added_post = PostsViewsTests.unauthorized_client.get(
             reverse('posts:index')
         )
-        Post.objects.get(text='Кэш пост').delete()
-        response_deleted_post = PostsViewsTests.unauthorized_client.get(
+        self.assertContains(response_added_post, 'Кэш пост')
+        response_cached = PostsViewsTests.unauthorized_client.get(
             reverse('posts:index')
         )
+        # served from the page cache without rendering
+        self.assertIsNone(response_cached.context)
         self.assertEqual(
             response_added_post.content,
-            response_deleted_post.content
+            response_cached.content
         )
-        cache.clear()
-        response_cache_clear = PostsViewsTests.unauthorized_client.get(
+        Post.objects.get(text='Кэш пост').delete()
+        response_deleted_post = PostsViewsTests.unauthorized_client.get(
             reverse('posts:index')
         )
-        self.assertNotEqual(
-            response_added_post.content,
-            response_cache_clear.content
-        )
+        self.assertNotContains(response_deleted_post, 'Кэш пост')
 
     def test_group_posts_view_first_page_has_correct_number_of_records(self):
         expected_number_of_posts = utils_for_tests.posts_number_on_page(1)
@@ -386,6 +389,7 @@ class PostsViewsTests(TestCase):
             expected_number_of_posts
         )
 
+    @override_settings(POSTS_PAGINATION='numbered')
     def test_group_posts_view_second_page_has_correct_number_of_records(self):
         expected_number_of_posts = utils_for_tests.posts_number_on_page(2)
         test_slug = PostsViewsTests.test_group.slug
@@ -412,6 +416,7 @@ class PostsViewsTests(TestCase):
             expected_number_of_posts
         )
 
+    @override_settings(POSTS_PAGINATION='numbered')
     def test_profile_view_second_page_contains_correct_number_of_records(self):
         expected_number_of_posts = utils_for_tests.posts_number_on_page(2)
         profile_user = PostsViewsTests.test_author
@@ -439,8 +444,8 @@ class PostsViewsTests(TestCase):
         response = PostsViewsTests.unauthorized_client.get(
             reverse('posts:post_detail', kwargs={'post_id': test_post.id})
         )
-        number_of_comments_after_new = (
-            response.context['post_comments'].count()
+        number_of_comments_after_new = len(
+            response.context['comments_page']
         )
         self.assertEqual(
             number_of_comments_after_new,
@@ -1,5 +1,6 @@
 # utility functions for post app tests
 import math
+from unittest import mock
 
 from django.core.files.uploadedfile import SimpleUploadedFile
 
@@ -49,3 +50,15 @@ def create_test_image(image_name: str, format: str):
         content_type='image/' + format
     )
     return test_image
+
+
+def run_commit_callbacks_at_once(test_case):
+    """Makes transaction.on_commit() run callbacks right away during
+    the test, transactions of TestCase never commit.
+    """
+    patcher = mock.patch(
+        'django.db.transaction.on_commit',
+        side_effect=lambda func, using=None: func(),
+    )
+    patcher.start()
+    test_case.addCleanup(patcher.stop)
@@ -0,0 +1,210 @@
+# thumbnails of post images generated off the request path
+
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections, transaction
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as thumbnail_defaults
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import (
+    EMPTY_VALUE, KVStore as CachedDBKVStore,
+)
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+from .caching import bump_versions
+from .models import Post
+from .signals import post_listing_tags
+
+# every size of post images the templates show: name -> (geometry, options)
+POST_THUMBNAILS = {
+    'card': ('900x500', {'crop': 'center', 'upscale': True}),
+}
+
+# responsive variants of post images, 9:5 crops of every width
+# in every format, the widest JPEG one is the card thumbnail
+POST_IMAGE_WIDTHS = (300, 600, 900)
+POST_IMAGE_FORMATS = ('WEBP', 'JPEG')
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+class LookupThumbnailBackend(ThumbnailBackend):
+    """sorl backend that looks thumbnails up in the key value store
+    without ever creating them.
+    """
+    def thumbnail_file(self, file_, geometry_string, **options):
+        """Returns ImageFile the thumbnail is stored in, options
+        are completed the same way get_thumbnail does it.
+        """
+        source = ImageFile(file_)
+        if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(thumbnail_settings, attr)
+            if value != getattr(thumbnail_defaults, attr):
+                options.setdefault(key, value)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return ImageFile(name, default.storage)
+
+    def get_ready_thumbnail(self, file_, geometry_string, **options):
+        """Returns the thumbnail or None if it is not generated yet.
+        """
+        return default.kvstore.get(
+            self.thumbnail_file(file_, geometry_string, **options)
+        )
+
+
+lookup_backend = LookupThumbnailBackend()
+
+
+def ready_thumbnail(image, size):
+    geometry, options = POST_THUMBNAILS[size]
+    return lookup_backend.get_ready_thumbnail(image, geometry, **options)
+
+
+def ready_thumbnails(images, size):
+    """Returns thumbnails of images, None where one is not generated yet.
+    Key value store entries are read with a single cache multi-get and
+    cache misses with a single query instead of a lookup per image.
+    """
+    geometry, options = POST_THUMBNAILS[size]
+    kvstore = default.kvstore
+    if not isinstance(kvstore, CachedDBKVStore):
+        return [
+            lookup_backend.get_ready_thumbnail(image, geometry, **options)
+            for image in images
+        ]
+    keys = [
+        add_prefix(
+            lookup_backend.thumbnail_file(image, geometry, **options).key
+        )
+        for image in images
+    ]
+    values = kvstore.cache.get_many(keys) if keys else {}
+    missing = [key for key in keys if key not in values]
+    if missing:
+        stored = dict(
+            KVStoreModel.objects.filter(key__in=missing)
+            .values_list('key', 'value')
+        )
+        # remember absent entries too, as sorl's own lookup does
+        fetched = {key: stored.get(key, EMPTY_VALUE) for key in missing}
+        kvstore.cache.set_many(
+            fetched, thumbnail_settings.THUMBNAIL_CACHE_TIMEOUT
+        )
+        values.update(fetched)
+    return [
+        None if values[key] in (None, '', EMPTY_VALUE)
+        else deserialize_image_file(values[key])
+        for key in keys
+    ]
+
+
+def attach_thumbnails(posts, size):
+    """Preloads thumbnails of post images for the post_thumbnail tag.
+    Posts with stored image variants need no lookup.
+    """
+    posts = [
+        post for post in posts if post.image and not post.image_variants
+    ]
+    thumbnails = ready_thumbnails([post.image for post in posts], size)
+    for post, thumbnail in zip(posts, thumbnails):
+        if not hasattr(post, 'thumbnails'):
+            post.thumbnails = {}
+        post.thumbnails[size] = thumbnail
+
+
+def generate_image_variants(image):
+    """Creates responsive variants of image and returns
+    {format: [[name, width, height], ...]} ordered by width.
+    """
+    variants = {}
+    for format_ in POST_IMAGE_FORMATS:
+        variants[format_] = []
+        for width in POST_IMAGE_WIDTHS:
+            thumbnail = get_thumbnail(
+                image,
+                f'{width}x{round(width * 5 / 9)}',
+                crop='center',
+                upscale=True,
+                format=format_,
+            )
+            variants[format_].append(
+                [thumbnail.name, thumbnail.width, thumbnail.height]
+            )
+    return variants
+
+
+def generate_post_thumbnails(post_id):
+    """Creates every thumbnail and responsive variant of post image,
+    stores variants with the post and invalidates cached cards
+    and pages still showing the original image.
+    """
+    try:
+        post = (
+            Post.objects.select_related('author', 'group')
+            .filter(pk=post_id).first()
+        )
+        if post is None or not post.image:
+            return
+        for geometry, options in POST_THUMBNAILS.values():
+            get_thumbnail(post.image, geometry, **options)
+        variants = generate_image_variants(post.image)
+        # update() keeps post signals from invalidating caches twice
+        Post.objects.filter(pk=post.pk, image=post.image.name).update(
+            image_variants=json.dumps(variants)
+        )
+        group_slugs = [post.group.slug] if post.group else []
+        bump_versions(
+            f'post:{post.pk}',
+            *post_listing_tags(post.author.username, group_slugs),
+        )
+    except Exception:
+        logger.exception('Thumbnails of post %s were not generated', post_id)
+
+
+def run_thumbnail_task(post_id):
+    try:
+        generate_post_thumbnails(post_id)
+    finally:
+        # worker threads must not keep connections between tasks,
+        # callers of generate_post_thumbnails keep theirs
+        connections.close_all()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.POSTS_THUMBNAIL_WORKERS,
+                thread_name_prefix='thumbnails',
+            )
+    return _executor
+
+
+def submit_post_thumbnails(post_id):
+    if not settings.POSTS_THUMBNAIL_WORKERS:
+        generate_post_thumbnails(post_id)
+        return
+    get_executor().submit(run_thumbnail_task, post_id)
+
+
+def queue_post_thumbnails(post):
+    """Schedules thumbnail generation of post image once
+    the transaction saving the post is committed.
+    """
+    if post.image:
+        transaction.on_commit(lambda: submit_post_thumbnails(post.pk))
@@ -0,0 +1,269 @@
+# materialized subscriptions feed (fan-out on write)
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count
+
+from .counts import capped_count
+from .following import followed_author_ids
+from .models import AuthorStats, Follow, Post, TimelineEntry
+from .pagination import keyset_queryset
+
+PULL_AUTHORS_KEY = 'posts:timeline:pull_authors'
+
+
+def pull_author_ids():
+    """Returns ids of authors having more than POSTS_FANOUT_LIMIT
+    followers. Their posts are not copied to timelines and are
+    read from the post table instead (fan-out on read).
+    """
+    author_ids = cache.get(PULL_AUTHORS_KEY)
+    if author_ids is None:
+        author_ids = frozenset(
+            Follow.objects.values('author')
+            .annotate(followers=Count('pk'))
+            .filter(followers__gt=settings.POSTS_FANOUT_LIMIT)
+            .values_list('author', flat=True)
+        )
+        cache.set(PULL_AUTHORS_KEY, author_ids, settings.POSTS_COUNT_TIMEOUT)
+    return author_ids
+
+
+def fan_out_post(post):
+    """Copies new post to timelines of author's followers.
+    """
+    if post.author_id in pull_author_ids():
+        return
+    follower_ids = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True)
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(
+                user_id=follower_id,
+                post_id=post.pk,
+                author_id=post.author_id,
+                pub_date=post.pub_date,
+            )
+            for follower_id in follower_ids.iterator()
+        ),
+        batch_size=settings.POSTS_TIMELINE_BATCH,
+        ignore_conflicts=True,
+    )
+
+
+def backfill_timeline(user_id, author_id):
+    """Copies latest posts of newly followed author to follower's timeline.
+    """
+    if author_id in pull_author_ids():
+        return
+    posts = Post.objects.filter(author_id=author_id).values_list(
+        'pk', 'pub_date'
+    )[:settings.POSTS_TIMELINE_BACKFILL]
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(
+                user_id=user_id,
+                post_id=post_id,
+                author_id=author_id,
+                pub_date=pub_date,
+            )
+            for post_id, pub_date in posts
+        ),
+        batch_size=settings.POSTS_TIMELINE_BATCH,
+        ignore_conflicts=True,
+    )
+
+
+def rebuild_timelines():
+    """Recreates every timeline from follows as if each follower
+    had just followed the author, returns number of entries.
+    Used after rows were inserted in bulk, bypassing signals.
+    """
+    cache.delete(PULL_AUTHORS_KEY)
+    tables = {
+        'timeline': TimelineEntry._meta.db_table,
+        'follow': Follow._meta.db_table,
+        'post': Post._meta.db_table,
+    }
+    TimelineEntry.objects.all().delete()
+    # one statement instead of a backfill_timeline() call per follow
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            INSERT INTO {timeline} (user_id, post_id, author_id, pub_date)
+            SELECT follow.user_id, post.id, post.author_id, post.pub_date
+            FROM {follow} follow JOIN (
+                SELECT id, author_id, pub_date, ROW_NUMBER() OVER (
+                    PARTITION BY author_id ORDER BY pub_date DESC, id DESC
+                ) AS position
+                FROM {post}
+            ) post ON post.author_id = follow.author_id
+            WHERE post.position <= %s AND follow.author_id NOT IN (
+                SELECT author_id FROM {follow}
+                GROUP BY author_id HAVING COUNT(*) > %s
+            )
+            """.format(**tables),
+            [settings.POSTS_TIMELINE_BACKFILL, settings.POSTS_FANOUT_LIMIT],
+        )
+        return cursor.rowcount
+
+
+def rebuild_author_timelines(author_ids):
+    """Recreates entries of posts of authors in timelines of their
+    followers: entries of pulled authors are dropped, latest posts
+    of pushed ones are copied to timelines of all followers.
+    """
+    cache.delete(PULL_AUTHORS_KEY)
+    pulled_ids = pull_author_ids()
+    tables = {
+        'timeline': TimelineEntry._meta.db_table,
+        'follow': Follow._meta.db_table,
+        'post': Post._meta.db_table,
+    }
+    author_ids = list(author_ids)
+    batch = settings.POSTS_TIMELINE_BATCH
+    for start in range(0, len(author_ids), batch):
+        chunk = author_ids[start:start + batch]
+        TimelineEntry.objects.filter(author_id__in=chunk).delete()
+        pushed_ids = [
+            author_id for author_id in chunk if author_id not in pulled_ids
+        ]
+        if not pushed_ids:
+            continue
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """
+                INSERT INTO {timeline} (user_id, post_id, author_id, pub_date)
+                SELECT follow.user_id, post.id, post.author_id, post.pub_date
+                FROM {follow} follow JOIN (
+                    SELECT id, author_id, pub_date, ROW_NUMBER() OVER (
+                        PARTITION BY author_id ORDER BY pub_date DESC, id DESC
+                    ) AS position
+                    FROM {post} WHERE author_id IN ({placeholders})
+                ) post ON post.author_id = follow.author_id
+                WHERE post.position <= %s
+                """.format(
+                    placeholders=', '.join(['%s'] * len(pushed_ids)), **tables
+                ),
+                [*pushed_ids, settings.POSTS_TIMELINE_BACKFILL],
+            )
+
+
+def reconcile_author(author_id):
+    """Moves author between fan-out on write and fan-out on read.
+    """
+    rebuild_author_timelines([author_id])
+
+
+def followers_changed(author_id, delta):
+    """Reconciles timelines when the change of followers of author
+    by delta crossed POSTS_FANOUT_LIMIT, called after the counter
+    was updated.
+    """
+    followers = AuthorStats.objects.filter(user_id=author_id).values_list(
+        'followers_count', flat=True
+    ).first()
+    # counters of users being deleted are gone
+    if followers is None:
+        return
+    limit = settings.POSTS_FANOUT_LIMIT
+    if (followers > limit) != (followers - delta > limit):
+        reconcile_author(author_id)
+
+
+def prune_timeline(user_id, author_id):
+    """Removes posts of unfollowed author from follower's timeline.
+    """
+    TimelineEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def merge_feeds(feeds, newer, limit):
+    """Merges feed slices ordered the same way into one slice of limit posts.
+    """
+    posts = {post.pk: post for feed in feeds for post in feed}
+    return sorted(
+        posts.values(),
+        key=lambda post: (post.pub_date, post.pk),
+        reverse=not newer,
+    )[:limit]
+
+
+class FollowFeed:
+    """Subscriptions feed of a user: one indexed range read over
+    the materialized timeline merged with posts of followed
+    authors that are too popular to fan out.
+    Works with both KeysetPaginator and numbered Paginator.
+
+    Posts are loaded with related objects of related and, if only is
+    given, with these columns alone (id and pub_date always).
+    """
+    def __init__(self, user, related=('author', 'group'), only=None):
+        self.user = user
+        self.related = related
+        self.only = only
+
+    def timeline_posts(self):
+        entries = TimelineEntry.objects.filter(user=self.user).select_related(
+            *([f'post__{name}' for name in self.related] or ['post'])
+        )
+        if self.only is not None:
+            entries = entries.only(
+                'pub_date', 'post', 'post__id', 'post__pub_date',
+                *(f'post__{column}' for column in self.only),
+            )
+        return entries
+
+    def pulled_feeds(self):
+        """Returns feeds of posts of followed authors excluded from
+        fan-out, one per author: a range read of the author index
+        is in feed order, posts of several authors would be sorted.
+        """
+        if not hasattr(self, '_pulled_author_ids'):
+            popular_ids = pull_author_ids()
+            self._pulled_author_ids = []
+            if popular_ids:
+                self._pulled_author_ids = [
+                    author_id
+                    for author_id in followed_author_ids(self.user.pk)
+                    if author_id in popular_ids
+                ]
+        feeds = []
+        for author_id in self._pulled_author_ids:
+            posts = Post.objects.filter(author_id=author_id)
+            if self.related:
+                posts = posts.select_related(*self.related)
+            if self.only is not None:
+                posts = posts.only('id', 'pub_date', *self.only)
+            feeds.append(posts)
+        return feeds
+
+    def keyset_fetch(self, position, newer, limit):
+        entries = keyset_queryset(
+            self.timeline_posts(), position, newer, pk_field='post_id'
+        )[:limit]
+        feeds = [[entry.post for entry in entries]]
+        for posts in self.pulled_feeds():
+            feeds.append(keyset_queryset(posts, position, newer)[:limit])
+        return merge_feeds(feeds, newer, limit)
+
+    def count(self):
+        return sum(
+            capped_count(queryset, settings.POSTS_COUNT_CAP)
+            for queryset in [self.timeline_posts(), *self.pulled_feeds()]
+        )
+
+    def __getitem__(self, index):
+        # numbered pagination slices the feed with OFFSET
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        stop = index.stop
+        feeds = [
+            [entry.post for entry in keyset_queryset(
+                self.timeline_posts(), pk_field='post_id'
+            )[:stop]],
+        ]
+        for posts in self.pulled_feeds():
+            feeds.append(keyset_queryset(posts)[:stop])
+        return merge_feeds(feeds, False, stop)[index.start:]
@@ -0,0 +1,204 @@
+# memory bounded handling of uploaded post images
+
+import io
+import multiprocessing
+import os
+import tempfile
+import threading
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from django import forms
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from PIL import Image
+
+from .image_processing import ProcessingTimeout, init_worker, sanitize_image
+
+# formats accepted for upload, they are kept on re-encoding
+UPLOAD_FORMATS = ('JPEG', 'PNG', 'GIF', 'WEBP')
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+class RejectedUpload(UploadedFile):
+    """Placeholder of uploaded file which exceeded the size limit,
+    its data is discarded while being received.
+    """
+    def __init__(self, name, content_type, size):
+        super().__init__(io.BytesIO(), name, content_type, size)
+
+
+class BoundedUploadHandler(TemporaryFileUploadHandler):
+    """Streams every uploaded file to a temporary file on disk and stops
+    writing it after POSTS_UPLOAD_MAX_SIZE bytes, such file reaches
+    the form as RejectedUpload.
+    """
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+        self.rejected = False
+
+    def receive_data_chunk(self, raw_data, start):
+        if self.rejected:
+            return None
+        self.received += len(raw_data)
+        if self.received > settings.POSTS_UPLOAD_MAX_SIZE:
+            self.rejected = True
+            self.file.close()
+            return None
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        if self.rejected:
+            return RejectedUpload(
+                self.file_name, self.content_type, self.received
+            )
+        return super().file_complete(file_size)
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # spawned workers share no locks or connections with the server
+            _executor = ProcessPoolExecutor(
+                max_workers=settings.POSTS_UPLOAD_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=init_worker,
+            )
+    return _executor
+
+
+def reset_executor():
+    global _executor
+    with _executor_lock:
+        _executor = None
+
+
+def run_sanitize_image(*args):
+    """Runs sanitize_image in the process pool, waiting for it
+    at most POSTS_UPLOAD_TIMEOUT seconds.
+    """
+    timeout = settings.POSTS_UPLOAD_TIMEOUT
+    if not settings.POSTS_UPLOAD_WORKERS:
+        return sanitize_image(*args)
+    future = get_executor().submit(sanitize_image, *args, timeout)
+    try:
+        # the worker enforces the budget itself, waiting a bit longer
+        # only covers decoding stuck in C code
+        return future.result(timeout=timeout + 1)
+    except BrokenProcessPool:
+        reset_executor()
+        raise
+
+
+class UploadedImageField(forms.ImageField):
+    """Image field that checks uploads by their header only and gets
+    them re-encoded, stripped of metadata and downscaled out of process.
+    """
+    default_error_messages = {
+        'too_large': 'Файл больше %(limit)s МБ.',
+        'too_many_pixels': (
+            'Изображение больше %(limit)s мегапикселей.'
+        ),
+        'timeout': 'Изображение обрабатывается слишком долго.',
+    }
+
+    def to_python(self, data):
+        if isinstance(data, RejectedUpload):
+            raise ValidationError(
+                self.error_messages['too_large'],
+                code='too_large',
+                params={'limit': settings.POSTS_UPLOAD_MAX_SIZE // 2 ** 20},
+            )
+        # FileField checks, ImageField would decode the whole image
+        upload = forms.FileField.to_python(self, data)
+        if upload is None:
+            return None
+        format_, (width, height) = self.read_header(upload)
+        if width * height > settings.POSTS_UPLOAD_MAX_PIXELS:
+            raise ValidationError(
+                self.error_messages['too_many_pixels'],
+                code='too_many_pixels',
+                params={
+                    'limit': settings.POSTS_UPLOAD_MAX_PIXELS // 10 ** 6
+                },
+            )
+        return self.sanitize(upload, format_)
+
+    def read_header(self, upload):
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter(
+                    'ignore', Image.DecompressionBombWarning
+                )
+                image = Image.open(upload)
+                format_, size = image.format, image.size
+        except (OSError, SyntaxError, Image.DecompressionBombError) as error:
+            raise ValidationError(
+                self.error_messages['invalid_image'],
+                code='invalid_image',
+            ) from error
+        finally:
+            upload.seek(0)
+        if format_ not in UPLOAD_FORMATS:
+            raise ValidationError(
+                self.error_messages['invalid_image'], code='invalid_image'
+            )
+        return format_, size
+
+    def sanitize(self, upload, format_):
+        """Returns re-encoded copy of upload under the same name.
+        """
+        suffix = os.path.splitext(upload.name)[1]
+        source = None
+        if hasattr(upload, 'temporary_file_path'):
+            source_path = upload.temporary_file_path()
+        else:
+            source = tempfile.NamedTemporaryFile(
+                suffix=suffix, dir=settings.FILE_UPLOAD_TEMP_DIR
+            )
+            for chunk in upload.chunks():
+                source.write(chunk)
+            source.flush()
+            source_path = source.name
+        target = tempfile.NamedTemporaryFile(
+            suffix=suffix, dir=settings.FILE_UPLOAD_TEMP_DIR
+        )
+        try:
+            run_sanitize_image(
+                source_path,
+                target.name,
+                format_,
+                settings.POSTS_UPLOAD_MAX_SIDE,
+                settings.POSTS_UPLOAD_MAX_PIXELS,
+            )
+        except (ProcessingTimeout, FuturesTimeoutError) as error:
+            target.close()
+            raise ValidationError(
+                self.error_messages['timeout'], code='timeout'
+            ) from error
+        except (OSError, SyntaxError, ValueError) as error:
+            target.close()
+            raise ValidationError(
+                self.error_messages['invalid_image'], code='invalid_image'
+            ) from error
+        finally:
+            if source is not None:
+                source.close()
+        # the worker wrote through its own descriptor
+        target.seek(0, os.SEEK_END)
+        size = target.tell()
+        target.seek(0)
+        return UploadedFile(
+            target,
+            upload.name,
+            Image.MIME.get(format_, upload.content_type),
+            size,
+        )
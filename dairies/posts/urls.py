@@ -1,6 +1,6 @@
 from django.urls import path
 
-from . import views
+from . import feeds, views
 
 app_name = 'posts'
 
@@ -9,6 +9,7 @@ urlpatterns = [
     path('group/<slug:slug>/', views.group_posts, name='group_posts'),
     path('profile/<str:username>/', views.profile, name='profile'),
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
+    path('search/', views.search, name='search'),
     path('create/', views.post_create, name='post_create'),
     path('posts/<int:post_id>/edit/', views.post_edit, name='post_edit'),
     path('posts/<int:post_id>/delete/', views.post_delete, name='post_delete'),
@@ -17,6 +18,11 @@ urlpatterns = [
         views.add_comment,
         name='add_comment'
     ),
+    path(
+        'posts/<int:post_id>/comments/',
+        views.comments_more,
+        name='comments_more'
+    ),
     path(
         'comments/<int:comment_id>/edit/',
         views.edit_comment,
@@ -37,5 +43,32 @@ urlpatterns = [
         'profile/<str:username>/unfollow/',
         views.profile_unfollow,
         name='profile_unfollow'
-    )
+    ),
+    path(
+        'profile/<str:username>/export/',
+        views.profile_export,
+        name='profile_export'
+    ),
+    path('rss/', feeds.latest_posts_rss, name='feed_rss'),
+    path('atom/', feeds.latest_posts_atom, name='feed_atom'),
+    path(
+        'group/<slug:slug>/rss/',
+        feeds.group_posts_rss,
+        name='group_feed_rss'
+    ),
+    path(
+        'group/<slug:slug>/atom/',
+        feeds.group_posts_atom,
+        name='group_feed_atom'
+    ),
+    path(
+        'profile/<str:username>/rss/',
+        feeds.author_posts_rss,
+        name='profile_feed_rss'
+    ),
+    path(
+        'profile/<str:username>/atom/',
+        feeds.author_posts_atom,
+        name='profile_feed_atom'
+    ),
 ]
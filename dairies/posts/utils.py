@@ -1,14 +1,39 @@
 # utility functions for posts app
 
-from django.core.paginator import Paginator
+from django.conf import settings
 
 from dairies.settings import posts_per_page
 
+from .counts import get_post_count
+from .pagination import CountedPaginator, KeysetPaginator
 
-def create_page_obj(request, post_list):
-    """Creates page_obj using page number from get-request and post_list
+
+def create_page_obj(request, post_list, count_scope=None):
+    """Creates page_obj for post_list using ?before= / ?after= cursors
+    from get-request or page number if numbered pagination is enabled.
+    Numbered pages take post_list total from cached counter of count_scope
+    """
+    if settings.POSTS_PAGINATION == 'numbered':
+        paginator = CountedPaginator(
+            post_list,
+            posts_per_page,
+            lambda: get_post_count(post_list, count_scope),
+        )
+        page_number = request.GET.get('page')
+        return paginator.get_page(page_number)
+    paginator = KeysetPaginator(post_list, posts_per_page)
+    return paginator.get_page(
+        before=request.GET.get('before'),
+        after=request.GET.get('after'),
+    )
+
+
+def create_comments_page(request, post):
+    """Creates page of post comments older than ?before= cursor
+    with their authors loaded in the same query.
     """
-    paginator = Paginator(post_list, posts_per_page)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    return page_obj
+    paginator = KeysetPaginator(
+        post.comments.select_related('author'),
+        settings.POSTS_COMMENTS_PER_PAGE,
+    )
+    return paginator.get_page(before=request.GET.get('before'))
@@ -1,17 +1,43 @@
 from django.contrib.auth.decorators import login_required
+from django.db import transaction
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
 
+from .archive import acquire_slot, DiaryArchive
+from .caching import cache_anonymous_page, conditional_page
+from .following import followed_author_ids, is_following
 from .forms import CommentForm, PostForm
 from .models import Comment, Follow, Group, Post, User
-from .utils import create_page_obj
+from .search import search_page
+from .thumbnails import queue_post_thumbnails
+from .timeline import FollowFeed
+from .utils import create_comments_page, create_page_obj
 
 
+def feed_page_tags(request):
+    # 'feed' changes with every post and comment, the profile
+    # of the user when they follow or unfollow somebody
+    return ['feed', f'profile:{request.user.username}']
+
+
+def post_detail_tags(request, post_id):
+    # the page shows number of posts of the author
+    username = Post.objects.filter(pk=post_id).order_by().values_list(
+        'author__username', flat=True
+    ).first()
+    if username is None:
+        return None
+    return [f'post:{post_id}', f'profile:{username}']
+
+
+@conditional_page(feed_page_tags)
+@cache_anonymous_page('feed')
 def index(request):
     template = 'posts/index.html'
     post_list = Post.objects.select_related('group', 'author').all()
-    page_obj = create_page_obj(request, post_list)
+    page_obj = create_page_obj(request, post_list, 'all')
     if not request.user.is_anonymous:
-        has_subscriptions = Follow.objects.filter(user=request.user).exists()
+        has_subscriptions = bool(followed_author_ids(request.user.pk))
     else:
         has_subscriptions = False
     context = {
@@ -21,12 +47,13 @@ def index(request):
     return render(request, template, context)
 
 
+@cache_anonymous_page('group_page:{slug}')
 def group_posts(request, slug):
     template = 'posts/group_list.html'
     group = get_object_or_404(Group, slug=slug)
     group_page = True
-    post_list = group.posts.all()
-    page_obj = create_page_obj(request, post_list)
+    post_list = group.posts.select_related('author')
+    page_obj = create_page_obj(request, post_list, f'group:{group.pk}')
     context = {
         'group': group,
         'group_page': group_page,
@@ -35,17 +62,17 @@ def group_posts(request, slug):
     return render(request, template, context)
 
 
+@cache_anonymous_page('profile:{username}')
 def profile(request, username):
     template = 'posts/profile.html'
-    user = get_object_or_404(User, username=username)
-    post_list = user.posts.all()
-    page_obj = create_page_obj(request, post_list)
+    user = get_object_or_404(
+        User.objects.select_related('stats'), username=username
+    )
+    post_list = user.posts.select_related('group')
+    page_obj = create_page_obj(request, post_list, f'author:{user.pk}')
     following = (
         request.user.is_authenticated
-        and Follow.objects.filter(
-            user=request.user,
-            author__username=username
-        ).exists()
+        and is_following(request.user.pk, user.pk)
     )
     context = {
         'author': user,
@@ -55,17 +82,47 @@ def profile(request, username):
     return render(request, template, context)
 
 
+@conditional_page(post_detail_tags)
+@cache_anonymous_page('post:{post_id}')
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
-    post_comments = post.comments.all()
+    post = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'), pk=post_id
+    )
     context = {
         'post': post,
         'form': CommentForm(),
-        'post_comments': post_comments
+        'comments_page': create_comments_page(request, post),
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+@cache_anonymous_page('post:{post_id}')
+def comments_more(request, post_id):
+    """Returns fragment with the next page of post comments
+    for the "load more" button of post_detail.
+    """
+    post = get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    context = {
+        'post': post,
+        'comments_page': create_comments_page(request, post),
+    }
+    return render(request, 'posts/includes/comments_page.html', context)
+
+
+def search(request):
+    query = request.GET.get('q', '').strip()
+    kind = 'comments' if request.GET.get('type') == 'comments' else 'posts'
+    page_obj = None
+    if query:
+        page_obj = search_page(kind, query, request.GET.get('after'))
+    context = {
+        'query': query,
+        'kind': kind,
+        'page_obj': page_obj,
+    }
+    return render(request, 'posts/search.html', context)
+
+
 @login_required
 def post_create(request):
     form = PostForm(
@@ -74,7 +131,11 @@ def post_create(request):
     )
     form.instance.author = request.user
     if form.is_valid():
-        form.save()
+        # only the save takes the write lock, form renders read
+        # from replicas
+        with transaction.atomic():
+            post = form.save()
+            queue_post_thumbnails(post)
         username = request.user.username
         return redirect('posts:profile', username)
     return render(request, 'posts/create_post.html', {'form': form})
@@ -92,7 +153,14 @@ def post_edit(request, post_id):
         instance=post_data
     )
     if form.is_valid():
-        form.save()
+        image_changed = 'image' in form.changed_data
+        if image_changed:
+            # variants of the previous image are not shown anymore
+            form.instance.image_variants = ''
+        with transaction.atomic():
+            post = form.save()
+            if image_changed:
+                queue_post_thumbnails(post)
         return redirect('posts:post_detail', post_id)
     context = {
         'form': form,
@@ -102,6 +170,7 @@ def post_edit(request, post_id):
 
 
 @login_required
+@transaction.atomic
 def post_delete(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
     if request.user != post.author:
@@ -112,6 +181,7 @@ def post_delete(request, post_id):
 
 
 @login_required
+@transaction.atomic
 def add_comment(request, post_id):
     form = CommentForm(request.POST or None)
     if form.is_valid():
@@ -144,6 +214,7 @@ def edit_comment(request, comment_id):
 
 
 @login_required
+@transaction.atomic
 def delete_comment(request, comment_id):
     comment = get_object_or_404(Comment, pk=comment_id)
     post_id = comment.post.pk
@@ -154,8 +225,9 @@ def delete_comment(request, comment_id):
 
 
 @login_required
+@conditional_page(feed_page_tags)
 def follow_index(request):
-    post_list = Post.objects.filter(author__following__user=request.user)
+    post_list = FollowFeed(request.user)
     page_obj = create_page_obj(request, post_list)
     context = {
         'page_obj': page_obj,
@@ -164,6 +236,7 @@ def follow_index(request):
 
 
 @login_required
+@transaction.atomic
 def profile_follow(request, username):
     viewed_profile = get_object_or_404(User, username=username)
     if request.user == viewed_profile:
@@ -176,8 +249,26 @@ def profile_follow(request, username):
 
 
 @login_required
+@transaction.atomic
 def profile_unfollow(request, username):
     get_object_or_404(
         Follow, user=request.user, author__username=username
     ).delete()
     return redirect('posts:profile', username)
+
+
+@login_required
+def profile_export(request, username):
+    """Streams ZIP archive of posts, comments and images of the user.
+    """
+    if request.user.username != username:
+        return redirect('posts:profile', username)
+    if not acquire_slot(request.user.pk):
+        return render(request, 'posts/archive/busy.html', status=429)
+    response = StreamingHttpResponse(
+        DiaryArchive(request.user), content_type='application/zip'
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename="dairies-{request.user.pk}.zip"'
+    )
+    return response